@@ -12,15 +12,19 @@ os.chdir(parent_dir)
 # Add the parent directory to Python path so we can use absolute imports
 sys.path.append(str(parent_dir))
 
-from PyQt6.QtCore import QLocale, Qt, QTranslator
+from PyQt6.QtCore import QLocale, Qt, QTranslator, QTimer
 from PyQt6.QtWidgets import QApplication
 
 from app.common.application import SingletonApplication
-from app.common.config import config, Language
+from app.common.config import config, Language, STOCK_SNAPSHOT_INTERVAL_MINUTES, STOCK_RESERVATION_RECONCILE_MINUTES
 from app.common.setting import APP_NAME
+from app.common.signal_bus import signalBus
 from app.common.dpi_manager import DPI_SCALE
 from app.view.MainLogin import MainLoginWindow
-from app.common.db.database import init_db
+from app.common.db.schema import ensure_schema
+from app.common.db.executor import dbExecutor
+from app.common.db.pool import log_pool_summary
+from app.common.db.controller import MaterialController
 
 # enable high dpi scale
 # os.environ["QT_ENABLE_HIGHDPI_SCALING"] = "0"
@@ -32,14 +36,54 @@ if __name__ == "__main__":
 
     app = SingletonApplication(sys.argv, APP_NAME)
     app.setApplicationName(APP_NAME)
-
-
-    # Initialize database
-    init_db()
+    # Дожидаемся фоновых запросов к БД перед закрытием соединений
+    app.aboutToQuit.connect(dbExecutor.shutdown)
+    # Телеметрия пула в лог - по ней подбирается профиль пула (DB_POOL_PROFILE)
+    app.aboutToQuit.connect(log_pool_summary)
 
     # create main window
     project = MainLoginWindow()
+    # Login and registration query the database: they wait until the schema is verified and
+    # pending migrations are applied, otherwise a fast login hits missing tables or columns
+    project.set_database_ready(False)
     project.show()
 
+    def on_schema_ready(_):
+        schema_state["ready"] = True
+        project.set_database_ready(True)
+        signalBus.schema_ready.emit()
+
+    def on_schema_failed(error):
+        # Database unavailable or migration failed: login reports the error itself,
+        # the check is repeated once the connection is restored
+        signalBus.database_error.emit(f"Ошибка проверки схемы базы данных: {error}")
+        project.set_database_ready(True)
+
+    def check_schema():
+        # Off the first paint: one query when the fingerprint and version match,
+        # create_all and migrations only when the schema changed (see app/common/db/schema.py)
+        dbExecutor.submit(app, "schema", lambda db: ensure_schema(), on_result=on_schema_ready, on_error=on_schema_failed)
+
+    schema_state = {"ready": False}
+    signalBus.database_availability_changed.connect(
+        lambda available, _: check_schema() if available and not schema_state["ready"] else None)
+    QTimer.singleShot(0, check_schema)
+
+    # Journal of stock movements is rolled into balance snapshots in the background
+    # (see app/common/db/services/stock_ledger_service.py), once the ledger tables are migrated
+    if STOCK_SNAPSHOT_INTERVAL_MINUTES > 0:
+        stock_snapshot_timer = QTimer(app)
+        stock_snapshot_timer.timeout.connect(
+            lambda: dbExecutor.submit(app, "stock_snapshot", lambda db: MaterialController().snapshot_stock(db)))
+        signalBus.schema_ready.connect(lambda: stock_snapshot_timer.start(STOCK_SNAPSHOT_INTERVAL_MINUTES * 60 * 1000))
+
+    # Reservations of orders that left processing outside OrderService are converted in batched
+    # background passes (see app/common/db/services/reservation_service.py), once the reservations table is migrated
+    if STOCK_RESERVATION_RECONCILE_MINUTES > 0:
+        reservation_timer = QTimer(app)
+        reservation_timer.timeout.connect(
+            lambda: dbExecutor.submit(app, "stock_reservations", lambda db: MaterialController().reconcile_reservations(db)))
+        signalBus.schema_ready.connect(lambda: reservation_timer.start(STOCK_RESERVATION_RECONCILE_MINUTES * 60 * 1000))
+
     app.exec()
 
@@ -32,6 +32,84 @@ DATABASE_URL = url = URL.create(
     database="terra",
 )
 
+# --- Профили базы данных ---
+# mysql  - рабочая БД (DATABASE_URL)
+# sqlite - локальный файл SQLite, для разработки и бенчмарков без сервера MySQL
+# memory - SQLite в памяти, чистая БД на каждый запуск (повторяемые замеры);
+#          общий кеш (cache=shared), чтобы синхронный и асинхронный движки видели одну БД
+# mysql_replica/sqlite_replica - реплики для чтения (см. DB_REPLICA_PROFILE)
+DB_PROFILE = os.getenv("DB_PROFILE", "mysql")
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", str(CONFIG_FOLDER / "terra.db"))
+SQLITE_REPLICA_PATH = os.getenv("SQLITE_REPLICA_PATH", str(CONFIG_FOLDER / "terra_replica.db"))
+
+DATABASE_PROFILES = {
+    "mysql": DATABASE_URL,
+    "sqlite": URL.create("sqlite", database=SQLITE_DB_PATH),
+    "memory": URL.create("sqlite", database="file:terra_memory", query={"mode": "memory", "cache": "shared", "uri": "true"}),
+    "mysql_replica": DATABASE_URL.set(host=os.getenv("DB_REPLICA_HOST", "localhost")),
+    "sqlite_replica": URL.create("sqlite", database=SQLITE_REPLICA_PATH),
+}
+
+# --- Реплика для чтения ---
+# Пустой DB_REPLICA_PROFILE - реплики нет, все запросы идут в основную БД.
+# Чтения списков и отчетов идут на реплику, пока она доступна и отстает не больше REPLICA_MAX_LAG_SECONDS;
+# состояние реплики проверяется не чаще раза в REPLICA_CHECK_INTERVAL секунд,
+# недоступная реплика не опрашивается REPLICA_RETRY_SECONDS секунд
+DB_REPLICA_PROFILE = os.getenv("DB_REPLICA_PROFILE", "")
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "2"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# --- Профили пула соединений ---
+# pool_size/max_overflow - постоянные и временные соединения, pool_recycle - пересоздание через N секунд
+# (меньше wait_timeout MySQL), pool_timeout - сколько ждать свободное соединение,
+# ping_after_idle - pre-ping только для соединений, простоявших в пуле дольше N секунд (None - никогда)
+# workstation - одно рабочее место; shared - много рабочих мест на одном MySQL (экономим max_connections);
+# batch - отчеты и фоновые задачи с параллельными запросами
+DB_POOL_PROFILE = os.getenv("DB_POOL_PROFILE", "workstation")
+POOL_PROFILES = {
+    "workstation": {"pool_size": 5, "max_overflow": 5, "pool_recycle": 1800, "pool_timeout": 30, "ping_after_idle": 60},
+    "shared": {"pool_size": 2, "max_overflow": 3, "pool_recycle": 600, "pool_timeout": 10, "ping_after_idle": 30},
+    "batch": {"pool_size": 10, "max_overflow": 10, "pool_recycle": 3600, "pool_timeout": 60, "ping_after_idle": 300},
+}
+
+# --- Устойчивость к сбоям БД ---
+# Чтения при временных сбоях (обрыв соединения, deadlock) повторяются до DB_RETRY_ATTEMPTS раз с задержкой
+# DB_RETRY_BASE_DELAY * 2^n секунд (не больше DB_RETRY_MAX_DELAY, со случайным разбросом).
+# После CIRCUIT_FAILURE_THRESHOLD сбоев соединения подряд новые подключения CIRCUIT_RESET_TIMEOUT секунд
+# отклоняются сразу, без ожидания таймаута, затем пробуется одно подключение
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "3"))
+DB_RETRY_BASE_DELAY = float(os.getenv("DB_RETRY_BASE_DELAY", "0.1"))
+DB_RETRY_MAX_DELAY = float(os.getenv("DB_RETRY_MAX_DELAY", "2"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "15"))
+
+# --- Инструментирование SQL ---
+# DB_INSTRUMENTATION=1 включает сбор статистики запросов по действиям контроллеров
+DB_INSTRUMENTATION = os.getenv("DB_INSTRUMENTATION", "0") == "1"
+# Сколько раз один и тот же запрос должен выполниться за одно действие, чтобы считаться N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+# Запросы дольше порога (мс) пишутся в AppData/Log/slow_queries.log с планом выполнения; 0 - выключено
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"
+
+# --- Фоновое выполнение запросов ---
+# Потоки QThreadPool для запросов из интерфейса (для SQLite в памяти всегда 1 - одно соединение)
+DB_EXECUTOR_THREADS = int(os.getenv("DB_EXECUTOR_THREADS", "4"))
+
+# --- Журнал движения материалов ---
+# Как часто журнал сворачивается в снимки остатков (минуты); 0 - только вручную
+STOCK_SNAPSHOT_INTERVAL_MINUTES = int(os.getenv("STOCK_SNAPSHOT_INTERVAL_MINUTES", "60"))
+# Движения старше срока (дни), уже учтенные в снимках, удаляются; 0 - хранить все
+STOCK_LEDGER_RETENTION_DAYS = int(os.getenv("STOCK_LEDGER_RETENTION_DAYS", "180"))
+
+# --- Резервирование материалов под заказы ---
+# Как часто фоновая сверка переводит в расход резервы заказов, ушедших из 'Обработка' мимо OrderService (минуты); 0 - только вручную
+STOCK_RESERVATION_RECONCILE_MINUTES = int(os.getenv("STOCK_RESERVATION_RECONCILE_MINUTES", "10"))
+# Заказов за один проход сверки (один запрос на пачку, транзакция на заказ)
+STOCK_RESERVATION_RECONCILE_BATCH = int(os.getenv("STOCK_RESERVATION_RECONCILE_BATCH", "200"))
+
 # --- Настройки безопасности ---
 SECRET_KEY = os.getenv("SECRET_KEY", "a_very_secret_key_for_jwt_or_sessions") # Нужен для токенов/сессий
 PASSWORD_CONTEXT_SCHEMES = ["bcrypt"] # Схема хеширования паролей
@@ -0,0 +1,105 @@
+# async_database.py
+# Асинхронный движок (AsyncEngine/AsyncSession) для тех же профилей, что и database.py.
+# Драйверы: sqlite -> aiosqlite, mysql -> aiomysql. Движок создается лениво при первом обращении,
+# поэтому без установленных async-драйверов синхронная часть приложения работает как раньше.
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from ..config import DATABASE_PROFILES, DB_PROFILE, DB_POOL_PROFILE, DB_CONNECT_TIMEOUT
+from . import database
+from .database import _on_sqlite_connect
+from .instrumentation import install_if_enabled
+from .slow_query_log import slowQueryLog
+from .pool import InstrumentedAsyncAdaptedQueuePool, engine_pool_kwargs, install_pool_telemetry
+from .routing import AsyncRoutingSession, READ_ONLY_KEY, replicaRouter
+from .resilience import install_resilience
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+}
+
+_async_engine: Optional[AsyncEngine] = None
+_async_profile: Optional[str] = None
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession, sync_session_class=AsyncRoutingSession, autoflush=False, expire_on_commit=False)
+
+
+def create_async_db_engine(profile: str = DB_PROFILE, echo: bool = False, pool_profile: str = DB_POOL_PROFILE) -> AsyncEngine:
+    """ Создает AsyncEngine для профиля из config.DATABASE_PROFILES """
+    if profile not in DATABASE_PROFILES:
+        raise ValueError(f"Unknown database profile '{profile}'. Available: {', '.join(DATABASE_PROFILES)}")
+    url = DATABASE_PROFILES[profile]
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for backend '{backend}'")
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+
+    if backend == "sqlite":
+        engine_kwargs = {}
+        if url.database in (None, "", ":memory:"):
+            # Приватная БД в памяти существует только внутри одного соединения
+            engine_kwargs["poolclass"] = StaticPool
+        else:
+            # Файл или память с общим кешем (та же БД, что у синхронного движка): обычный пул для параллельных сессий
+            engine_kwargs.update(poolclass=InstrumentedAsyncAdaptedQueuePool, **engine_pool_kwargs(pool_profile))
+        async_engine = create_async_engine(url, echo=echo, **engine_kwargs)
+        event.listen(async_engine.sync_engine, "connect", _on_sqlite_connect)
+    else:
+        async_engine = create_async_engine(url, poolclass=InstrumentedAsyncAdaptedQueuePool, echo=echo,
+                                           connect_args={"connect_timeout": DB_CONNECT_TIMEOUT}, **engine_pool_kwargs(pool_profile))
+    install_pool_telemetry(async_engine.sync_engine, pool_profile, name=f"{profile}:{url.drivername}:{pool_profile}")
+    install_resilience(async_engine.sync_engine, profile)
+    # События движка вешаются на sync_engine, поэтому статистика и журнал медленных запросов общие
+    install_if_enabled(async_engine.sync_engine)
+    slowQueryLog.install(async_engine.sync_engine)
+
+    logger.info(f"Async database engine created for profile '{profile}' ({url.drivername}).")
+    return async_engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """ AsyncEngine текущего профиля (следует за database.configure_engine) """
+    global _async_engine, _async_profile
+    profile = database.current_profile
+    if _async_engine is None or _async_profile != profile:
+        if _async_engine is not None:
+            logger.warning(f"Async engine for profile '{_async_profile}' replaced without dispose_async_engine()")
+        _async_engine = create_async_db_engine(profile)
+        _async_profile = profile
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+async def dispose_async_engine():
+    """ Закрывает соединения async-движков основной БД и реплики (aiosqlite держит поток на каждое соединение) """
+    global _async_engine, _async_profile
+    await replicaRouter.dispose_async()
+    if _async_engine is None: return
+    await _async_engine.dispose()
+    _async_engine = None
+    _async_profile = None
+
+
+@asynccontextmanager
+async def async_session(read_only: bool = False):
+    """
+    Асинхронная сессия на одну операцию. Для параллельных загрузок каждой нужна своя сессия:
+
+        async with async_session() as db1, async_session() as db2:
+            orders, clients = await asyncio.gather(
+                asyncOrderService.get_filtered_orders(db1, ...), asyncClientService.get_clients(db2))
+
+    read_only=True - сессия только читает, запросы идут на реплику, если она пригодна (routing.py)
+    """
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        if read_only: db.info[READ_ONLY_KEY] = True
+        yield db
@@ -0,0 +1,288 @@
+# async_repositories.py
+# Async-версии репозиториев для AsyncSession. Запросы строятся так же, как в repositories.py
+# (общие построители вроде OrderRepository.apply_filters), меняется только выполнение (await).
+from typing import List, Optional, Type, TypeVar, Generic, Dict, Any, Awaitable, AsyncIterator, Callable, Tuple, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, insert as sql_insert, update as sql_update, delete as sql_delete
+from sqlalchemy.orm.exc import StaleDataError
+from pydantic import BaseModel as PydanticBaseModel
+import logging
+from datetime import datetime
+
+from .database import Base as SQLAlchemyBaseModel
+from .unit_of_work import in_unit_of_work
+from .resilience import DbErrorKind, classify_error, retry_read_async, unavailable_error
+from .repositories import (
+    BULK_CHUNK_SIZE, STREAM_BATCH_SIZE, BaseRepository, ConcurrentModificationError, ClientRepository, WorkerRepository,
+    OrderRepository, ProviderRepository, MaterialRepository
+)
+from .pagination import DEFAULT_PAGE_SIZE, Page, build_page, keyset_order, keyset_statement
+from .read_models import OrderListRow, ProviderListRow, order_list_statement, provider_list_statement
+from .models_sqlalchemy import Client, Order, Worker, Provider, Material, MaterialOnOrder, MaterialProvider
+
+logger = logging.getLogger(__name__)
+
+SQLAlchemyModelType = TypeVar("SQLAlchemyModelType", bound=SQLAlchemyBaseModel)
+ResultType = TypeVar("ResultType")
+
+class AsyncBaseRepository(Generic[SQLAlchemyModelType]):
+    """
+    Базовый async-репозиторий с CRUD операциями (аналог BaseRepository).
+    Внутри async_unit_of_work изменения только flush-атся, вне его каждый вызов фиксирует их сам.
+    Ленивые связи в async недоступны - нужные связи подгружаются явно (selectinload).
+    Ошибки классифицируются так же, как в BaseRepository (resilience.py).
+    Ключ сортировки и keyset-страниц - тот же page_key, что у синхронного репозитория.
+    Версия строки (version_id_col) проверяется так же: устаревшая версия - ConcurrentModificationError.
+    """
+    page_key: Tuple[str, ...] = ("id",)
+    page_descending: bool = False
+    derived_columns: Dict[str, Tuple[str, Callable[[Any], Any]]] = {} # см. BaseRepository.derived_columns
+    def __init__(self, model: Type[SQLAlchemyModelType]): self._model = model
+    def _derive(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        for field, (column, derive) in self.derived_columns.items():
+            if field in values: values[column] = derive(values[field])
+        return values
+    async def _commit(self, db: AsyncSession, db_obj: Optional[SQLAlchemyModelType] = None):
+        if in_unit_of_work(db): await db.flush(); return
+        await db.commit()
+        if db_obj is not None: await db.refresh(db_obj)
+    async def _rollback(self, db: AsyncSession):
+        if not in_unit_of_work(db): await db.rollback()
+    async def _read(self, db: AsyncSession, run: Callable[[], Awaitable[ResultType]], default: ResultType, action: str) -> ResultType:
+        try: return await retry_read_async(db, run)
+        except Exception as e:
+            logger.error(f"Async Repo Error {action}: {e}"); await self._rollback(db)
+            if classify_error(e) is DbErrorKind.CONNECTION: raise unavailable_error(e) from e
+            return default
+    async def _write_failed(self, db: AsyncSession, action: str, error: Exception, ids: Sequence[str] = ()):
+        if isinstance(error, StaleDataError):
+            logger.warning(f"Async Repo: Conflict {action}: {error}"); await self._rollback(db)
+            raise ConcurrentModificationError(self._model.__name__, *ids) from error
+        logger.error(f"Async Repo Error {action}: {error}"); await self._rollback(db)
+        if classify_error(error) is DbErrorKind.CONNECTION: raise unavailable_error(error) from error
+        raise error
+    @property
+    def _versioned(self) -> bool:
+        return self._model.__mapper__.version_id_col is not None
+    def _next_version(self) -> Dict[str, Any]:
+        return {"version": self._model.version + 1} if self._versioned else {}
+    def _check_version(self, db_obj: SQLAlchemyModelType, expected: Optional[int]):
+        if expected is not None and expected != db_obj.version:
+            logger.warning(f"Async Repo: {self._model.__name__} id {db_obj.id} is at version {db_obj.version}, update expected {expected}")
+            raise ConcurrentModificationError(self._model.__name__, db_obj.id, expected=expected, actual=db_obj.version)
+    @staticmethod
+    async def _scalar_one_or_none(db: AsyncSession, statement):
+        return (await db.execute(statement)).scalar_one_or_none()
+    @staticmethod
+    async def _scalars(db: AsyncSession, statement):
+        return (await db.execute(statement)).scalars().all()
+    async def get(self, db: AsyncSession, id: str) -> Optional[SQLAlchemyModelType]:
+        statement = select(self._model).where(self._model.id == id)
+        return await self._read(db, lambda: self._scalar_one_or_none(db, statement), None, f"getting {self._model.__name__} by id {id}")
+    async def get_multi(self, db: AsyncSession, *, skip: int = 0, limit: Optional[int] = None) -> List[SQLAlchemyModelType]:
+        statement = select(self._model).order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        if skip: statement = statement.offset(skip)
+        if limit is not None: statement = statement.limit(limit)
+        return await self._read(db, lambda: self._scalars(db, statement), [], f"getting multiple {self._model.__name__}")
+    async def get_page(self, db: AsyncSession, *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, statement=None) -> Page[SQLAlchemyModelType]:
+        paged, direction = keyset_statement(
+            select(self._model) if statement is None else statement,
+            self._model, self.page_key, limit, cursor, self.page_descending)
+        rows = await self._read(db, lambda: self._scalars(db, paged), [], f"getting page of {self._model.__name__}")
+        return build_page(rows, self.page_key, limit, cursor, direction)
+    async def stream(self, db: AsyncSession, *, batch_size: int = STREAM_BATCH_SIZE, statement=None) -> AsyncIterator[SQLAlchemyModelType]:
+        """ Потоковое чтение пачками через серверный курсор (см. BaseRepository.stream) """
+        if statement is None:
+            statement = select(self._model).order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        result = None
+        try:
+            result = await db.stream_scalars(statement.execution_options(yield_per=batch_size))
+            async for obj in result: yield obj
+        except Exception as e: await self._write_failed(db, f"streaming {self._model.__name__}", e)
+        finally:
+            if result is not None: await result.close()
+    async def create(self, db: AsyncSession, *, obj_in: PydanticBaseModel | Dict[str, Any]) -> SQLAlchemyModelType:
+        db_obj = self._model(**BaseRepository._create_data(obj_in))
+        try:
+            db.add(db_obj)
+            await self._commit(db, db_obj)
+            logger.info(f"Async Repo: Created {self._model.__name__} with id {db_obj.id}")
+            return db_obj
+        except Exception as e: await self._write_failed(db, f"creating {self._model.__name__}", e)
+    async def update(self, db: AsyncSession, *, db_obj: SQLAlchemyModelType, obj_in: PydanticBaseModel | Dict[str, Any]) -> SQLAlchemyModelType:
+        if isinstance(obj_in, PydanticBaseModel): update_data = obj_in.model_dump(exclude_unset=True)
+        else: update_data = dict(obj_in)
+        if self._versioned: self._check_version(db_obj, update_data.pop('version', None))
+        if not update_data: logger.warning(f"Async Repo: Update called for {self._model.__name__} id {db_obj.id} with no data."); return db_obj
+        for field, value in update_data.items():
+            if hasattr(db_obj, field): setattr(db_obj, field, value)
+            else: logger.warning(f"Async Repo: Field '{field}' not found in {self._model.__name__} during update.")
+        id = db_obj.id # После неудачного flush атрибуты сброшены, а ленивой загрузки в async нет
+        try:
+            db.add(db_obj); await self._commit(db, db_obj)
+            logger.info(f"Async Repo: Updated {self._model.__name__} with id {id}")
+            return db_obj
+        except Exception as e: await self._write_failed(db, f"updating {self._model.__name__} id {id}", e, [id])
+    async def remove(self, db: AsyncSession, *, id: str) -> Optional[SQLAlchemyModelType]:
+        obj = await self.get(db, id=id)
+        if obj:
+            try:
+                await db.delete(obj); await self._commit(db)
+                logger.info(f"Async Repo: Deleted {self._model.__name__} with id {id}")
+                return obj
+            except Exception as e: await self._write_failed(db, f"deleting {self._model.__name__} id {id}", e, [id])
+        else: logger.warning(f"Async Repo: Delete failed. {self._model.__name__} with id {id} not found."); return None
+
+    # --- Пакетные операции (см. BaseRepository.create_many) ---
+    async def create_many(self, db: AsyncSession, *, objs_in: Sequence[PydanticBaseModel | Dict[str, Any]]) -> List[str]:
+        rows = [self._derive(BaseRepository._create_data(obj_in)) for obj_in in objs_in]
+        if not rows: return []
+        try:
+            await db.execute(sql_insert(self._model), rows); await self._commit(db)
+            logger.info(f"Async Repo: Created {len(rows)} {self._model.__name__} rows")
+            return [row['id'] for row in rows]
+        except Exception as e: await self._write_failed(db, f"creating {len(rows)} {self._model.__name__} rows", e)
+    async def update_many(self, db: AsyncSession, *, objs_in: Sequence[Dict[str, Any]]) -> int:
+        rows = [self._derive(dict(obj_in)) for obj_in in objs_in]
+        if not rows: return 0
+        if any(not row.get('id') for row in rows): raise ValueError(f"update_many: every {self._model.__name__} row needs an 'id'")
+        try:
+            if self._versioned: await self._fill_versions(db, rows)
+            await db.execute(sql_update(self._model), rows)
+            matched = len(rows) # См. BaseRepository.update_many: ненайденный id - StaleDataError выше
+            self._expire_loaded(db, [row['id'] for row in rows])
+            await self._commit(db)
+            logger.info(f"Async Repo: Updated {matched} {self._model.__name__} rows")
+            return matched
+        except Exception as e: await self._write_failed(db, f"updating {len(rows)} {self._model.__name__} rows", e, [row['id'] for row in rows])
+    async def _fill_versions(self, db: AsyncSession, rows: List[Dict[str, Any]]):
+        # См. BaseRepository._fill_versions: строка без "version" проверяется по текущей версии (один SELECT)
+        missing = [row['id'] for row in rows if row.get('version') is None]
+        current = {}
+        for start in range(0, len(missing), BULK_CHUNK_SIZE):
+            statement = select(self._model.id, self._model.version).where(self._model.id.in_(missing[start:start + BULK_CHUNK_SIZE]))
+            current.update((await db.execute(statement)).all())
+        for row in rows:
+            if row.get('version') is None: row['version'] = current.get(row['id'], 0)
+    async def update_where(self, db: AsyncSession, *, ids: Sequence[str], obj_in: PydanticBaseModel | Dict[str, Any]) -> int:
+        values = self._derive(obj_in.model_dump(exclude_unset=True) if isinstance(obj_in, PydanticBaseModel) else dict(obj_in))
+        ids = list(dict.fromkeys(ids))
+        if not ids or not values: return 0
+        try:
+            updated = 0
+            for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                chunk = ids[start:start + BULK_CHUNK_SIZE]
+                statement = sql_update(self._model).where(self._model.id.in_(chunk)).values(**values, **self._next_version())
+                updated += (await db.execute(statement.execution_options(synchronize_session=False))).rowcount
+            self._expire_loaded(db, ids)
+            await self._commit(db)
+            logger.info(f"Async Repo: Updated {updated} {self._model.__name__} rows ({', '.join(values)})")
+            return updated
+        except Exception as e: await self._write_failed(db, f"updating {len(ids)} {self._model.__name__} rows", e)
+    async def delete_many(self, db: AsyncSession, *, ids: Sequence[str]) -> int:
+        ids = list(dict.fromkeys(ids))
+        if not ids: return 0
+        try:
+            deleted = 0
+            for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                statement = sql_delete(self._model).where(self._model.id.in_(ids[start:start + BULK_CHUNK_SIZE]))
+                deleted += (await db.execute(statement.execution_options(synchronize_session=False))).rowcount
+            for id in ids:
+                obj = db.identity_map.get(db.identity_key(self._model, id))
+                if obj is not None: db.expunge(obj)
+            await self._commit(db)
+            logger.info(f"Async Repo: Deleted {deleted} {self._model.__name__} rows")
+            return deleted
+        except Exception as e: await self._write_failed(db, f"deleting {len(ids)} {self._model.__name__} rows", e)
+    def _expire_loaded(self, db: AsyncSession, ids: Sequence[str]):
+        for id in ids:
+            obj = db.identity_map.get(db.identity_key(self._model, id))
+            if obj is not None: db.expire(obj)
+
+# --- Конкретные репозитории ---
+class AsyncClientRepository(AsyncBaseRepository[Client]):
+    derived_columns = ClientRepository.derived_columns
+    def __init__(self): super().__init__(Client)
+
+class AsyncWorkerRepository(AsyncBaseRepository[Worker]):
+    derived_columns = WorkerRepository.derived_columns
+    def __init__(self): super().__init__(Worker)
+
+class AsyncProviderRepository(AsyncBaseRepository[Provider]):
+    page_key = ProviderRepository.page_key
+    def __init__(self): super().__init__(Provider)
+    async def list_rows(self, db: AsyncSession) -> List[ProviderListRow]:
+        statement = provider_list_statement().order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        async def rows(): return [ProviderListRow._make(row) for row in await db.execute(statement)]
+        return await self._read(db, rows, [], "listing provider rows")
+
+class AsyncMaterialRepository(AsyncBaseRepository[Material]):
+    """ Только чтение остатков: balance меняется синхронным MaterialService / MaterialRepository (с движением в журнале) """
+    page_key = MaterialRepository.page_key
+    def __init__(self): super().__init__(Material)
+    @staticmethod
+    def _reject_balance(values: PydanticBaseModel | Dict[str, Any]):
+        if 'balance' in (values.model_fields_set if isinstance(values, PydanticBaseModel) else values):
+            raise ValueError("AsyncMaterialRepository: balance changes go through MaterialRepository (stock ledger)")
+    async def update(self, db: AsyncSession, *, db_obj: Material, obj_in: PydanticBaseModel | Dict[str, Any]) -> Material:
+        self._reject_balance(obj_in)
+        return await super().update(db, db_obj=db_obj, obj_in=obj_in)
+    async def update_many(self, db: AsyncSession, *, objs_in: Sequence[Dict[str, Any]]) -> int:
+        for obj_in in objs_in: self._reject_balance(obj_in)
+        return await super().update_many(db, objs_in=objs_in)
+    async def update_where(self, db: AsyncSession, *, ids: Sequence[str], obj_in: PydanticBaseModel | Dict[str, Any]) -> int:
+        self._reject_balance(obj_in)
+        return await super().update_where(db, ids=ids, obj_in=obj_in)
+
+class AsyncOrderRepository(AsyncBaseRepository[Order]):
+    page_key, page_descending = OrderRepository.page_key, OrderRepository.page_descending
+    def __init__(self): super().__init__(Order)
+
+    async def find_with_filters(self, db: AsyncSession, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[Order]:
+        """Find orders with multiple filters (client и worker подгружаются сразу - ленивой загрузки в async нет)"""
+        statement = OrderRepository.apply_filters(
+            select(self._model).options(selectinload(self._model.client), selectinload(self._model.worker)),
+            filters, date_from, date_to).order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        return await self._read(db, lambda: self._scalars(db, statement), [], f"finding orders with filters {filters}")
+
+    async def list_rows_with_filters(self, db: AsyncSession, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[OrderListRow]:
+        """Filtered orders as lightweight rows (see OrderRepository.list_rows_with_filters)"""
+        statement = OrderRepository.apply_filters(order_list_statement(), filters, date_from, date_to)
+        statement = statement.order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        async def rows(): return [OrderListRow._make(row) for row in await db.execute(statement)]
+        return await self._read(db, rows, [], f"listing order rows with filters {filters}")
+
+    async def find_page_with_filters(self, db: AsyncSession, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                                     *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Order]:
+        """Keyset page of filtered orders, newest first (client и worker подгружаются сразу)"""
+        statement = OrderRepository.apply_filters(
+            select(self._model).options(selectinload(self._model.client), selectinload(self._model.worker)),
+            filters, date_from, date_to)
+        return await self.get_page(db, limit=limit, cursor=cursor, statement=statement)
+
+    async def list_rows_page_with_filters(self, db: AsyncSession, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                                          *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[OrderListRow]:
+        """Keyset page of filtered order rows (see OrderRepository.list_rows_page_with_filters)"""
+        paged, direction = keyset_statement(OrderRepository.apply_filters(order_list_statement(), filters, date_from, date_to),
+                                            self._model, self.page_key, limit, cursor, self.page_descending)
+        async def rows(): return [OrderListRow._make(row) for row in await db.execute(paged)]
+        return build_page(await self._read(db, rows, [], f"getting page of order rows with filters {filters}"), self.page_key, limit, cursor, direction)
+
+    async def count_by_status_with_filters(self, db: AsyncSession, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> Dict[str, int]:
+        """Order counts per status in one GROUP BY query"""
+        statement = OrderRepository.status_counts_statement(filters, date_from, date_to)
+        async def counts(): return OrderRepository.status_counts(await db.execute(statement))
+        return await self._read(db, counts, OrderRepository.status_counts([]), f"counting orders by status with filters {filters}")
+
+    async def count_with_filters(self, db: AsyncSession, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> int:
+        """Count orders with multiple filters"""
+        statement = OrderRepository.apply_filters(select(func.count()).select_from(self._model), filters, date_from, date_to)
+        async def count(): return (await db.execute(statement)).scalar() or 0
+        return await self._read(db, count, 0, f"counting orders with filters {filters}")
+
+class AsyncMaterialOnOrderRepository(AsyncBaseRepository[MaterialOnOrder]):
+    def __init__(self): super().__init__(MaterialOnOrder)
+
+class AsyncMaterialProviderRepository(AsyncBaseRepository[MaterialProvider]):
+    def __init__(self): super().__init__(MaterialProvider)
@@ -1,5 +1,5 @@
 # controllers.py
-from typing import Dict, List, Any, Optional, Type, TypeVar, Generic
+from typing import Dict, Iterator, List, Any, Optional, Type, TypeVar, Generic
 from sqlalchemy.orm import Session
 import logging
 import re
@@ -14,6 +14,7 @@ from .models_pydantic import LoginRequest, ClientUpdate, ClientCreate, WorkerUpd
 
 # Импортируем сервисы
 from .services import client_service, worker_service, provider_service, material_service, order_service, auth_service
+from .services import stock_ledger_service, reservation_service
 from .services.auth_service import AuthService
 from .services.material_provider_service import MaterialProviderService
 
@@ -24,9 +25,15 @@ from .models_pydantic import (
     Client, ClientCreate, ClientUpdate, Order, OrderCreate, OrderUpdate,
     Worker, WorkerCreate, WorkerUpdate, Provider, ProviderCreate, ProviderUpdate,
     Material, MaterialCreate, MaterialUpdate, MaterialOnOrder, MaterialProvider, MaterialProviderCreate,
-    OrderStatus, AuthenticatedUser, BaseModel as PydanticBaseModel
+    OrderStatus, StockMovement, AuthenticatedUser, BaseModel as PydanticBaseModel
 )
 from .database import get_db # Важно для получения сессии
+from .instrumentation import controller_action
+from .unit_of_work import unit_of_work
+from .routing import read_only, reading
+from .pagination import DEFAULT_PAGE_SIZE, Page
+from .repositories import STREAM_BATCH_SIZE, ConcurrentModificationError
+from .read_models import OrderListRow, ProviderListRow
 from .utils import get_password_hash, verify_password, extract_phone_digits
 
 logger = logging.getLogger(__name__)
@@ -37,6 +44,13 @@ class BaseController:
     def __init__(self):
         pass
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Каждый публичный метод контроллера - отдельное действие для статистики SQL (instrumentation.py)
+        for name, attr in list(vars(cls).items()):
+            if callable(attr) and not name.startswith("_"):
+                setattr(cls, name, controller_action(f"{cls.__name__}.{name}")(attr))
+
 # --- Контроллеры CRUD ---
 
 class ClientController(BaseController):
@@ -46,18 +60,24 @@ class ClientController(BaseController):
     def get_one(self, db: Session, id: str) -> Optional[Client]:
         logger.debug(f"Ctrl: Get client id={id}")
         return self.service.get_client(db, client_id=id)
-    def get_all(self, db: Session, skip: int = 0, limit: int = 100) -> List[Client]:
+    @read_only
+    def get_all(self, db: Session, skip: int = 0, limit: Optional[int] = None) -> List[Client]:
         logger.debug(f"Ctrl: Get clients skip={skip} limit={limit}")
         return self.service.get_clients(db, skip=skip, limit=limit)
+    @read_only
+    def get_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Client]:
+        logger.debug(f"Ctrl: Get clients page limit={limit} cursor={cursor}")
+        return self.service.get_clients_page(db, limit=limit, cursor=cursor)
     def create(self, db: Session, client_create: ClientCreate) -> Optional[Client]:
         try:
             # Extract phone digits for consistent storage
             phone_digits = extract_phone_digits(client_create.phone)
             
-            # Check if client with this phone already exists
-            existing_client = self.get_by_phone(db, phone_digits)
-            if existing_client:
-                raise ValueError(f"Client with phone {client_create.phone} already exists")
+            # Check if client with this phone or email already exists (one indexed query)
+            for existing_client in self.service.repository.find_by_phone_or_mail(db, phone=phone_digits, email=client_create.mail):
+                if existing_client.phone_norm and existing_client.phone_norm == phone_digits:
+                    raise ValueError(f"Client with phone {client_create.phone} already exists")
+                raise ValueError(f"Client with email {client_create.mail} already exists")
             
             # Create client data dictionary from pydantic model
             client_data = client_create.model_dump()
@@ -74,18 +94,18 @@ class ClientController(BaseController):
             db_client = models.Client(**client_data, hash_password=hash_password)
             
             # Add to database
-            db.add(db_client)
-            db.commit()
+            with unit_of_work(db):
+                db.add(db_client)
             db.refresh(db_client)
             
             return db_client
         except Exception as e:
-            db.rollback()
             print(f"Service Error creating client: {str(e)}")
             raise
     def update(self, db: Session, id: str, data: ClientUpdate) -> Optional[Client]:
         logger.debug(f"Ctrl: Update client id={id}")
         try: return self.service.update_client(db, client_id=id, client_in=data)
+        except ConcurrentModificationError: raise # Конфликт версий - интерфейсу: перечитать данные и повторить
         except Exception as e: logger.error(f"Ctrl Error: {e}"); return None
     def delete(self, db: Session, id: str) -> bool:
         logger.debug(f"Ctrl: Delete client id={id}")
@@ -102,16 +122,8 @@ class ClientController(BaseController):
     def get_by_email_or_phone(self, db: Session, email: str, phone: str) -> Optional[Client]:
         logger.debug(f"Ctrl: Get client by email={email} or phone={phone}")
         try:
-            # First try by phone
-            client = self.get_by_phone(db, phone)
-            if client:
-                return client
-            # Then try by email
-            clients = self.get_all(db)
-            for client in clients:
-                if client.mail == email:
-                    return client
-            return None
+            # Один запрос по phone_norm OR mail_norm; совпадение по телефону важнее
+            return self.service.find_client_by_phone_or_email(db, phone=phone, email=email)
         except Exception as e:
             logger.error(f"Ctrl Error: {e}")
             return None
@@ -121,9 +133,14 @@ class WorkerController(BaseController):
     def get_one(self, db: Session, id: str) -> Optional[Worker]:
         logger.debug(f"Ctrl: Get worker id={id}")
         return self.service.get_worker(db, worker_id=id)
-    def get_all(self, db: Session, skip: int = 0, limit: int = 100) -> List[Worker]:
+    @read_only
+    def get_all(self, db: Session, skip: int = 0, limit: Optional[int] = None) -> List[Worker]:
         logger.debug(f"Ctrl: Get workers skip={skip} limit={limit}")
         return self.service.get_workers(db, skip=skip, limit=limit)
+    @read_only
+    def get_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Worker]:
+        logger.debug(f"Ctrl: Get workers page limit={limit} cursor={cursor}")
+        return self.service.get_workers_page(db, limit=limit, cursor=cursor)
     def create(self, db: Session, data: WorkerCreate) -> Optional[Worker]:
         logger.debug(f"Ctrl: Create worker with phone={data.phone}")
         try: return self.service.create_worker(db, worker_in=data)
@@ -131,6 +148,7 @@ class WorkerController(BaseController):
     def update(self, db: Session, id: str, data: WorkerUpdate) -> Optional[Worker]:
         logger.debug(f"Ctrl: Update worker id={id}")
         try: return self.service.update_worker(db, worker_id=id, worker_in=data)
+        except ConcurrentModificationError: raise
         except Exception as e: logger.error(f"Ctrl Error: {e}"); return None
     def delete(self, db: Session, id: str) -> bool:
         logger.debug(f"Ctrl: Delete worker id={id}")
@@ -150,9 +168,18 @@ class ProviderController(BaseController):
     def get_one(self, db: Session, id: str) -> Optional[Provider]:
         logger.debug(f"Ctrl: Get provider id={id}")
         return self.service.get_provider(db, provider_id=id)
-    def get_all(self, db: Session, skip: int = 0, limit: int = 100) -> List[Provider]:
+    @read_only
+    def get_all(self, db: Session, skip: int = 0, limit: Optional[int] = None) -> List[Provider]:
         logger.debug(f"Ctrl: Get providers skip={skip} limit={limit}")
         return self.service.get_providers(db, skip=skip, limit=limit)
+    @read_only
+    def get_list_rows(self, db: Session) -> List[ProviderListRow]:
+        logger.debug("Ctrl: Get provider list rows")
+        return self.service.get_provider_rows(db)
+    @read_only
+    def get_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Provider]:
+        logger.debug(f"Ctrl: Get providers page limit={limit} cursor={cursor}")
+        return self.service.get_providers_page(db, limit=limit, cursor=cursor)
     def create(self, db: Session, data: ProviderCreate) -> Optional[Provider]:
         logger.debug(f"Ctrl: Create provider name={data.name}")
         try: return self.service.create_provider(db, provider_in=data)
@@ -160,6 +187,7 @@ class ProviderController(BaseController):
     def update(self, db: Session, id: str, data: ProviderUpdate) -> Optional[Provider]:
         logger.debug(f"Ctrl: Update provider id={id}")
         try: return self.service.update_provider(db, provider_id=id, provider_in=data)
+        except ConcurrentModificationError: raise
         except Exception as e: logger.error(f"Ctrl Error: {e}"); return None
     def delete(self, db: Session, id: str) -> bool:
         logger.debug(f"Ctrl: Delete provider id={id}")
@@ -167,20 +195,42 @@ class ProviderController(BaseController):
         except Exception as e: logger.error(f"Ctrl Error: {e}"); return False
 
 class MaterialController(BaseController):
-    def __init__(self): self.service = material_service.MaterialService()
+    def __init__(self):
+        self.service = material_service.MaterialService()
+        self.ledger = stock_ledger_service.StockLedgerService()
+        self.reservations = reservation_service.StockReservationService()
     def get_one(self, db: Session, id: str) -> Optional[Material]:
         logger.debug(f"Ctrl: Get material id={id}")
         return self.service.get_material(db, material_id=id)
-    def get_all(self, db: Session, skip: int = 0, limit: int = 100) -> List[Material]:
+    @read_only
+    def get_all(self, db: Session, skip: int = 0, limit: Optional[int] = None) -> List[Material]:
         logger.debug(f"Ctrl: Get materials skip={skip} limit={limit}")
         return self.service.get_materials(db, skip=skip, limit=limit)
+    @read_only
+    def iter_all(self, db: Session, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Material]:
+        logger.debug(f"Ctrl: Stream materials batch_size={batch_size}")
+        yield from self.service.iter_materials(db, batch_size=batch_size)
+    @read_only
+    def get_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Material]:
+        logger.debug(f"Ctrl: Get materials page limit={limit} cursor={cursor}")
+        return self.service.get_materials_page(db, limit=limit, cursor=cursor)
     def create(self, db: Session, data: MaterialCreate) -> Optional[Material]:
         logger.debug(f"Ctrl: Create material type={data.type}")
         try: return self.service.create_material(db, material_in=data)
         except Exception as e: logger.error(f"Ctrl Error: {e}"); return None
+    def create_many(self, db: Session, data: List[MaterialCreate]) -> List[str]:
+        logger.debug(f"Ctrl: Create {len(data)} materials")
+        try: return self.service.create_materials(db, materials_in=data)
+        except Exception as e: logger.error(f"Ctrl Error: {e}"); return []
+    def update_many(self, db: Session, data: Dict[str, MaterialUpdate]) -> int:
+        logger.debug(f"Ctrl: Update {len(data)} materials")
+        try: return self.service.update_materials(db, materials_in=data)
+        except ConcurrentModificationError: raise
+        except Exception as e: logger.error(f"Ctrl Error: {e}"); return 0
     def update(self, db: Session, id: str, data: MaterialUpdate) -> Optional[Material]:
         logger.debug(f"Ctrl: Update material id={id}")
         try: return self.service.update_material(db, material_id=id, material_in=data)
+        except ConcurrentModificationError: raise
         except Exception as e: logger.error(f"Ctrl Error: {e}"); return None
     def delete(self, db: Session, id: str) -> bool:
         logger.debug(f"Ctrl: Delete material id={id}")
@@ -190,15 +240,55 @@ class MaterialController(BaseController):
         logger.debug(f"Ctrl: Adjust balance material={material_id} change={quantity_change}")
         try: return self.service.change_balance(db, material_id=material_id, quantity_change=quantity_change)
         except Exception as e: logger.error(f"Ctrl Error: {e}"); return None
+    @read_only
+    def balance_as_of(self, db: Session, material_id: str, at: datetime) -> int:
+        logger.debug(f"Ctrl: Balance material={material_id} as of {at}")
+        return self.ledger.balance_as_of(db, material_id=material_id, at=at)
+    @read_only
+    def get_consumption(self, db: Session, date_from: datetime, date_to: datetime) -> Dict[str, int]:
+        logger.debug(f"Ctrl: Material consumption {date_from} - {date_to}")
+        return self.ledger.get_consumption(db, date_from=date_from, date_to=date_to)
+    @read_only
+    def get_movements_page(self, db: Session, material_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                           cursor: Optional[str] = None) -> Page[StockMovement]:
+        logger.debug(f"Ctrl: Get movements page material={material_id} limit={limit} cursor={cursor}")
+        return self.ledger.get_movements_page(db, material_id=material_id, limit=limit, cursor=cursor)
+    def snapshot_stock(self, db: Session) -> Dict[str, int]:
+        logger.debug("Ctrl: Stock ledger snapshot")
+        return self.ledger.run_snapshot(db)
+    @read_only
+    def get_available(self, db: Session, material_ids: Optional[List[str]] = None) -> Dict[str, int]:
+        logger.debug(f"Ctrl: Available stock materials={material_ids}")
+        return self.reservations.get_available(db, material_ids=material_ids)
+    def reconcile_reservations(self, db: Session) -> Dict[str, int]:
+        logger.debug("Ctrl: Stock reservation reconcile")
+        return self.reservations.reconcile(db)
 
 class OrderController(BaseController):
     def __init__(self): self.service = order_service.OrderService()
     def get_one(self, db: Session, id: str, load_related: bool = True) -> Optional[Order]:
         logger.debug(f"Ctrl: Get order id={id} related={load_related}")
         return self.service.get_order(db, order_id=id, load_related=load_related)
-    def get_all(self, db: Session, skip: int = 0, limit: int = 100) -> List[Order]:
+    @read_only
+    def get_all(self, db: Session, skip: int = 0, limit: Optional[int] = None) -> List[Order]:
         logger.debug(f"Ctrl: Get orders skip={skip} limit={limit}")
         return self.service.get_orders(db, skip=skip, limit=limit)
+    @read_only
+    def get_list_rows(self, db: Session, worker_id: Optional[str] = None, status: Optional[str] = None,
+                      client_id: Optional[str] = None, date_from: Optional[datetime] = None,
+                      date_to: Optional[datetime] = None) -> List[OrderListRow]:
+        logger.debug(f"Ctrl: Get order list rows worker={worker_id} status={status} client={client_id}")
+        return self.service.get_filtered_order_rows(
+            db, worker_id=worker_id, status=status, client_id=client_id, date_from=date_from, date_to=date_to)
+    @read_only
+    def get_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, *,
+                 worker_id: Optional[str] = None, status: Optional[str] = None, client_id: Optional[str] = None,
+                 date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> Page[Order]:
+        logger.debug(f"Ctrl: Get orders page limit={limit} cursor={cursor} worker={worker_id} status={status} client={client_id}")
+        return self.service.get_filtered_orders_page(
+            db, worker_id=worker_id, status=status, client_id=client_id,
+            date_from=date_from, date_to=date_to, limit=limit, cursor=cursor)
+    @read_only
     def get_by_client(self, db: Session, client_id: str, status: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Order]:
          logger.debug(f"Ctrl: Get orders client={client_id}")
          return self.service.get_orders_by_client(db, client_id=client_id)
@@ -208,12 +298,15 @@ class OrderController(BaseController):
         from .database import SessionLocal
         db = SessionLocal()
         try:
-            return self.service.get_orders_by_client(db, client_id=client_id)
+            with reading(db):
+                return self.service.get_orders_by_client(db, client_id=client_id)
         finally:
             db.close()
+    @read_only
     def get_by_worker(self, db: Session, worker_id: str) -> List[Order]:
          logger.debug(f"Ctrl: Get orders worker={worker_id}")
          return self.service.get_orders_by_worker(db, worker_id=worker_id)
+    @read_only
     def get_by_status(self, db: Session, status: OrderStatus) -> List[Order]:
           logger.debug(f"Ctrl: Get orders status={status.value}")
           return self.service.get_orders_by_status(db, status=status)
@@ -225,6 +318,7 @@ class OrderController(BaseController):
         # Этот метод обновляет только поля самого заказа, не материалы
         logger.debug(f"Ctrl: Update order id={id}")
         try: return self.service.update_order(db, order_id=id, order_in=data)
+        except ConcurrentModificationError: raise
         except Exception as e: logger.error(f"Ctrl Error: {e}"); return None
     def delete(self, db: Session, id: str) -> bool:
         logger.debug(f"Ctrl: Delete order id={id}")
@@ -247,6 +341,7 @@ class OrderController(BaseController):
         logger.debug(f"Ctrl: Get order by id={order_id}")
         return self.get_one(db, order_id, load_related=True)
     
+    @read_only
     def get_filtered_orders(self, db: Session, worker_id: Optional[str] = None, 
                            status: Optional[str] = None, client_id: Optional[str] = None,
                            date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[Order]:
@@ -261,6 +356,18 @@ class OrderController(BaseController):
             logger.error(f"Ctrl Error: {e}")
             return []
             
+    @read_only
+    def count_by_statuses(self, db: Session, worker_id: Optional[str] = None, client_id: Optional[str] = None,
+                          date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> Dict[str, int]:
+        """Order counts for every status in one query"""
+        logger.debug(f"Ctrl: Count orders by status worker={worker_id} client={client_id}")
+        try:
+            return self.service.count_orders_by_statuses(db, worker_id=worker_id, client_id=client_id, date_from=date_from, date_to=date_to)
+        except Exception as e:
+            logger.error(f"Ctrl Error: {e}")
+            return {status.value: 0 for status in OrderStatus}
+
+    @read_only
     def count_by_status(self, db: Session, status: str, worker_id: Optional[str] = None) -> int:
         """Count orders by status"""
         logger.debug(f"Ctrl: Count orders status={status} worker={worker_id}")
@@ -280,9 +387,11 @@ class MaterialProviderController(BaseController):
          logger.debug(f"Ctrl: Unlink link_id={link_id} or provider={provider_id} material={material_id}")
          try: return self.service.unlink_provider_material(db, link_id=link_id, provider_id=provider_id, material_id=material_id)
          except Exception as e: logger.error(f"Ctrl Error: {e}"); return False
+     @read_only
      def get_by_provider(self, db: Session, provider_id: str) -> List[MaterialProvider]:
          logger.debug(f"Ctrl: Get MaterialProvider by provider={provider_id}")
          return self.service.get_links_by_provider(db, provider_id=provider_id)
+     @read_only
      def get_by_material(self, db: Session, material_id: str) -> List[MaterialProvider]:
          logger.debug(f"Ctrl: Get MaterialProvider by material={material_id}")
          return self.service.get_links_by_material(db, material_id=material_id)
@@ -321,11 +430,12 @@ class AuthController(BaseController):
                 logger.debug(f"Client has hash_password: {'hash_password' in dir(client)}")
                 logger.debug(f"Client phone in DB: {client.phone}")
                 
-                if self.verify_password(db, phone_digits, login_data.password, is_employee=False):
+                # Клиент уже загружен - проверяем пароль без повторного поиска по телефону
+                if self.service.password_service.verify_password(login_data.password, client.hash_password):
                     client_dict = {}
                     # Create a dictionary from the SQLAlchemy object instead of using vars()
                     for column in client.__table__.columns:
-                        if column.name != 'hash_password':  # Exclude password hash
+                        if column.name not in ('hash_password', 'phone_norm', 'mail_norm'):  # Exclude password hash and lookup keys
                             client_dict[column.name] = getattr(client, column.name)
                     
                     # Signal successful login for client
@@ -352,11 +462,11 @@ class AuthController(BaseController):
                 logger.debug(f"Worker has hash_password: {'hash_password' in dir(worker)}")
                 logger.debug(f"Worker phone in DB: {worker.phone}")
                 
-                if self.verify_password(db, phone_digits, login_data.password, is_employee=True):
+                if self.service.password_service.verify_password(login_data.password, worker.hash_password):
                     worker_dict = {}
                     # Create a dictionary from the SQLAlchemy object
                     for column in worker.__table__.columns:
-                        if column.name != 'hash_password':  # Exclude password hash
+                        if column.name not in ('hash_password', 'phone_norm', 'mail_norm'):  # Exclude password hash and lookup keys
                             worker_dict[column.name] = getattr(worker, column.name)
                     
                     # Signal successful login for worker
@@ -403,72 +513,18 @@ class AuthController(BaseController):
     
     def _get_client_by_phone(self, db: Session, phone: str):
         """
-        Получает клиента по номеру телефона
+        Получает клиента по номеру телефона в любом формате (один запрос по phone_norm)
         """
-        client_controller = ClientController()
-        client = client_controller.get_by_phone(db, phone)
+        client = ClientController().get_by_phone(db, phone)
         logger.debug(f"Retrieved raw client object for phone {phone}: {client}")
-        if client:
-            logger.debug(f"Client type: {type(client)}")
-            # Debug: show the client's phone number in DB to help troubleshoot
-            logger.debug(f"Client phone in DB: {client.phone}, comparing with requested: {phone}")
-        else:
-            # Try different formats if client not found
-            logger.debug(f"Client not found with exact phone match: {phone}, trying alternative formats")
-            # If we're looking for a 10-digit number, also try with +7 prefix
-            if len(phone) == 10:
-                alt_phone = phone  # Try the original 10-digit format
-                client = client_controller.get_by_phone(db, alt_phone)
-                if not client and phone.isdigit():
-                    # Try with +7 prefix
-                    alt_phone = "+7" + phone
-                    logger.debug(f"Trying with +7 prefix: {alt_phone}")
-                    client = client_controller.get_by_phone(db, alt_phone)
-            
-            # If we're looking for a phone with +7 prefix, also try just the 10 digits
-            elif phone.startswith("+7") and len(phone) > 2:
-                alt_phone = phone[2:]  # Remove +7 prefix
-                logger.debug(f"Trying without +7 prefix: {alt_phone}")
-                client = client_controller.get_by_phone(db, alt_phone)
-                
-            if client:
-                logger.debug(f"Found client with alternative phone format: {client.phone}")
-        
         return client
         
     def _get_worker_by_phone(self, db: Session, phone: str):
         """
-        Получает работника по номеру телефона
+        Получает работника по номеру телефона в любом формате (один запрос по phone_norm)
         """
-        worker_controller = WorkerController()
-        worker = worker_controller.get_by_phone(db, phone)
+        worker = WorkerController().get_by_phone(db, phone)
         logger.debug(f"Retrieved raw worker object for phone {phone}: {worker}")
-        if worker:
-            logger.debug(f"Worker type: {type(worker)}")
-            # Debug: show the worker's phone number in DB to help troubleshoot
-            logger.debug(f"Worker phone in DB: {worker.phone}, comparing with requested: {phone}")
-        else:
-            # Try different formats if worker not found
-            logger.debug(f"Worker not found with exact phone match: {phone}, trying alternative formats")
-            # If we're looking for a 10-digit number, also try with +7 prefix
-            if len(phone) == 10:
-                alt_phone = phone  # Try the original 10-digit format
-                worker = worker_controller.get_by_phone(db, alt_phone)
-                if not worker and phone.isdigit():
-                    # Try with +7 prefix
-                    alt_phone = "+7" + phone
-                    logger.debug(f"Trying with +7 prefix: {alt_phone}")
-                    worker = worker_controller.get_by_phone(db, alt_phone)
-            
-            # If we're looking for a phone with +7 prefix, also try just the 10 digits
-            elif phone.startswith("+7") and len(phone) > 2:
-                alt_phone = phone[2:]  # Remove +7 prefix
-                logger.debug(f"Trying without +7 prefix: {alt_phone}")
-                worker = worker_controller.get_by_phone(db, alt_phone)
-                
-            if worker:
-                logger.debug(f"Found worker with alternative phone format: {worker.phone}")
-                
         return worker
 
 T = TypeVar('T')
\ No newline at end of file
@@ -1,20 +1,81 @@
 # database.py
-from sqlalchemy import create_engine
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import StaticPool
 import logging
 
-from ..config import DATABASE_URL
+from ..config import DATABASE_PROFILES, DB_PROFILE, DB_POOL_PROFILE, DB_REPLICA_PROFILE, DB_CONNECT_TIMEOUT
+from .instrumentation import install_if_enabled
+from .pool import InstrumentedQueuePool, engine_pool_kwargs, install_pool_telemetry
+from .slow_query_log import slowQueryLog
+from .routing import RoutingSession, replicaRouter
+from .resilience import install_resilience
 
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=64)
+def _compile_regexp(pattern: str):
+    return re.compile(pattern)
+
+def _sqlite_regexp(pattern, value):
+    """ Реализация оператора REGEXP для SQLite (семантика поиска, как в MySQL) """
+    # NULL REGEXP ... -> NULL, чтобы CHECK на необязательных полях проходил как в MySQL
+    if value is None or pattern is None: return None
+    return _compile_regexp(pattern).search(str(value)) is not None
+
+def _on_sqlite_connect(dbapi_connection, connection_record):
+    """ Настройка каждого нового соединения SQLite """
+    # X REGEXP Y в SQLite вызывает пользовательскую функцию regexp(Y, X)
+    dbapi_connection.create_function("regexp", 2, _sqlite_regexp, deterministic=True)
+    # Без этого SQLite игнорирует ondelete='CASCADE'/'SET NULL' в ForeignKey
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def create_db_engine(profile: str = DB_PROFILE, echo: bool = False, pool_profile: str = DB_POOL_PROFILE):
+    """ Создает движок SQLAlchemy для профиля из config.DATABASE_PROFILES и профиля пула из config.POOL_PROFILES """
+    if profile not in DATABASE_PROFILES:
+        raise ValueError(f"Unknown database profile '{profile}'. Available: {', '.join(DATABASE_PROFILES)}")
+    url = DATABASE_PROFILES[profile]
+
+    if url.get_backend_name() == "sqlite":
+        # Сессии живут в разных потоках (scoped_session), поэтому отключаем проверку потока
+        engine_kwargs = {"connect_args": {"check_same_thread": False}}
+        if url.database in (None, "", ":memory:") or url.query.get("mode") == "memory":
+            # Одна общая БД в памяти на весь процесс
+            engine_kwargs["poolclass"] = StaticPool
+        else:
+            Path(url.database).parent.mkdir(parents=True, exist_ok=True)
+            engine_kwargs.update(poolclass=InstrumentedQueuePool, **engine_pool_kwargs(pool_profile))
+        db_engine = create_engine(url, echo=echo, **engine_kwargs)
+        event.listen(db_engine, "connect", _on_sqlite_connect)
+    else:
+        # pre-ping на каждый checkout заменен адаптивным (только после простоя), см. pool.py
+        db_engine = create_engine(url, poolclass=InstrumentedQueuePool, echo=echo,
+                                  connect_args={"connect_timeout": DB_CONNECT_TIMEOUT}, **engine_pool_kwargs(pool_profile))
+    install_pool_telemetry(db_engine, pool_profile, name=f"{profile}:{pool_profile}")
+    install_resilience(db_engine, profile)
+    install_if_enabled(db_engine)
+    slowQueryLog.install(db_engine)
+
+    logger.info(f"Database engine created for profile '{profile}' ({url.get_backend_name()}).")
+    return db_engine
+
 try:
     # echo=True полезно для отладки, показывает генерируемые SQL запросы
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True, echo=False)
+    engine = create_db_engine(DB_PROFILE)
+    current_profile = DB_PROFILE
 
     # sessionmaker создает фабрику сессий
     # autocommit=False и autoflush=False - стандартные настройки для ORM
-    SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # RoutingSession отправляет чтения read_only на реплику, если она настроена (routing.py)
+    SessionFactory = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
     # scoped_session обеспечивает уникальную сессию для каждого потока (важно для GUI приложений)
     SessionLocal = scoped_session(SessionFactory)
@@ -23,6 +84,9 @@ try:
     Base = declarative_base()
     logger.info("Database engine and session factory created successfully.")
 
+    if DB_REPLICA_PROFILE:
+        replicaRouter.configure(DB_REPLICA_PROFILE)
+
 except Exception as e:
     logger.error(f"Failed to connect to database or create session factory: {e}")
     # В реальном приложении здесь нужна более надежная обработка ошибок
@@ -30,6 +94,22 @@ except Exception as e:
     raise # Перевыброс исключения, чтобы приложение знало о проблеме
 
 
+def configure_engine(profile: str, echo: bool = False):
+    """
+    Переключает приложение на другой профиль БД во время работы.
+    Полезно для бенчмарков: configure_engine("memory"); init_db(); ...
+    """
+    global engine, current_profile
+    SessionLocal.remove()
+    old_engine = engine
+    engine = create_db_engine(profile, echo=echo)
+    current_profile = profile
+    SessionFactory.configure(bind=engine)
+    old_engine.dispose()
+    replicaRouter.mark_written()
+    return engine
+
+
 def get_db():
     """ Функция-генератор для получения сессии БД """
     db = SessionLocal()
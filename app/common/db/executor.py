@@ -0,0 +1,225 @@
+# executor.py
+# Выполнение запросов к БД вне GUI-потока: задача получает собственную сессию в потоке
+# QThreadPool, результат возвращается в GUI-поток через сигнал. Новый запрос с тем же
+# ключом отменяет ещё не начатый предыдущий, а результат уже выполняющегося отбрасывается.
+# submit_async делает то же для корутин (async-сервисы): они выполняются в цикле asyncio
+# фонового потока, так что несколько загрузок одного экрана идут одновременно.
+import asyncio
+import logging
+import threading
+from itertools import count
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+from sqlalchemy.pool import StaticPool
+
+from ..config import DB_EXECUTOR_THREADS
+from ..signal_bus import signalBus
+from . import database
+
+logger = logging.getLogger(__name__)
+
+
+class DbTask(QRunnable):
+    """ Одна задача: fn(db, *args, **kwargs) в потоке пула """
+
+    def __init__(self, executor: "DbExecutor", ticket: int, fn: Callable, args: tuple, kwargs: dict):
+        super().__init__()
+        self.setAutoDelete(False) # Ссылку держит DbExecutor, пока результат не доставлен
+        self.executor = executor
+        self.ticket = ticket
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled:
+            # Всё равно сообщаем о завершении, чтобы DbExecutor отпустил ссылку на задачу
+            self.executor._taskFinished.emit(self.ticket, None)
+            return
+        db = database.SessionLocal() # scoped_session - своя сессия для каждого потока
+        try:
+            result = self.fn(db, *self.args, **self.kwargs)
+        except Exception as e:
+            logger.error(f"DbExecutor: task {self.ticket} failed: {e}")
+            self.executor._taskFailed.emit(self.ticket, e)
+        else:
+            self.executor._taskFinished.emit(self.ticket, result)
+        finally:
+            database.SessionLocal.remove()
+
+
+class AsyncDbTask:
+    """ Корутина в цикле asyncio; future - concurrent.futures.Future из run_coroutine_threadsafe """
+
+    def __init__(self, executor: "DbExecutor", ticket: int):
+        self.executor = executor
+        self.ticket = ticket
+        self.cancelled = False
+        self.future = None
+
+    def done(self, future):
+        # Вызывается в потоке цикла (или в GUI-потоке при отмене) - в GUI попадаем через сигнал
+        if future.cancelled():
+            self.executor._taskFinished.emit(self.ticket, None)
+        elif future.exception() is not None:
+            logger.error(f"DbExecutor: async task {self.ticket} failed: {future.exception()}")
+            self.executor._taskFailed.emit(self.ticket, future.exception())
+        else:
+            self.executor._taskFinished.emit(self.ticket, future.result())
+
+
+class DbExecutor(QObject):
+    """ Пул потоков для запросов из интерфейса """
+
+    # Внутренние сигналы: испускаются из потока пула, слоты выполняются в GUI-потоке
+    _taskFinished = pyqtSignal(int, object)
+    _taskFailed = pyqtSignal(int, object)
+
+    def __init__(self, max_threads: int = DB_EXECUTOR_THREADS):
+        super().__init__()
+        self.max_threads = max_threads
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(self._thread_count())
+        self._tickets = count(1)
+        self._latest: Dict[Tuple[int, Hashable], int] = {}   # (id(owner), key) -> последний билет
+        self._tasks: Dict[int, Tuple[Tuple[int, Hashable], "DbTask | AsyncDbTask", Optional[Callable], Optional[Callable]]] = {}
+        self._owners = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._taskFinished.connect(self._on_task_finished)
+        self._taskFailed.connect(self._on_task_failed)
+
+    def _thread_count(self) -> int:
+        # SQLite в памяти живёт на одном соединении (StaticPool) - параллельный доступ к нему небезопасен
+        if isinstance(database.engine.pool, StaticPool): return 1
+        return max(1, self.max_threads)
+
+    def submit(self, owner: QObject, key: Hashable, fn: Callable, *args,
+               on_result: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None, **kwargs) -> int:
+        """
+        Ставит fn(db, *args, **kwargs) в очередь пула и возвращает номер задачи.
+        on_result/on_error вызываются в GUI-потоке и только для последней задачи с этим ключом у owner;
+        при уничтожении owner его задачи отменяются.
+
+            dbExecutor.submit(self, "materials", self.material_controller.get_all,
+                              on_result=self._fill_table, on_error=self._on_load_error)
+        """
+        self.pool.setMaxThreadCount(self._thread_count()) # Профиль БД мог смениться (configure_engine)
+        task = self._register(owner, key, lambda ticket: DbTask(self, ticket, fn, args, kwargs), on_result, on_error)
+        self.pool.start(task)
+        return task.ticket
+
+    def submit_async(self, owner: QObject, key: Hashable, coro_fn: Callable, *args,
+                     on_result: Optional[Callable[[Any], None]] = None,
+                     on_error: Optional[Callable[[Exception], None]] = None, **kwargs) -> int:
+        """
+        Запускает корутину coro_fn(*args, **kwargs) в цикле asyncio фонового потока.
+        Правила те же, что у submit; отмена устаревшей задачи прерывает корутину на ближайшем await.
+
+            async def load():
+                async with async_session() as db1, async_session() as db2:
+                    return await asyncio.gather(orders_service.get_filtered_orders(db1), client_service.get_clients(db2))
+            dbExecutor.submit_async(self, "orders", load, on_result=self._on_loaded)
+        """
+        loop = self._ensure_loop()
+        task = self._register(owner, key, lambda ticket: AsyncDbTask(self, ticket), on_result, on_error)
+        task.future = asyncio.run_coroutine_threadsafe(coro_fn(*args, **kwargs), loop)
+        task.future.add_done_callback(task.done)
+        return task.ticket
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, name="DbAsyncLoop", daemon=True)
+            self._loop_thread.start()
+        return self._loop
+
+    def _register(self, owner: QObject, key: Hashable, make_task: Callable, on_result, on_error):
+        slot = (id(owner), key)
+        self.cancel(owner, key)
+
+        ticket = next(self._tickets)
+        task = make_task(ticket)
+        self._latest[slot] = ticket
+        self._tasks[ticket] = (slot, task, on_result, on_error)
+        if id(owner) not in self._owners:
+            self._owners.add(id(owner))
+            owner_id = id(owner)
+            owner.destroyed.connect(lambda *_: self._forget_owner(owner_id))
+        return task
+
+    def cancel(self, owner: QObject, key: Hashable) -> bool:
+        """ Отменяет задачу ключа: не начатая снимается с очереди, результат начатой будет отброшен """
+        ticket = self._latest.pop((id(owner), key), None)
+        if ticket is None: return False
+        entry = self._tasks.get(ticket)
+        if entry is None: return False
+        if self._cancel_task(ticket, entry[1]):
+            logger.debug(f"DbExecutor: task {ticket} {key!r} removed from queue")
+        else:
+            logger.debug(f"DbExecutor: task {ticket} {key!r} already running, result will be dropped")
+        return True
+
+    def _cancel_task(self, ticket: int, task) -> bool:
+        task.cancelled = True
+        if isinstance(task, AsyncDbTask):
+            task.future.cancel() # done() сообщит о завершении, задача уйдет как устаревшая
+            return False
+        if self.pool.tryTake(task):
+            del self._tasks[ticket]
+            return True
+        return False
+
+    def is_busy(self, owner: QObject, key: Hashable) -> bool:
+        return (id(owner), key) in self._latest
+
+    def _forget_owner(self, owner_id: int):
+        self._owners.discard(owner_id)
+        for slot in [s for s in self._latest if s[0] == owner_id]:
+            ticket = self._latest.pop(slot)
+            entry = self._tasks.get(ticket)
+            if entry is not None: self._cancel_task(ticket, entry[1])
+
+    def _take(self, ticket: int):
+        """ Забирает задачу после выполнения; None, если она устарела или отменена """
+        entry = self._tasks.pop(ticket, None)
+        if entry is None: return None
+        slot = entry[0]
+        if self._latest.get(slot) != ticket:
+            logger.debug(f"DbExecutor: dropping stale result of task {ticket} {slot[1]!r}")
+            return None
+        del self._latest[slot]
+        return entry
+
+    @pyqtSlot(int, object)
+    def _on_task_finished(self, ticket: int, result):
+        entry = self._take(ticket)
+        if entry and entry[2]: entry[2](result)
+
+    @pyqtSlot(int, object)
+    def _on_task_failed(self, ticket: int, error):
+        entry = self._take(ticket)
+        if entry is None: return
+        if entry[3]: entry[3](error)
+        else: signalBus.database_error.emit(str(error)) # Общий обработчик ошибок окон
+
+    def shutdown(self, timeout_ms: int = 5000):
+        """ Снимает очередь и ждёт выполняющиеся задачи (вызывать при выходе из приложения) """
+        for ticket, (_, task, _, _) in list(self._tasks.items()): self._cancel_task(ticket, task)
+        self.pool.clear()
+        self.pool.waitForDone(timeout_ms)
+        if self._loop is not None:
+            from .async_database import dispose_async_engine
+            try: asyncio.run_coroutine_threadsafe(dispose_async_engine(), self._loop).result(timeout_ms / 1000)
+            except Exception as e: logger.error(f"DbExecutor: failed to dispose async engine: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout_ms / 1000)
+            self._loop = self._loop_thread = None
+        self._tasks.clear()
+        self._latest.clear()
+
+
+dbExecutor = DbExecutor()
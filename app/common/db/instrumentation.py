@@ -0,0 +1,204 @@
+# instrumentation.py
+# Инструментирование SQL на уровне движка: каждый запрос записывается с текстом,
+# длительностью, числом измененных строк (INSERT/UPDATE/DELETE) и действием контроллера, внутри которого он выполнен.
+# По завершении действия повторяющиеся запросы помечаются как возможный N+1.
+import time
+import inspect
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from ..config import DB_INSTRUMENTATION, N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+
+class StatementStats:
+    """
+    Агрегированная статистика одного параметризованного запроса. rows_affected - только для INSERT/UPDATE/DELETE:
+    для SELECT драйверы (sqlite3, MySQL) отдают rowcount = -1, а строки еще не выбраны
+    """
+    __slots__ = ("statement", "count", "total_time", "max_time", "rows_affected")
+
+    def __init__(self, statement: str):
+        self.statement = statement
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows_affected = 0
+
+    def add(self, duration: float, rows_affected: Optional[int]):
+        self.count += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        if rows_affected is not None and rows_affected > 0: self.rows_affected += rows_affected
+
+    def __repr__(self):
+        return f"<StatementStats(count={self.count}, total={self.total_time * 1000:.1f}ms, rows_affected={self.rows_affected}, sql='{self.statement[:60]}')>"
+
+
+class ActionStats:
+    """ Статистика запросов в рамках одного вызова контроллера """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.statements: Dict[str, StatementStats] = {}
+        self.query_count = 0
+        self.query_time = 0.0
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def record(self, statement: str, duration: float, rows_affected: Optional[int]):
+        stats = self.statements.get(statement)
+        if stats is None:
+            stats = self.statements[statement] = StatementStats(statement)
+        stats.add(duration, rows_affected)
+        self.query_count += 1
+        self.query_time += duration
+
+    def repeated(self, threshold: int) -> List[StatementStats]:
+        """ Запросы, выполненные threshold и более раз (кандидаты в N+1) """
+        return [s for s in self.statements.values() if s.count >= threshold]
+
+    def __repr__(self):
+        return f"<ActionStats(name='{self.name}', queries={self.query_count}, sql={self.query_time * 1000:.1f}ms)>"
+
+
+_current_action: ContextVar[Optional[ActionStats]] = ContextVar("db_current_action", default=None)
+
+
+def pop_start_time(context, key: str):
+    """ handle_error: снимает время начала упавшего запроса со стека в conn.info[key] """
+    conn = context.connection
+    if conn is not None and context.execution_context is not None and conn.info.get(key): conn.info[key].pop()
+
+
+class QueryInstrumentation:
+    """ Сбор статистики SQL через события before/after_cursor_execute """
+
+    def __init__(self, n_plus_one_threshold: int = 5, history_size: int = 200):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.totals: Dict[str, StatementStats] = {}
+        self.actions = deque(maxlen=history_size)   # последние завершенные действия
+        self.flagged = deque(maxlen=history_size)   # действия с подозрением на N+1
+        self._engines = []
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return bool(self._engines)
+
+    def install(self, engine):
+        """ Подключает инструментирование к движку """
+        if engine in self._engines: return
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+        self._engines.append(engine)
+        logger.info(f"SQL instrumentation installed on {engine.url.get_backend_name()} engine.")
+
+    def uninstall(self, engine):
+        if engine not in self._engines: return
+        event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.remove(engine, "handle_error", self._handle_error)
+        self._engines.remove(engine)
+
+    def reset(self):
+        with self._lock:
+            self.totals.clear()
+            self.actions.clear()
+            self.flagged.clear()
+
+    @contextmanager
+    def action(self, name: str):
+        """ Область одного действия. Вложенные вызовы контроллеров входят во внешнее действие. """
+        if _current_action.get() is not None:
+            yield _current_action.get()
+            return
+        stats = ActionStats(name)
+        token = _current_action.set(stats)
+        try:
+            yield stats
+        finally:
+            _current_action.reset(token)
+            stats.duration = time.perf_counter() - stats.started
+            self._finish_action(stats)
+
+    def _finish_action(self, stats: ActionStats):
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        with self._lock:
+            self.actions.append(stats)
+            if repeated: self.flagged.append(stats)
+        logger.debug(f"SQL: {stats.name} - {stats.query_count} queries, {stats.query_time * 1000:.1f} ms in DB, {stats.duration * 1000:.1f} ms total")
+        for s in repeated:
+            logger.warning(
+                f"SQL: possible N+1 in {stats.name}: statement executed {s.count} times "
+                f"({s.total_time * 1000:.1f} ms): {' '.join(s.statement.split())[:300]}"
+            )
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start_time"].pop()
+        rows_affected = None
+        if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+            rows_affected = cursor.rowcount
+        with self._lock:
+            stats = self.totals.get(statement)
+            if stats is None:
+                stats = self.totals[statement] = StatementStats(statement)
+            stats.add(duration, rows_affected)
+        current = _current_action.get()
+        if current is not None:
+            current.record(statement, duration, rows_affected)
+
+    def _handle_error(self, context):
+        # Упавший запрос не доходит до after_cursor_execute - снимаем его время начала,
+        # иначе следующий запрос на этом соединении получит чужое
+        pop_start_time(context, "query_start_time")
+
+    def top_statements(self, limit: int = 10, key: str = "total_time") -> List[StatementStats]:
+        """ Самые "дорогие" запросы за все время (по total_time, count или max_time) """
+        with self._lock:
+            stats = list(self.totals.values())
+        return sorted(stats, key=lambda s: getattr(s, key), reverse=True)[:limit]
+
+
+queryInstrumentation = QueryInstrumentation(n_plus_one_threshold=N_PLUS_ONE_THRESHOLD)
+
+
+def controller_action(name: str):
+    """ Декоратор: вызов метода контроллера считается отдельным действием для статистики SQL """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            # Потоковое чтение: запросы идут во время итерации, а не при вызове
+            @wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not queryInstrumentation.active:
+                    yield from func(*args, **kwargs); return
+                with queryInstrumentation.action(name):
+                    yield from func(*args, **kwargs)
+            return generator_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not queryInstrumentation.active:
+                return func(*args, **kwargs)
+            with queryInstrumentation.action(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def install_if_enabled(engine):
+    """ Подключает инструментирование, если оно включено в конфиге (DB_INSTRUMENTATION=1) """
+    if DB_INSTRUMENTATION:
+        queryInstrumentation.install(engine)
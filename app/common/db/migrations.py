@@ -0,0 +1,257 @@
+# migrations.py
+# Версионные миграции схемы. create_all (init_db) создает только отсутствующие таблицы и не меняет
+# существующие, поэтому индексы, колонки и переносы данных для уже работающих БД описываются здесь.
+# Номер последней примененной миграции хранится в schema_meta (ключ schema_version). Каждая миграция
+# выполняется в своей транзакции вместе с записью номера и должна быть идемпотентной: на новой БД
+# create_all уже создал все по моделям, и миграции только фиксируют версию.
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import MetaData, Table, Index, bindparam, delete, func, insert, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from . import database
+from .schema import read_meta, write_meta, schema_meta_metadata
+from .utils import UUIDUtils, normalize_email, normalize_phone
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION_KEY = "schema_version"
+MIGRATION_LOCK_NAME = "app_schema_migration"
+MIGRATION_LOCK_TIMEOUT = 60 # секунд ожидания миграции, запущенной другим экземпляром приложения
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: Dict[int, Migration] = {}
+
+
+def migration(version: int, description: str):
+    """ Регистрирует функцию upgrade(connection) как миграцию с номером version """
+    def decorator(upgrade: Callable[[Connection], None]):
+        if version in MIGRATIONS: raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS[version] = Migration(version, description, upgrade)
+        return upgrade
+    return decorator
+
+
+def latest_version() -> int:
+    return max(MIGRATIONS, default=0)
+
+
+def schema_version(connection: Connection) -> int:
+    """ Номер последней примененной миграции; 0 для БД, на которой миграции еще не запускались """
+    value = read_meta(connection, SCHEMA_VERSION_KEY)
+    return int(value) if value else 0
+
+
+def pending(current: int) -> List[Migration]:
+    return [MIGRATIONS[version] for version in sorted(MIGRATIONS) if version > current]
+
+
+# --- Идемпотентные операции для миграций ---
+
+def reflect_table(connection: Connection, table_name: str) -> Table:
+    """ Таблица в том виде, в каком она есть в БД (миграции не должны зависеть от текущих моделей) """
+    return Table(table_name, MetaData(), autoload_with=connection)
+
+
+def create_index(connection: Connection, table_name: str, name: str, columns: Sequence[str], unique: bool = False) -> bool:
+    """ CREATE INDEX, если индекса с таким именем еще нет. Возвращает True, если индекс создан """
+    if any(index["name"] == name for index in inspect(connection).get_indexes(table_name)): return False
+    table = reflect_table(connection, table_name)
+    Index(name, *(table.c[column] for column in columns), unique=unique).create(bind=connection)
+    logger.info(f"Created {'unique ' if unique else ''}index {name} on {table_name}({', '.join(columns)}).")
+    return True
+
+
+def add_column(connection: Connection, table_name: str, column_ddl: str) -> bool:
+    """ ALTER TABLE ... ADD COLUMN, если колонки еще нет. column_ddl - определение колонки, начиная с имени """
+    column_name = column_ddl.split()[0]
+    if any(column["name"] == column_name for column in inspect(connection).get_columns(table_name)): return False
+    connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_ddl}"))
+    logger.info(f"Added column {table_name}.{column_name}.")
+    return True
+
+
+# --- Миграции ---
+
+@migration(1, "Keyset pagination index on orders (date, id)")
+def _orders_date_id(connection: Connection):
+    create_index(connection, "orders", "ix_orders_date_id", ["date", "id"])
+
+
+@migration(2, "Composite indexes for order filters, order materials and provider materials")
+def _composite_indexes(connection: Connection):
+    create_index(connection, "orders", "ix_orders_status_worker_date", ["status", "worker", "date"])
+    create_index(connection, "orders", "ix_orders_client_date", ["client", "date"])
+    create_index(connection, "mat_on_order", "ix_mat_on_order_order_material", ["order", "material"])
+
+    # Перед уникальным индексом убираем повторные связи поставщик-материал (остается связь с меньшим id).
+    # Производная таблица с GROUP BY нужна MySQL: он не дает читать из той же таблицы в подзапросе DELETE
+    mat_provider = reflect_table(connection, "mat_provider")
+    keep = (select(func.min(mat_provider.c.id).label("id"))
+            .group_by(mat_provider.c.provider, mat_provider.c.material).subquery("keep"))
+    removed = connection.execute(delete(mat_provider).where(mat_provider.c.id.not_in(select(keep.c.id)))).rowcount
+    if removed: logger.warning(f"Removed {removed} duplicate provider-material links before adding unique index.")
+    create_index(connection, "mat_provider", "uq_mat_provider_provider_material", ["provider", "material"], unique=True)
+
+
+class DuplicateNormalizedValueError(RuntimeError):
+    """
+    У нескольких записей одинаковое нормализованное значение (телефон в разных форматах, email в разном регистре):
+    уникальный индекс не создать. Миграция останавливается - записи разводит оператор, вход ни у кого не пропадает
+    """
+    def __init__(self, table_name: str, source: str, duplicates: Dict[str, List[str]]):
+        self.table_name, self.source, self.duplicates = table_name, source, duplicates
+        details = "; ".join(f"{value}: {', '.join(ids)}" for value, ids in duplicates.items())
+        super().__init__(f"Rows of {table_name} share a normalized {source}, resolve them and restart ({details})")
+
+
+def backfill_normalized(connection: Connection, table_name: str, source: str, target: str,
+                        normalize: Callable[[Optional[str]], Optional[str]]):
+    """
+    Заполняет target = normalize(source) для всех строк. Нормализация в Python: одинаково для MySQL
+    и SQLite и совпадает с записью через модели. Совпадающие значения у разных записей -
+    DuplicateNormalizedValueError со списком id (миграция откатывается и повторится при следующем запуске).
+    """
+    table = reflect_table(connection, table_name)
+    rows = connection.execute(select(table.c.id, table.c[source]).where(table.c[source].is_not(None))).all()
+    values, owners = [], {}
+    for id, value in rows:
+        normalized = normalize(value)
+        if normalized: owners.setdefault(normalized, []).append(id)
+        values.append({"row_id": id, "normalized": normalized})
+    duplicates = {value: ids for value, ids in owners.items() if len(ids) > 1}
+    if duplicates:
+        logger.error(f"Duplicate {source} in {table_name}: {len(duplicates)} values shared by several rows.")
+        raise DuplicateNormalizedValueError(table_name, source, duplicates)
+    if values:
+        connection.execute(update(table).where(table.c.id == bindparam("row_id"))
+                           .values({target: bindparam("normalized")}), values)
+
+
+@migration(3, "Normalized phone column with unique index on clients and workers")
+def _phone_norm(connection: Connection):
+    for table_name in ("clients", "workers"):
+        add_column(connection, table_name, "phone_norm VARCHAR(10) NULL")
+        backfill_normalized(connection, table_name, "phone", "phone_norm", normalize_phone)
+        create_index(connection, table_name, f"uq_{table_name}_phone_norm", ["phone_norm"], unique=True)
+
+
+@migration(4, "Lowercase email column with unique index on clients and workers")
+def _mail_norm(connection: Connection):
+    for table_name in ("clients", "workers"):
+        add_column(connection, table_name, "mail_norm VARCHAR(200) NULL")
+        backfill_normalized(connection, table_name, "mail", "mail_norm", normalize_email)
+        create_index(connection, table_name, f"uq_{table_name}_mail_norm", ["mail_norm"], unique=True)
+
+
+@migration(5, "Stock movement ledger and snapshots; opening balances of existing materials")
+def _stock_ledger(connection: Connection):
+    from .models_sqlalchemy import StockMovement, StockSnapshot
+    StockMovement.__table__.create(bind=connection, checkfirst=True)
+    StockSnapshot.__table__.create(bind=connection, checkfirst=True)
+    # Журнал начинается с текущих остатков: сумма движений материала с первого дня равна balance
+    materials, movements = reflect_table(connection, "materials"), reflect_table(connection, "stock_movements")
+    recorded = select(movements.c.material).distinct()
+    rows = connection.execute(select(materials.c.id, materials.c.balance)
+                              .where(materials.c.balance != 0, materials.c.id.not_in(recorded))).all()
+    now = datetime.now()
+    if rows:
+        connection.execute(insert(movements), [
+            {"id": UUIDUtils.getUUID(), "material": id, "delta": balance, "reason": "initial", "order": None, "created_at": now}
+            for id, balance in rows
+        ])
+        logger.info(f"Recorded opening balances of {len(rows)} materials in the stock ledger.")
+
+
+@migration(6, "Row version columns for optimistic concurrency control")
+def _row_versions(connection: Connection):
+    for table_name in ("orders", "materials", "providers", "clients", "workers"):
+        add_column(connection, table_name, "version INTEGER NOT NULL DEFAULT 1")
+
+
+@migration(7, "Stock reservations; materials of orders in processing move from consumption to reservation")
+def _stock_reservations(connection: Connection):
+    from .models_sqlalchemy import StockReservation
+    StockReservation.__table__.create(bind=connection, checkfirst=True)
+    # До резервов заказ списывал материалы при создании. Для заказов в 'Обработка' списание возвращается
+    # в balance и становится резервом: свободный остаток (balance - резерв) не меняется
+    orders, links = reflect_table(connection, "orders"), reflect_table(connection, "mat_on_order")
+    materials, movements = reflect_table(connection, "materials"), reflect_table(connection, "stock_movements")
+    reservations = reflect_table(connection, "stock_reservations")
+    rows = connection.execute(
+        select(links.c.order, links.c.material, func.sum(links.c.amount))
+        .join(orders, orders.c.id == links.c.order)
+        .where(orders.c.status == "Обработка", links.c.order.not_in(select(reservations.c.order).distinct()))
+        .group_by(links.c.order, links.c.material)
+    ).all()
+    if not rows: return
+    now = datetime.now()
+    connection.execute(insert(reservations), [
+        {"id": UUIDUtils.getUUID(), "order": order_id, "material": material_id, "amount": amount, "created_at": now}
+        for order_id, material_id, amount in rows
+    ])
+    connection.execute(insert(movements), [
+        {"id": UUIDUtils.getUUID(), "material": material_id, "delta": amount, "reason": "order", "order": order_id, "created_at": now}
+        for order_id, material_id, amount in rows
+    ])
+    returned: Dict[str, int] = {}
+    for _, material_id, amount in rows: returned[material_id] = returned.get(material_id, 0) + amount
+    connection.execute(update(materials).where(materials.c.id == bindparam("material_id"))
+                       .values(balance=materials.c.balance + bindparam("returned"), version=materials.c.version + 1),
+                       [{"material_id": id, "returned": amount} for id, amount in returned.items()])
+    logger.info(f"Moved {len(rows)} material lines of orders in processing from consumption to reservations.")
+
+
+# --- Запуск ---
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    """ В MySQL несколько экземпляров приложения могут стартовать одновременно - миграции выполняет один """
+    if engine.dialect.name != "mysql":
+        yield
+        return
+    with engine.connect() as lock_connection:
+        acquired = lock_connection.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"), {"name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT}
+        ).scalar()
+        if acquired != 1: raise TimeoutError(f"Could not acquire schema migration lock in {MIGRATION_LOCK_TIMEOUT}s")
+        try:
+            yield
+        finally:
+            lock_connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+
+
+def migrate(engine: Optional[Engine] = None) -> List[int]:
+    """
+    Применяет все миграции новее сохраненной версии, по порядку.
+    Возвращает номера примененных миграций (пустой список, если схема актуальна).
+    """
+    if engine is None: engine = database.engine
+    applied = []
+    with _migration_lock(engine):
+        with engine.begin() as connection:
+            schema_meta_metadata.create_all(bind=connection)
+            current = schema_version(connection)
+        for item in pending(current):
+            logger.info(f"Applying migration {item.version}: {item.description}")
+            try:
+                with engine.begin() as connection:
+                    item.upgrade(connection)
+                    write_meta(connection, SCHEMA_VERSION_KEY, str(item.version))
+            except Exception as e:
+                logger.error(f"Migration {item.version} failed: {e}")
+                raise
+            applied.append(item.version)
+    if applied: logger.info(f"Schema migrated from version {current} to {applied[-1]}.")
+    return applied
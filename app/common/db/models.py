@@ -7,8 +7,11 @@ from .models_sqlalchemy import (
     MaterialOnOrder,
     MaterialProvider,
     Provider,
+    StockMovement,
+    StockSnapshot,
+    StockReservation,
 )
-from .models_pydantic import OrderStatus
+from .models_pydantic import OrderStatus, StockMovementReason
 
 __all__ = [
     'Client',
@@ -18,5 +21,9 @@ __all__ = [
     'MaterialOnOrder',
     'MaterialProvider',
     'Provider',
+    'StockMovement',
+    'StockSnapshot',
+    'StockReservation',
     'OrderStatus',
+    'StockMovementReason',
 ] 
\ No newline at end of file
@@ -48,6 +48,12 @@ class OrderStatus(str, Enum):
     IN_PROGRESS = 'В работе'
     COMPLETED = 'Выполнен'
 
+class StockMovementReason(str, Enum):
+    INITIAL = 'initial'       # Начальный остаток (новый материал, перенос существующих остатков)
+    MANUAL = 'manual'         # Приход/списание на складе (change_balance)
+    ADJUSTMENT = 'adjustment' # Остаток задан напрямую (редактирование материала)
+    ORDER = 'order'           # Списание в заказ или возврат из заказа
+
 # --- Базовая модель ---
 class BaseEntity(BaseModel):
      id: str = Field(default_factory=UUIDUtils.getUUID)
@@ -93,6 +99,7 @@ class ClientUpdate(BaseModel): # Отдельная модель для обно
     phone: Optional[str] = Field(None, max_length=25)  # Увеличиваем до 25
     mail: Optional[EmailStr] = Field(None, max_length=200)
     password: Optional[str] = Field(None, min_length=6) # Для смены пароля
+    version: Optional[int] = None # Версия, которую видел пользователь; если строку уже изменили - ConcurrentModificationError
 
     # Валидаторы применяются, если поле передано
     @field_validator('first', 'last', mode='before')
@@ -104,6 +111,7 @@ class ClientUpdate(BaseModel): # Отдельная модель для обно
 
 class Client(ClientBase, BaseEntity): # Модель для чтения из БД
     date: datetime
+    version: int = 1 # Передается в ClientUpdate.version при сохранении формы
     # НЕ СОДЕРЖИТ HASHED_PASSWORD для безопасности
 
 # --- Worker ---
@@ -151,6 +159,7 @@ class WorkerUpdate(BaseModel): # Отдельная модель
     position: Optional[str] = Field(None, min_length=1, max_length=200)
     born_date: Optional[datetime] = None
     password: Optional[str] = Field(None, min_length=6) # Для смены пароля
+    version: Optional[int] = None # см. ClientUpdate.version
 
     # Валидаторы для необязательных полей (применяются, если значение передано)
     @field_validator('first', 'last', 'middle', mode='before')
@@ -164,6 +173,7 @@ class WorkerUpdate(BaseModel): # Отдельная модель
 
 class Worker(WorkerBase, BaseEntity):
     date: datetime
+    version: int = 1
     # НЕ СОДЕРЖИТ HASHED_PASSWORD
 
 # --- Provider ---
@@ -193,6 +203,7 @@ class ProviderUpdate(BaseModel):
     phone: Optional[str] = Field(None, max_length=25)  # Увеличиваем длину до 25
     mail: Optional[EmailStr] = Field(None, max_length=200)
     address: Optional[str] = Field(None, max_length=200)
+    version: Optional[int] = None # см. ClientUpdate.version
     # Валидаторы
     @field_validator('inn', mode='before')
     def check_inn_update(cls, v): return validate_regex(v, INN_REGEX, 'INN') if v else v
@@ -206,7 +217,8 @@ class ProviderUpdate(BaseModel):
             raise ValueError(f"Phone must contain only digits (got: '{v}')")
         return v
 
-class Provider(ProviderBase, BaseEntity): pass
+class Provider(ProviderBase, BaseEntity):
+    version: int = 1
 
 # --- Material ---
 class MaterialBase(BaseModel):
@@ -218,7 +230,9 @@ class MaterialUpdate(BaseModel):
     type: Optional[str] = Field(None, min_length=1, max_length=100)
     balance: Optional[int] = Field(None, ge=0)
     price: Optional[int] = Field(None, gt=0)
-class Material(MaterialBase, BaseEntity): pass
+    version: Optional[int] = None # см. ClientUpdate.version
+class Material(MaterialBase, BaseEntity):
+    version: int = 1
 
 # --- Order ---
 class OrderBase(BaseModel):
@@ -238,6 +252,7 @@ class OrderUpdate(BaseModel):
     worker_id: Optional[str] = None
     prod_period: Optional[int] = Field(None, gt=0)
     status: Optional[OrderStatus] = None
+    version: Optional[int] = None # см. ClientUpdate.version
 # ForwardRef для циклических зависимостей с MaterialOnOrder
 class MaterialOnOrder(BaseEntity): # Полная модель MaterialOnOrder нужна здесь
     order_id: str
@@ -246,6 +261,7 @@ class MaterialOnOrder(BaseEntity): # Полная модель MaterialOnOrder 
     material: Optional[Material] = None # Детали материала
 class Order(OrderBase, BaseEntity):
     date: datetime
+    version: int = 1
     client: Optional[Client] = None # Связанные данные
     worker: Optional[Worker] = None
     materials_on_order: List[MaterialOnOrder] = []
@@ -271,6 +287,25 @@ class MaterialProvider(MaterialProviderBase, BaseEntity):
      provider: Optional[Provider] = None
      material: Optional[Material] = None
 
+# --- StockMovement --- (журнал движения материалов, только добавление)
+class StockMovementBase(BaseModel):
+    material_id: str
+    delta: int
+    reason: StockMovementReason
+    order_id: Optional[str] = None
+class StockMovementCreate(StockMovementBase): pass
+class StockMovement(StockMovementBase, BaseEntity):
+    created_at: datetime
+
+# --- StockReservation --- (материал под заказ в статусе 'Обработка', еще не списан)
+class StockReservationBase(BaseModel):
+    order_id: str
+    material_id: str
+    amount: int = Field(..., gt=0)
+class StockReservationCreate(StockReservationBase): pass
+class StockReservation(StockReservationBase, BaseEntity):
+    created_at: datetime
+
 # --- Модель для входа ---
 class LoginRequest(BaseModel):
     phone: str
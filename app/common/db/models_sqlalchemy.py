@@ -2,9 +2,10 @@
 from sqlalchemy import (
     Column, String, Integer, DateTime, ForeignKey, Enum as SQLEnum, Boolean, Index, CheckConstraint
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from .database import Base
+from .utils import normalize_phone, normalize_email
 from .models_pydantic import OrderStatus # Используем только Enum из Pydantic
 
 class Client(Base):
@@ -14,9 +15,15 @@ class Client(Base):
     last = Column(String(100), nullable=False)
     middle = Column(String(100), nullable=True)
     phone = Column(String(12), nullable=True, index=True)
+    # Последние 10 цифр phone (заполняется при записи phone) - вход и поиск по телефону одним запросом
+    phone_norm = Column(String(10), nullable=True)
     mail = Column(String(200), nullable=True, index=True)
+    # mail в нижнем регистре - поиск email без LOWER(mail), по индексу
+    mail_norm = Column(String(200), nullable=True)
     date = Column(DateTime, nullable=False, server_default=func.now())
     hash_password = Column(String(255), nullable=False)
+    # Номер версии строки: UPDATE/DELETE проверяют его в WHERE и увеличивают (оптимистическая блокировка, миграция 6)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     orders = relationship("Order", back_populates="client")
 
     __table_args__ = (
@@ -25,7 +32,20 @@ class Client(Base):
         CheckConstraint("middle REGEXP '^[а-яА-Яёa-zA-Z-]*$'", name="check_middle"),
         CheckConstraint("phone REGEXP '^\\+7[0-9]{10}$|^8[0-9]{10}$'", name="check_phone"),
         CheckConstraint("mail REGEXP '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$'", name="check_mail"),
+        Index("uq_clients_phone_norm", phone_norm, unique=True), # миграция 3
+        Index("uq_clients_mail_norm", mail_norm, unique=True), # миграция 4
     )
+    __mapper_args__ = {"version_id_col": version}
+
+    @validates("phone")
+    def _set_phone_norm(self, key, phone):
+        self.phone_norm = normalize_phone(phone)
+        return phone
+
+    @validates("mail")
+    def _set_mail_norm(self, key, mail):
+        self.mail_norm = normalize_email(mail)
+        return mail
     
     def __repr__(self): return f"<Client(id='{self.id}', name='{self.first} {self.last}')>"
 
@@ -36,13 +56,16 @@ class Worker(Base):
     last = Column(String(100), nullable=False)
     middle = Column(String(100), nullable=True)
     phone = Column(String(12), nullable=True, index=True)
+    phone_norm = Column(String(10), nullable=True) # см. Client.phone_norm
     mail = Column(String(200), nullable=True, index=True)
+    mail_norm = Column(String(200), nullable=True) # см. Client.mail_norm
     date = Column(DateTime, nullable=False, server_default=func.now())
     pass_series = Column(String(4), nullable=True)
     pass_number = Column(String(6), nullable=True)
     position = Column(String(200), nullable=False)
     born_date = Column(DateTime, nullable=True)
     hash_password = Column(String(255), nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # см. Client.version
     assigned_orders = relationship("Order", back_populates="worker")
 
     __table_args__ = (
@@ -53,7 +76,20 @@ class Worker(Base):
         CheckConstraint("mail REGEXP '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$'", name="check_worker_mail"),
         CheckConstraint("pass_series REGEXP '^[0-9]{4}$'", name="check_worker_pass_series"),
         CheckConstraint("pass_number REGEXP '^[0-9]{6}$'", name="check_worker_pass_number"),
+        Index("uq_workers_phone_norm", phone_norm, unique=True), # миграция 3
+        Index("uq_workers_mail_norm", mail_norm, unique=True), # миграция 4
     )
+    __mapper_args__ = {"version_id_col": version}
+
+    @validates("phone")
+    def _set_phone_norm(self, key, phone):
+        self.phone_norm = normalize_phone(phone)
+        return phone
+
+    @validates("mail")
+    def _set_mail_norm(self, key, mail):
+        self.mail_norm = normalize_email(mail)
+        return mail
     
     def __repr__(self): return f"<Worker(id='{self.id}', name='{self.first} {self.last}', position='{self.position}')>"
 
@@ -67,6 +103,7 @@ class Provider(Base):
     phone = Column(String(12), nullable=True)
     mail = Column(String(200), nullable=True)
     address = Column(String(200), nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # см. Client.version
     materials = relationship("Material", secondary="mat_provider", back_populates="providers")
 
     __table_args__ = (
@@ -74,6 +111,7 @@ class Provider(Base):
         CheckConstraint("phone REGEXP '^\\+?[0-9 -()]{7,25}$'", name="check_provider_phone"),
         CheckConstraint("mail REGEXP '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$'", name="check_provider_mail"),
     )
+    __mapper_args__ = {"version_id_col": version}
     
     def __repr__(self): return f"<Provider(id='{self.id}', name='{self.name}')>"
 
@@ -83,6 +121,7 @@ class Material(Base):
     type = Column(String(100), nullable=False, index=True)
     balance = Column(Integer, nullable=False, default=0)
     price = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # см. Client.version
     providers = relationship("Provider", secondary="mat_provider", back_populates="materials")
     orders_link = relationship("MaterialOnOrder", back_populates="material")
 
@@ -90,6 +129,7 @@ class Material(Base):
         CheckConstraint("balance >= 0", name="check_material_balance"),
         CheckConstraint("price > 0", name="check_material_price"),
     )
+    __mapper_args__ = {"version_id_col": version}
     
     def __repr__(self): return f"<Material(id='{self.id}', type='{self.type}', balance={self.balance})>"
 
@@ -101,6 +141,7 @@ class Order(Base):
     date = Column(DateTime, nullable=False, server_default=func.now())
     prod_period = Column(Integer, nullable=True)
     status = Column(String(50), nullable=False, default=OrderStatus.PROCESSING.value)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # см. Client.version
     client = relationship("Client", back_populates="orders")
     worker = relationship("Worker", back_populates="assigned_orders")
     materials_link = relationship("MaterialOnOrder", back_populates="order", cascade="all, delete-orphan")
@@ -108,7 +149,13 @@ class Order(Base):
     __table_args__ = (
         CheckConstraint("prod_period > 0", name="check_order_prod_period"),
         CheckConstraint("status in ('Обработка', 'В работе', 'Выполнен')", name="check_order_status"),
+        # Список заказов и keyset-страницы (ORDER BY date DESC, id DESC)
+        Index("ix_orders_date_id", "date", "id"),
+        # Фильтры экрана заказов: статус + работник + период, заказы клиента по дате (миграция 2)
+        Index("ix_orders_status_worker_date", status, worker_id, date),
+        Index("ix_orders_client_date", client_id, date),
     )
+    __mapper_args__ = {"version_id_col": version}
     
     def __repr__(self): return f"<Order(id='{self.id}', client_id='{self.client_id}', status='{self.status}')>"
 
@@ -123,6 +170,8 @@ class MaterialOnOrder(Base):
 
     __table_args__ = (
         CheckConstraint("amount > 0", name="check_mat_order_amount"),
+        # Материалы заказа и поиск связи заказ-материал (миграция 2)
+        Index("ix_mat_on_order_order_material", order_id, material_id),
     )
     
     def __repr__(self): return f"<MatOnOrder(order='{self.order_id}', material='{self.material_id}', amount={self.amount})>"
@@ -132,5 +181,63 @@ class MaterialProvider(Base):
     id = Column(String(36), primary_key=True, index=True)
     provider_id = Column(String(36), ForeignKey('providers.id', ondelete='CASCADE'), nullable=False, name='provider')
     material_id = Column(String(36), ForeignKey('materials.id', ondelete='CASCADE'), nullable=False, name='material')
+
+    __table_args__ = (
+        # Поставщик поставляет материал один раз; индекс для материалов поставщика и get_link (миграция 2)
+        Index("uq_mat_provider_provider_material", provider_id, material_id, unique=True),
+    )
     
-    def __repr__(self): return f"<MatProvider(provider='{self.provider_id}', material='{self.material_id}')>"
\ No newline at end of file
+    def __repr__(self): return f"<MatProvider(provider='{self.provider_id}', material='{self.material_id}')>"
+
+class StockMovement(Base):
+    """ Журнал движения материалов: каждое изменение balance пишет сюда строку в той же транзакции """
+    __tablename__ = 'stock_movements'
+    id = Column(String(36), primary_key=True)
+    material_id = Column(String(36), ForeignKey('materials.id', ondelete='CASCADE'), nullable=False, name='material')
+    delta = Column(Integer, nullable=False)
+    reason = Column(String(20), nullable=False) # StockMovementReason
+    order_id = Column(String(36), ForeignKey('orders.id', ondelete='SET NULL'), nullable=True, name='order')
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("delta <> 0", name="check_stock_movement_delta"),
+        # Остаток на дату и расход за период по материалу (миграция 5)
+        Index("ix_stock_movements_material_created", material_id, created_at),
+        Index("ix_stock_movements_created", created_at),
+    )
+
+    def __repr__(self): return f"<StockMovement(material='{self.material_id}', delta={self.delta}, reason='{self.reason}')>"
+
+class StockSnapshot(Base):
+    """ Остаток материала на момент taken_at, свернутый из журнала (StockLedgerService.run_snapshot) """
+    __tablename__ = 'stock_snapshots'
+    id = Column(String(36), primary_key=True)
+    material_id = Column(String(36), ForeignKey('materials.id', ondelete='CASCADE'), nullable=False, name='material')
+    balance = Column(Integer, nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("uq_stock_snapshots_material_taken", material_id, taken_at, unique=True), # миграция 5
+    )
+
+    def __repr__(self): return f"<StockSnapshot(material='{self.material_id}', balance={self.balance}, taken_at='{self.taken_at}')>"
+
+class StockReservation(Base):
+    """ Материал под заказ в статусе 'Обработка': balance не меняется, пока заказ не переведен 'В работе' """
+    __tablename__ = 'stock_reservations'
+    id = Column(String(36), primary_key=True)
+    order_id = Column(String(36), ForeignKey('orders.id', ondelete='CASCADE'), nullable=False, name='order')
+    material_id = Column(String(36), ForeignKey('materials.id', ondelete='CASCADE'), nullable=False, name='material')
+    amount = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("amount > 0", name="check_stock_reservation_amount"),
+        # Один резерв на материал заказа (миграция 7)
+        Index("uq_stock_reservations_order_material", order_id, material_id, unique=True),
+        # SUM(amount) по материалу читается из индекса без обращения к таблице: свободный остаток
+        # (balance - резерв) - один запрос (StockReservationRepository.available)
+        Index("ix_stock_reservations_material_amount", material_id, amount),
+    )
+
+    def __repr__(self): return f"<StockReservation(order='{self.order_id}', material='{self.material_id}', amount={self.amount})>"
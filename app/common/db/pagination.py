@@ -0,0 +1,116 @@
+# pagination.py
+# Keyset (cursor) пагинация: страница начинается сразу после ключа последней строки предыдущей страницы
+# (WHERE (date, id) < (:date, :id) ORDER BY date DESC, id DESC LIMIT n), поэтому глубокие страницы
+# стоят столько же, сколько первая, и строки не пропускаются и не повторяются при вставках.
+# Ключ - индексированные NOT NULL колонки, последняя из них уникальна (обычно id).
+# Курсор - непрозрачная строка (base64 от JSON с ключом и направлением), ее возвращают в следующий запрос.
+import json
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import and_, or_
+
+T = TypeVar("T")
+U = TypeVar("U")
+
+NEXT, PREV = "n", "p"
+DEFAULT_PAGE_SIZE = 50
+
+
+class InvalidCursorError(ValueError):
+    """ Курсор поврежден или выдан для другой сортировки """
+
+
+@dataclass
+class Page(Generic[T]):
+    """ Страница результата: курсоры соседних страниц (None - страницы нет) """
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    @property
+    def has_next(self) -> bool: return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool: return self.prev_cursor is not None
+
+    def map(self, fn: Callable[[T], U]) -> "Page[U]":
+        """ Та же страница с преобразованными элементами (ORM -> Pydantic в сервисах) """
+        return Page([fn(item) for item in self.items], self.next_cursor, self.prev_cursor)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime): return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "dt" in value: return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(key: Sequence[str], values: Sequence[Any], direction: str) -> str:
+    payload = json.dumps({"k": list(key), "v": [_encode_value(v) for v in values], "d": direction},
+                         separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, key: Sequence[str]) -> Tuple[List[Any], str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values, direction = [_decode_value(v) for v in payload["v"]], payload["d"]
+        if payload["k"] != list(key) or len(values) != len(key) or direction not in (NEXT, PREV): raise ValueError
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid page cursor for key {tuple(key)}") from e
+    return values, direction
+
+
+def keyset_order(model, key: Sequence[str], descending: bool = False) -> list:
+    columns = [getattr(model, name) for name in key]
+    return [c.desc() if descending else c.asc() for c in columns]
+
+
+def _after(columns, values, descending: bool):
+    """ (k1, k2, ...) > (v1, v2, ...) в развернутом виде - так индекс используется и в старых MySQL """
+    conditions = []
+    for i, column in enumerate(columns):
+        step = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*[columns[j] == values[j] for j in range(i)], step))
+    return or_(*conditions)
+
+
+def keyset_statement(statement, model, key: Sequence[str], limit: int,
+                     cursor: Optional[str] = None, descending: bool = False):
+    """ Добавляет к SELECT условие и сортировку страницы; возвращает (statement, direction) """
+    direction = NEXT
+    columns = [getattr(model, name) for name in key]
+    if cursor:
+        values, direction = decode_cursor(cursor, key)
+        # Назад - тот же запрос в обратном порядке, строки потом разворачиваются
+        statement = statement.where(_after(columns, values, descending if direction == NEXT else not descending))
+    order_descending = descending if direction == NEXT else not descending
+    # На одну строку больше - так видно, есть ли еще страница в этом направлении
+    return statement.order_by(*keyset_order(model, key, order_descending)).limit(limit + 1), direction
+
+
+def build_page(rows: Sequence[T], key: Sequence[str], limit: int, cursor: Optional[str], direction: str) -> Page[T]:
+    """ Страница из строк keyset_statement """
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == PREV: rows.reverse()
+    if not rows: return Page([], None, None)
+
+    def key_of(row): return [getattr(row, name) for name in key]
+    if direction == NEXT:
+        has_next, has_prev = has_more, cursor is not None
+    else:
+        has_next, has_prev = True, has_more
+    return Page(
+        rows,
+        encode_cursor(key, key_of(rows[-1]), NEXT) if has_next else None,
+        encode_cursor(key, key_of(rows[0]), PREV) if has_prev else None,
+    )
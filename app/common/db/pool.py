@@ -0,0 +1,214 @@
+# pool.py
+# Профили пула соединений и телеметрия пула: ожидание checkout, занятые соединения,
+# выходы за pool_size (overflow) и стоимость pre-ping. Pre-ping адаптивный: соединение
+# проверяется только если пролежало в пуле дольше ping_after_idle секунд.
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from ..config import POOL_PROFILES
+
+logger = logging.getLogger(__name__)
+
+# Ключи профиля, которые передаются в create_engine как есть
+_ENGINE_POOL_ARGS = ("pool_size", "max_overflow", "pool_recycle", "pool_timeout", "pool_use_lifo")
+
+
+def get_pool_profile(name: str) -> Dict[str, Any]:
+    if name not in POOL_PROFILES:
+        raise ValueError(f"Unknown pool profile '{name}'. Available: {', '.join(POOL_PROFILES)}")
+    return POOL_PROFILES[name]
+
+
+def engine_pool_kwargs(name: str) -> Dict[str, Any]:
+    """ Аргументы create_engine для профиля пула (без адаптивного pre-ping - он ставится событием) """
+    profile = get_pool_profile(name)
+    return {key: profile[key] for key in _ENGINE_POOL_ARGS if key in profile}
+
+
+class PoolTelemetry:
+    """ Счетчики одного пула; все времена в секундах """
+
+    def __init__(self, name: str, pool_size: int, max_overflow: int):
+        self.name = name
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_wait_total = 0.0
+            self.checkout_wait_max = 0.0
+            self.checkout_timeouts = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.overflow_events = 0
+            self.connects = 0
+            self.pings = 0
+            self.ping_time_total = 0.0
+            self.ping_time_max = 0.0
+            self.ping_failures = 0
+            self.pings_skipped = 0
+
+    def record_wait(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            self.checkout_wait_total += wait
+            self.checkout_wait_max = max(self.checkout_wait_max, wait)
+            if timed_out: self.checkout_timeouts += 1
+
+    def record_overflow(self):
+        with self._lock: self.overflow_events += 1
+
+    def record_connect(self):
+        with self._lock: self.connects += 1
+
+    def record_ping_skipped(self):
+        with self._lock: self.pings_skipped += 1
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def record_checkin(self):
+        with self._lock: self.in_use = max(0, self.in_use - 1)
+
+    def record_ping(self, duration: float, ok: bool):
+        with self._lock:
+            self.pings += 1
+            self.ping_time_total += duration
+            self.ping_time_max = max(self.ping_time_max, duration)
+            if not ok: self.ping_failures += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """ Текущие значения для логов/экрана диагностики """
+        with self._lock:
+            return {
+                "pool": self.name,
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": self.checkout_wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+                "checkout_wait_max_ms": self.checkout_wait_max * 1000,
+                "checkout_timeouts": self.checkout_timeouts,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "overflow_events": self.overflow_events,
+                "connects": self.connects,
+                "pings": self.pings,
+                "pings_skipped": self.pings_skipped,
+                "ping_avg_ms": self.ping_time_total / self.pings * 1000 if self.pings else 0.0,
+                "ping_max_ms": self.ping_time_max * 1000,
+                "ping_failures": self.ping_failures,
+            }
+
+    def summary(self) -> str:
+        s = self.snapshot()
+        return (f"Pool '{s['pool']}' (size {s['pool_size']}+{s['max_overflow']}): "
+                f"{s['checkouts']} checkouts, wait avg {s['checkout_wait_avg_ms']:.1f} ms / max {s['checkout_wait_max_ms']:.1f} ms, "
+                f"{s['checkout_timeouts']} timeouts, in use {s['in_use']} (peak {s['peak_in_use']}), "
+                f"{s['overflow_events']} overflow events, {s['connects']} connects, "
+                f"pre-ping {s['pings']} (skipped {s['pings_skipped']}, avg {s['ping_avg_ms']:.1f} ms, failed {s['ping_failures']})")
+
+
+class _TelemetryPoolMixin:
+    """ Замер ожидания в checkout: QueuePool._do_get блокируется, когда все соединения заняты """
+    telemetry: Optional[PoolTelemetry] = None
+
+    def _do_get(self):
+        telemetry = self.telemetry
+        if telemetry is None: return super()._do_get()
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            telemetry.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        telemetry.record_wait(time.perf_counter() - start)
+        return record
+
+    def _inc_overflow(self):
+        # _overflow начинается с -pool_size: > 0 после увеличения - соединение сверх pool_size
+        granted = super()._inc_overflow()
+        if granted and self.telemetry is not None and self._overflow > 0:
+            self.telemetry.record_overflow()
+        return granted
+
+    def recreate(self):
+        # engine.dispose() пересоздает пул - счетчики переезжают в новый
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+        return pool
+
+
+class InstrumentedQueuePool(_TelemetryPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_TelemetryPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_telemetries: Dict[str, PoolTelemetry] = {}
+
+
+def install_pool_telemetry(engine, profile_name: str, name: Optional[str] = None) -> Optional[PoolTelemetry]:
+    """ Вешает телеметрию и адаптивный pre-ping на пул движка (для sync engine или AsyncEngine.sync_engine) """
+    pool = engine.pool
+    if not isinstance(pool, _TelemetryPoolMixin): return None
+    profile = get_pool_profile(profile_name)
+    name = name or f"{engine.url.get_backend_name()}:{profile_name}"
+    telemetry = PoolTelemetry(name, pool.size(), profile.get("max_overflow", 10))
+    pool.telemetry = telemetry
+    _telemetries[name] = telemetry
+    ping_after_idle = profile.get("ping_after_idle")
+    dialect = engine.dialect
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        telemetry.record_connect()
+        connection_record.info["pool_last_used"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        telemetry.record_checkout()
+        idle = time.monotonic() - connection_record.info.get("pool_last_used", 0.0)
+        if ping_after_idle is None or idle < ping_after_idle:
+            telemetry.record_ping_skipped()
+            return
+        start = time.perf_counter()
+        try:
+            ok = dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            ok = False
+            logger.warning(f"Pool '{name}': pre-ping failed after {idle:.0f}s idle: {e}")
+        telemetry.record_ping(time.perf_counter() - start, ok)
+        if not ok:
+            telemetry.record_checkin()
+            # Пул выбросит это соединение и повторит checkout со свежим
+            raise exc.DisconnectionError(f"Connection idle for {idle:.0f}s failed pre-ping")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        telemetry.record_checkin()
+        connection_record.info["pool_last_used"] = time.monotonic()
+
+    logger.info(f"Pool '{name}': {engine_pool_kwargs(profile_name)}, pre-ping after {ping_after_idle}s idle.")
+    return telemetry
+
+
+def pool_snapshots() -> Dict[str, Dict[str, Any]]:
+    """ Телеметрия всех инструментированных пулов """
+    return {name: telemetry.snapshot() for name, telemetry in _telemetries.items()}
+
+
+def log_pool_summary():
+    for telemetry in _telemetries.values():
+        logger.info(telemetry.summary())
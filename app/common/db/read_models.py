@@ -0,0 +1,70 @@
+# read_models.py
+# Легкие строки для списков на экранах. Запрос выбирает только нужные колонки (со связанными
+# через JOIN), результат - кортежи без ORM-объектов, identity map и валидации Pydantic.
+# Для изменения данных и карточек по-прежнему используются полные модели (models_pydantic).
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from .models_sqlalchemy import Client, Order, Provider, Worker
+
+
+def _full_name(first: Optional[str], last: Optional[str]) -> Optional[str]:
+    if first is None and last is None: return None
+    return f"{first or ''} {last or ''}".strip()
+
+
+class MaterialStockRow(NamedTuple):
+    """ Материал с остатком сразу после изменения (MaterialRepository.update_balance) """
+    id: str
+    type: str
+    balance: int
+    price: int
+    version: int
+
+
+class OrderListRow(NamedTuple):
+    """ Строка списка заказов: заказ + имена клиента и работника """
+    id: str
+    date: Optional[datetime]
+    status: str
+    client_id: str
+    worker_id: Optional[str]
+    client_first: Optional[str]
+    client_last: Optional[str]
+    worker_first: Optional[str]
+    worker_last: Optional[str]
+
+    @property
+    def client_name(self) -> Optional[str]: return _full_name(self.client_first, self.client_last)
+
+    @property
+    def worker_name(self) -> Optional[str]: return _full_name(self.worker_first, self.worker_last)
+
+
+class ProviderListRow(NamedTuple):
+    """ Строка списка поставщиков """
+    id: str
+    name: str
+    inn: str
+    phone: Optional[str]
+    mail: Optional[str]
+    address: Optional[str]
+
+
+def order_list_statement():
+    """ SELECT колонок OrderListRow (в том же порядке); фильтры - OrderRepository.apply_filters """
+    client, worker = aliased(Client), aliased(Worker)
+    return (
+        select(Order.id, Order.date, Order.status, Order.client_id, Order.worker_id,
+               client.first, client.last, worker.first, worker.last)
+        .outerjoin(client, Order.client_id == client.id)
+        .outerjoin(worker, Order.worker_id == worker.id)
+    )
+
+
+def provider_list_statement():
+    """ SELECT колонок ProviderListRow (в том же порядке) """
+    return select(Provider.id, Provider.name, Provider.inn, Provider.phone, Provider.mail, Provider.address)
@@ -1,14 +1,19 @@
 # repositories.py
-from typing import List, Optional, Type, TypeVar, Generic, Dict, Any
+from typing import List, Optional, Type, TypeVar, Generic, Dict, Any, Callable, Tuple, Sequence, Iterator, NamedTuple
 from sqlalchemy.orm import Session, joinedload, selectinload, subqueryload
-from sqlalchemy import select, update as sql_update, delete as sql_delete, func, case, literal_column, and_, or_
+from sqlalchemy import select, insert as sql_insert, update as sql_update, delete as sql_delete, func, case, literal_column, and_, or_, distinct
+from sqlalchemy.orm.exc import StaleDataError
 from pydantic import BaseModel as PydanticBaseModel
 import logging
 from datetime import datetime
 
 from .database import Base as SQLAlchemyBaseModel
 from .models_pydantic import BaseEntity as PydanticBaseEntity
-from .utils import UUIDUtils # Локальный импорт
+from .utils import UUIDUtils, normalize_email, normalize_phone # Локальный импорт
+from .unit_of_work import in_unit_of_work, unit_of_work
+from .resilience import DbErrorKind, classify_error, retry_read, unavailable_error
+from .pagination import DEFAULT_PAGE_SIZE, Page, build_page, keyset_order, keyset_statement
+from .read_models import MaterialStockRow, OrderListRow, ProviderListRow, order_list_statement, provider_list_statement
 from ...common.config import config
 
 logger = logging.getLogger(__name__)
@@ -17,230 +22,784 @@ SQLAlchemyModelType = TypeVar("SQLAlchemyModelType", bound=SQLAlchemyBaseModel)
 PydanticSchemaType = TypeVar("PydanticSchemaType", bound=PydanticBaseModel)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=PydanticBaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=PydanticBaseModel)
+ResultType = TypeVar("ResultType")
+
+# Размер пачки id в IN (...) для delete_many - меньше лимита параметров SQLite (999 в старых версиях)
+BULK_CHUNK_SIZE = 500
+# Строк за одну выборку из серверного курсора при потоковом чтении (stream)
+STREAM_BATCH_SIZE = 500
+
+class ConcurrentModificationError(RuntimeError):
+    """
+    Строку изменили в другом месте после того, как ее прочитали: версия (version) не совпала.
+    Изменение не записано - данные нужно перечитать и повторить
+    """
+    def __init__(self, entity: str, *ids: str, expected: Optional[int] = None, actual: Optional[int] = None):
+        self.entity, self.ids, self.expected, self.actual = entity, list(ids), expected, actual
+        self.id = self.ids[0] if self.ids else None
+        versions = f" (version {expected}, current {actual})" if expected is not None and actual is not None else ""
+        super().__init__(f"{entity} {', '.join(self.ids)} was modified by another user{versions}")
 
 class BaseRepository(Generic[SQLAlchemyModelType, CreateSchemaType, UpdateSchemaType]):
-    """ Базовый класс репозитория с CRUD операциями (без изменений) """
+    """
+    Базовый класс репозитория с CRUD операциями.
+    Внутри unit_of_work изменения только flush-атся, commit делает сервис (см. unit_of_work.py).
+    Вне unit_of_work каждый вызов, как и раньше, фиксирует изменения сам.
+    Ошибки классифицируются (resilience.py): чтения при временных сбоях повторяются, недоступная БД
+    всегда поднимается как DatabaseUnavailableError; прочие ошибки чтения, как раньше, дают None/[].
+    page_key - индексированный ключ сортировки списков и keyset-страниц (последняя колонка уникальна).
+    У моделей с version_id_col (колонка version) UPDATE и DELETE проверяют версию в WHERE: строка, измененная
+    после чтения, не перезаписывается, а дает ConcurrentModificationError.
+    """
+    page_key: Tuple[str, ...] = ("id",)
+    page_descending: bool = False
+    # Колонки, вычисляемые при записи: {поле: (колонка, функция)}. При записи через ORM их заполняет @validates
+    # модели, пакетные INSERT/UPDATE (create_many, update_many, update_where) идут мимо него - см. _derive
+    derived_columns: Dict[str, Tuple[str, Callable[[Any], Any]]] = {}
     def __init__(self, model: Type[SQLAlchemyModelType]): self._model = model
+    def _derive(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        for field, (column, derive) in self.derived_columns.items():
+            if field in values: values[column] = derive(values[field])
+        return values
     def _get_session(self, db: Session):
         if db is None: raise ValueError("Database session is required")
         return db
+    def _commit(self, db: Session, db_obj: Optional[SQLAlchemyModelType] = None):
+        if in_unit_of_work(db): db.flush(); return
+        db.commit()
+        if db_obj is not None: db.refresh(db_obj)
+    def _rollback(self, db: Session):
+        # Внутри unit_of_work откатом управляет сама область
+        if not in_unit_of_work(db): db.rollback()
+    def _read(self, db: Session, run: Callable[[], ResultType], default: ResultType, action: str) -> ResultType:
+        try: return retry_read(db, run)
+        except Exception as e:
+            logger.error(f"Repo Error {action}: {e}"); self._rollback(db)
+            if classify_error(e) is DbErrorKind.CONNECTION: raise unavailable_error(e) from e
+            return default
+    def _write_failed(self, db: Session, action: str, error: Exception, ids: Sequence[str] = ()):
+        # Запись не повторяется (не идемпотентна); недоступность БД поднимается единым типом
+        if isinstance(error, StaleDataError): # UPDATE/DELETE с устаревшей версией не нашел строку
+            logger.warning(f"Repo: Conflict {action}: {error}"); self._rollback(db)
+            raise ConcurrentModificationError(self._model.__name__, *ids) from error
+        logger.error(f"Repo Error {action}: {error}"); self._rollback(db)
+        if classify_error(error) is DbErrorKind.CONNECTION: raise unavailable_error(error) from error
+        raise error
+    @property
+    def _versioned(self) -> bool:
+        return self._model.__mapper__.version_id_col is not None
+    def _next_version(self) -> Dict[str, Any]:
+        # Для UPDATE в обход ORM: версия меняется так же, как при flush, и открытые формы увидят конфликт
+        return {"version": self._model.version + 1} if self._versioned else {}
+    def _check_version(self, db_obj: SQLAlchemyModelType, expected: Optional[int]):
+        if expected is not None and expected != db_obj.version:
+            logger.warning(f"Repo: {self._model.__name__} id {db_obj.id} is at version {db_obj.version}, update expected {expected}")
+            raise ConcurrentModificationError(self._model.__name__, db_obj.id, expected=expected, actual=db_obj.version)
     def get(self, db: Session, id: str) -> Optional[SQLAlchemyModelType]:
         statement = select(self._model).where(self._model.id == id)
-        try: return db.execute(statement).scalar_one_or_none()
-        except Exception as e: logger.error(f"Repo Error getting {self._model.__name__} by id {id}: {e}"); db.rollback(); return None
-    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[SQLAlchemyModelType]:
-        statement = select(self._model).offset(skip).limit(limit)
-        try: return db.execute(statement).scalars().all()
-        except Exception as e: logger.error(f"Repo Error getting multiple {self._model.__name__}: {e}"); db.rollback(); return []
-    def create(self, db: Session, *, obj_in: CreateSchemaType) -> SQLAlchemyModelType:
-        obj_in_data = obj_in.model_dump()
+        return self._read(db, lambda: db.execute(statement).scalar_one_or_none(), None, f"getting {self._model.__name__} by id {id}")
+    def get_many(self, db: Session, ids: Sequence[str]) -> Dict[str, SQLAlchemyModelType]:
+        """ Строки по набору id одним запросом WHERE id IN (...) (пачками по BULK_CHUNK_SIZE); {id: объект} """
+        ids = [id for id in dict.fromkeys(ids) if id]
+        def run():
+            found = {}
+            for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                statement = select(self._model).where(self._model.id.in_(ids[start:start + BULK_CHUNK_SIZE]))
+                found.update((obj.id, obj) for obj in db.execute(statement).scalars())
+            return found
+        if not ids: return {}
+        return self._read(db, run, {}, f"getting {len(ids)} {self._model.__name__} by ids")
+    def get_multi(self, db: Session, *, skip: int = 0, limit: Optional[int] = None) -> List[SQLAlchemyModelType]:
+        """ Все строки (limit=None) или срез в стабильном порядке page_key; для больших таблиц - get_page """
+        statement = select(self._model).order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        if skip: statement = statement.offset(skip)
+        if limit is not None: statement = statement.limit(limit)
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], f"getting multiple {self._model.__name__}")
+    def get_page(self, db: Session, *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, statement=None) -> Page[SQLAlchemyModelType]:
+        """ Keyset-страница после/до cursor; statement - SELECT модели с фильтрами (по умолчанию все строки) """
+        paged, direction = keyset_statement(
+            select(self._model) if statement is None else statement,
+            self._model, self.page_key, limit, cursor, self.page_descending)
+        rows = self._read(db, lambda: db.execute(paged).scalars().all(), [], f"getting page of {self._model.__name__}")
+        return build_page(rows, self.page_key, limit, cursor, direction)
+    @staticmethod
+    def _create_data(obj_in: CreateSchemaType | Dict[str, Any]) -> Dict[str, Any]:
+        obj_in_data = obj_in.model_dump() if isinstance(obj_in, PydanticBaseModel) else dict(obj_in)
         if 'id_' in obj_in_data: obj_in_data['id'] = obj_in_data.pop('id_')
         if 'id' not in obj_in_data or not obj_in_data['id']: # Если ID не пришел из Pydantic
             obj_in_data['id'] = UUIDUtils.getUUID()
-
-        db_obj = self._model(**obj_in_data)
+        return obj_in_data
+    def stream(self, db: Session, *, batch_size: int = STREAM_BATCH_SIZE, statement=None) -> Iterator[SQLAlchemyModelType]:
+        """
+        Потоковое чтение для отчетов и выгрузок: строки выбираются пачками по batch_size через серверный
+        курсор (yield_per), первые приходят до выборки всего результата, память не растет с размером таблицы.
+        Пока генератор не исчерпан или не закрыт, соединение сессии занято курсором. Повтора при сбое нет -
+        половину выгрузки не повторить незаметно, поэтому ошибка поднимается, а не превращается в [].
+        """
+        if statement is None:
+            statement = select(self._model).order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        result = None
+        try:
+            result = db.execute(statement.execution_options(yield_per=batch_size)).scalars()
+            yield from result
+        except Exception as e: self._write_failed(db, f"streaming {self._model.__name__}", e)
+        finally:
+            if result is not None: result.close()
+    def create(self, db: Session, *, obj_in: CreateSchemaType | Dict[str, Any]) -> SQLAlchemyModelType:
+        db_obj = self._model(**self._create_data(obj_in))
         try:
             db.add(db_obj)
-            db.commit()
-            db.refresh(db_obj)
+            self._commit(db, db_obj)
             logger.info(f"Repo: Created {self._model.__name__} with id {db_obj.id}")
             return db_obj
-        except Exception as e: logger.error(f"Repo Error creating {self._model.__name__}: {e}"); db.rollback(); raise
+        except Exception as e: self._write_failed(db, f"creating {self._model.__name__}", e)
     def update(self, db: Session, *, db_obj: SQLAlchemyModelType, obj_in: UpdateSchemaType | Dict[str, Any]) -> SQLAlchemyModelType:
+        """
+        Меняет поля загруженного объекта. version в obj_in - версия, которую видел пользователь: если строку
+        с тех пор изменили (здесь или между чтением и UPDATE), ConcurrentModificationError
+        """
         if isinstance(obj_in, PydanticBaseModel): update_data = obj_in.model_dump(exclude_unset=True)
-        else: update_data = obj_in
+        else: update_data = dict(obj_in)
+        if self._versioned: self._check_version(db_obj, update_data.pop('version', None))
         if not update_data: logger.warning(f"Repo: Update called for {self._model.__name__} id {db_obj.id} with no data."); return db_obj
         for field, value in update_data.items():
             if hasattr(db_obj, field): setattr(db_obj, field, value)
             else: logger.warning(f"Repo: Field '{field}' not found in {self._model.__name__} during update.")
+        id = db_obj.id # После неудачного flush атрибуты объекта сброшены
         try:
-            db.add(db_obj); db.commit(); db.refresh(db_obj)
-            logger.info(f"Repo: Updated {self._model.__name__} with id {db_obj.id}")
+            db.add(db_obj); self._commit(db, db_obj)
+            logger.info(f"Repo: Updated {self._model.__name__} with id {id}")
             return db_obj
-        except Exception as e: logger.error(f"Repo Error updating {self._model.__name__} id {db_obj.id}: {e}"); db.rollback(); raise
+        except Exception as e: self._write_failed(db, f"updating {self._model.__name__} id {id}", e, [id])
     def remove(self, db: Session, *, id: str) -> Optional[SQLAlchemyModelType]:
         obj = self.get(db, id=id)
         if obj:
             try:
-                db.delete(obj); db.commit()
+                db.delete(obj); self._commit(db)
                 logger.info(f"Repo: Deleted {self._model.__name__} with id {id}")
                 return obj
-            except Exception as e: logger.error(f"Repo Error deleting {self._model.__name__} id {id}: {e}"); db.rollback(); raise
+            except Exception as e: self._write_failed(db, f"deleting {self._model.__name__} id {id}", e, [id])
         else: logger.warning(f"Repo: Delete failed. {self._model.__name__} with id {id} not found."); return None
 
+    # --- Пакетные операции: один запрос (executemany / IN) и один commit вместо N вызовов create/update/remove ---
+    # Объекты не загружаются в сессию; уже загруженные в ней объекты обновляются при следующем обращении.
+    def create_many(self, db: Session, *, objs_in: Sequence[CreateSchemaType | Dict[str, Any]]) -> List[str]:
+        """ Многострочный INSERT; возвращает id созданных строк в порядке objs_in """
+        rows = [self._derive(self._create_data(obj_in)) for obj_in in objs_in]
+        if not rows: return []
+        try:
+            db.execute(sql_insert(self._model), rows); self._commit(db)
+            logger.info(f"Repo: Created {len(rows)} {self._model.__name__} rows")
+            return [row['id'] for row in rows]
+        except Exception as e: self._write_failed(db, f"creating {len(rows)} {self._model.__name__} rows", e)
+    def update_many(self, db: Session, *, objs_in: Sequence[Dict[str, Any]]) -> int:
+        """
+        UPDATE по первичному ключу для каждой строки {"id": ..., поле: значение} одним executemany.
+        У моделей с версией строка может нести "version", которую видел пользователь; без нее берется
+        текущая (один SELECT). Строка, версия которой уже другая, - ConcurrentModificationError для всего пакета.
+        Возвращает число найденных строк: ORM сверяет rowcount драйвера с числом строк (sqlite и mysql сообщают его
+        и для executemany), и пакет, где хоть один id не найден, откатывается той же ConcurrentModificationError
+        """
+        rows = [self._derive(dict(obj_in)) for obj_in in objs_in]
+        if not rows: return 0
+        if any(not row.get('id') for row in rows): raise ValueError(f"update_many: every {self._model.__name__} row needs an 'id'")
+        try:
+            if self._versioned: self._fill_versions(db, rows)
+            db.execute(sql_update(self._model), rows)
+            matched = len(rows) # Иначе StaleDataError выше
+            self._expire_loaded(db, [row['id'] for row in rows])
+            self._commit(db)
+            logger.info(f"Repo: Updated {matched} {self._model.__name__} rows")
+            return matched
+        except Exception as e: self._write_failed(db, f"updating {len(rows)} {self._model.__name__} rows", e, [row['id'] for row in rows])
+    def _fill_versions(self, db: Session, rows: List[Dict[str, Any]]):
+        # Пакетный UPDATE по ключу с version_id_col требует версию каждой строки (WHERE id = ? AND version = ?)
+        missing = [row['id'] for row in rows if row.get('version') is None]
+        current = {}
+        for start in range(0, len(missing), BULK_CHUNK_SIZE):
+            statement = select(self._model.id, self._model.version).where(self._model.id.in_(missing[start:start + BULK_CHUNK_SIZE]))
+            current.update(db.execute(statement).all())
+        for row in rows:
+            if row.get('version') is None: row['version'] = current.get(row['id'], 0) # Нет строки - UPDATE не найдет ее
+    def update_where(self, db: Session, *, ids: Sequence[str], obj_in: UpdateSchemaType | Dict[str, Any]) -> int:
+        """ Одинаковые значения для многих строк: UPDATE ... WHERE id IN (...); возвращает число измененных строк """
+        values = self._derive(obj_in.model_dump(exclude_unset=True) if isinstance(obj_in, PydanticBaseModel) else dict(obj_in))
+        ids = list(dict.fromkeys(ids))
+        if not ids or not values: return 0
+        try:
+            updated = 0
+            for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                chunk = ids[start:start + BULK_CHUNK_SIZE]
+                statement = sql_update(self._model).where(self._model.id.in_(chunk)).values(**values, **self._next_version())
+                updated += db.execute(statement.execution_options(synchronize_session=False)).rowcount
+            self._expire_loaded(db, ids)
+            self._commit(db)
+            logger.info(f"Repo: Updated {updated} {self._model.__name__} rows ({', '.join(values)})")
+            return updated
+        except Exception as e: self._write_failed(db, f"updating {len(ids)} {self._model.__name__} rows", e)
+    def delete_many(self, db: Session, *, ids: Sequence[str]) -> int:
+        """ DELETE ... WHERE id IN (...) пачками в одной транзакции; возвращает число удаленных строк """
+        ids = list(dict.fromkeys(ids))
+        if not ids: return 0
+        try:
+            deleted = 0
+            for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                statement = sql_delete(self._model).where(self._model.id.in_(ids[start:start + BULK_CHUNK_SIZE]))
+                deleted += db.execute(statement.execution_options(synchronize_session=False)).rowcount
+            for id in ids:
+                obj = db.identity_map.get(db.identity_key(self._model, id))
+                if obj is not None: db.expunge(obj)
+            self._commit(db)
+            logger.info(f"Repo: Deleted {deleted} {self._model.__name__} rows")
+            return deleted
+        except Exception as e: self._write_failed(db, f"deleting {len(ids)} {self._model.__name__} rows", e)
+    def _expire_loaded(self, db: Session, ids: Sequence[str]):
+        # UPDATE идет мимо identity map: загруженные объекты перечитаются при следующем обращении
+        for id in ids:
+            obj = db.identity_map.get(db.identity_key(self._model, id))
+            if obj is not None: db.expire(obj)
+
 # --- Конкретные репозитории ---
-from .models_sqlalchemy import Client, Order, Worker, Provider, Material, MaterialOnOrder, MaterialProvider
+from .models_sqlalchemy import (
+    Client, Order, Worker, Provider, Material, MaterialOnOrder, MaterialProvider, StockMovement, StockSnapshot, StockReservation
+)
 from .models_pydantic import (
     ClientCreate, ClientUpdate, OrderCreate, OrderUpdate, WorkerCreate, WorkerUpdate,
     ProviderCreate, ProviderUpdate, MaterialCreate, MaterialUpdate,
     MaterialOnOrderCreate, MaterialOnOrderUpdate, MaterialProviderCreate, MaterialProviderUpdate,
-    OrderStatus
+    StockMovementCreate, StockMovementReason, StockReservationCreate, OrderStatus
 )
 
+def contact_conditions(model, *, phone: Optional[str] = None, email: Optional[str] = None) -> list:
+    """ Условия поиска клиента/работника по нормализованным телефону и email (колонки с уникальными индексами) """
+    conditions = []
+    phone_norm, mail_norm = normalize_phone(phone), normalize_email(email)
+    if phone_norm: conditions.append(model.phone_norm == phone_norm)
+    if mail_norm: conditions.append(model.mail_norm == mail_norm)
+    return conditions
+
+def ensure_contacts_free(repository: "ClientRepository | WorkerRepository", db: Session, *, phone: Optional[str] = None,
+                         email: Optional[str] = None, exclude_id: Optional[str] = None):
+    """ ValueError, если телефон или email уже у другой записи (клиента/работника) - один запрос по индексам """
+    for existing in repository.find_by_phone_or_mail(db, phone=phone, email=email):
+        if existing.id == exclude_id: continue
+        if phone and existing.phone_norm == normalize_phone(phone):
+            raise ValueError(f"Телефон '{phone}' уже используется.")
+        raise ValueError(f"Email '{email}' уже используется.")
+
+# Нормализованные телефон и email клиента/работника (как Client._set_phone_norm/_set_mail_norm) - и для пакетной записи
+CONTACT_DERIVED_COLUMNS = {"phone": ("phone_norm", normalize_phone), "mail": ("mail_norm", normalize_email)}
+
 class ClientRepository(BaseRepository[Client, ClientCreate, ClientUpdate]):
+    derived_columns = CONTACT_DERIVED_COLUMNS
     def __init__(self): super().__init__(Client)
     def find_by_phone_or_mail(self, db: Session, *, phone: Optional[str] = None, email: Optional[str] = None) -> List[Client]:
-        # ... (реализация как раньше) ...
-        if not phone and not email: return []
-        statement = select(self._model)
-        conditions = []
-        if phone: conditions.append(self._model.phone == phone)
-        if email: conditions.append(self._model.mail == email)
-        if conditions:
-             from sqlalchemy import or_
-             statement = statement.where(or_(*conditions))
-        else: return [] # Не ищем, если нет критериев
-        try: return db.execute(statement).scalars().all()
-        except Exception as e: logger.error(f"Repo Error finding client by phone/email: {e}"); db.rollback(); return []
+        """ Клиента с этим телефоном или email - один запрос по phone_norm OR mail_norm """
+        conditions = contact_conditions(self._model, phone=phone, email=email)
+        if not conditions: return [] # Не ищем, если нет критериев
+        statement = select(self._model).where(or_(*conditions))
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], "finding client by phone/email")
 
     def get_by_phone(self, db: Session, phone: str) -> Optional[Client]:
-        """ Найти клиента по номеру телефона """
-        statement = select(self._model).where(self._model.phone == phone)
-        try: return db.execute(statement).scalar_one_or_none()
-        except Exception as e: logger.error(f"Repo Error getting client by phone {phone}: {e}"); db.rollback(); return None
+        """ Найти клиента по номеру телефона в любом формате (+7..., 8..., 10 цифр) """
+        phone_norm = normalize_phone(phone)
+        if not phone_norm: return None
+        statement = select(self._model).where(self._model.phone_norm == phone_norm)
+        return self._read(db, lambda: db.execute(statement).scalar_one_or_none(), None, f"getting client by phone {phone}")
 
     def get_by_email(self, db: Session, email: str) -> Optional[Client]:
-        """ Найти клиента по email """
-        statement = select(self._model).where(func.lower(self._model.mail) == func.lower(email))
-        try: return db.execute(statement).scalar_one_or_none()
-        except Exception as e: logger.error(f"Repo Error getting client by email {email}: {e}"); db.rollback(); return None
+        """ Найти клиента по email без учета регистра (индекс по mail_norm) """
+        mail_norm = normalize_email(email)
+        if not mail_norm: return None
+        statement = select(self._model).where(self._model.mail_norm == mail_norm)
+        return self._read(db, lambda: db.execute(statement).scalar_one_or_none(), None, f"getting client by email {email}")
 
 class WorkerRepository(BaseRepository[Worker, WorkerCreate, WorkerUpdate]):
+    derived_columns = CONTACT_DERIVED_COLUMNS
     def __init__(self): super().__init__(Worker)
 
+    def find_by_phone_or_mail(self, db: Session, *, phone: Optional[str] = None, email: Optional[str] = None) -> List[Worker]:
+        """ Работника с этим телефоном или email - один запрос по phone_norm OR mail_norm """
+        conditions = contact_conditions(self._model, phone=phone, email=email)
+        if not conditions: return [] # Не ищем, если нет критериев
+        statement = select(self._model).where(or_(*conditions))
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], "finding worker by phone/email")
+
     def get_by_phone(self, db: Session, phone: str) -> Optional[Worker]:
-        """ Найти работника по номеру телефона """
-        statement = select(self._model).where(self._model.phone == phone)
-        try: return db.execute(statement).scalar_one_or_none()
-        except Exception as e: logger.error(f"Repo Error getting worker by phone {phone}: {e}"); db.rollback(); return None
+        """ Найти работника по номеру телефона в любом формате (+7..., 8..., 10 цифр) """
+        phone_norm = normalize_phone(phone)
+        if not phone_norm: return None
+        statement = select(self._model).where(self._model.phone_norm == phone_norm)
+        return self._read(db, lambda: db.execute(statement).scalar_one_or_none(), None, f"getting worker by phone {phone}")
 
     def get_by_email(self, db: Session, email: str) -> Optional[Worker]:
-        """ Найти работника по email """
-        statement = select(self._model).where(func.lower(self._model.mail) == func.lower(email))
-        try: return db.execute(statement).scalar_one_or_none()
-        except Exception as e: logger.error(f"Repo Error getting worker by email {email}: {e}"); db.rollback(); return None
+        """ Найти работника по email без учета регистра (индекс по mail_norm) """
+        mail_norm = normalize_email(email)
+        if not mail_norm: return None
+        statement = select(self._model).where(self._model.mail_norm == mail_norm)
+        return self._read(db, lambda: db.execute(statement).scalar_one_or_none(), None, f"getting worker by email {email}")
 
 class ProviderRepository(BaseRepository[Provider, ProviderCreate, ProviderUpdate]):
+    page_key = ("name", "id")
     def __init__(self): super().__init__(Provider)
     def find_by_inn(self, db: Session, inn: str) -> Optional[Provider]:
         statement = select(self._model).where(self._model.inn == inn)
-        try: return db.execute(statement).scalar_one_or_none()
-        except Exception as e: logger.error(f"Repo Error finding provider by INN {inn}: {e}"); db.rollback(); return None
+        return self._read(db, lambda: db.execute(statement).scalar_one_or_none(), None, f"finding provider by INN {inn}")
+    def list_rows(self, db: Session) -> List[ProviderListRow]:
+        """ Список поставщиков без ORM-объектов: только колонки карточки """
+        statement = provider_list_statement().order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        return self._read(db, lambda: [ProviderListRow._make(row) for row in db.execute(statement)], [], "listing provider rows")
+
+class StockMovementRepository(BaseRepository[StockMovement, StockMovementCreate, StockMovementCreate]):
+    """
+    Журнал движения материалов (только добавление) и снимки остатков. Остаток на дату - последний снимок
+    не позже даты плюс движения после него: два запроса по индексам (material, taken_at)/(material, created_at).
+    """
+    page_key = ("created_at", "id")
+    page_descending = True
+    def __init__(self): super().__init__(StockMovement)
+    def append(self, db: Session, movements: Sequence[Dict[str, Any]], at: Optional[datetime] = None) -> int:
+        """
+        Записывает движения {material_id, delta, reason, order_id} одним многострочным INSERT. Не коммитит:
+        вызывается из операции, меняющей balance, и фиксируется вместе с ней. Возвращает число записанных движений
+        (нулевые delta пропускаются; INSERT добавляет все строки или падает целиком)
+        """
+        at = at or datetime.now()
+        rows = [{"id": UUIDUtils.getUUID(), "created_at": at, "order_id": None, **movement,
+                 "reason": StockMovementReason(movement["reason"]).value}
+                for movement in movements if movement["delta"]]
+        if not rows: return 0
+        db.execute(sql_insert(self._model), rows)
+        inserted = len(rows)
+        return inserted
+    def _last_snapshots(self, at: datetime, material_ids: Optional[Sequence[str]] = None):
+        # Время последнего снимка каждого материала не позже at
+        statement = (select(StockSnapshot.material_id.label("material_id"), func.max(StockSnapshot.taken_at).label("taken_at"))
+                     .where(StockSnapshot.taken_at <= at).group_by(StockSnapshot.material_id))
+        if material_ids is not None: statement = statement.where(StockSnapshot.material_id.in_(material_ids))
+        return statement.subquery("last_snapshot")
+    def movement_sums(self, db: Session, at: datetime, material_ids: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """ Сумма движений каждого материала после его последнего снимка и до at включительно """
+        last = self._last_snapshots(at, material_ids)
+        statement = (select(self._model.material_id, func.sum(self._model.delta))
+                     .outerjoin(last, last.c.material_id == self._model.material_id)
+                     .where(self._model.created_at <= at,
+                            or_(last.c.taken_at.is_(None), self._model.created_at > last.c.taken_at))
+                     .group_by(self._model.material_id))
+        if material_ids is not None: statement = statement.where(self._model.material_id.in_(material_ids))
+        return self._read(db, lambda: {id: int(total) for id, total in db.execute(statement)}, {}, "summing stock movements")
+    def snapshot_balances(self, db: Session, at: datetime, material_ids: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """ Остатки из последних снимков не позже at """
+        last = self._last_snapshots(at, material_ids)
+        statement = (select(StockSnapshot.material_id, StockSnapshot.balance)
+                     .join(last, and_(last.c.material_id == StockSnapshot.material_id, last.c.taken_at == StockSnapshot.taken_at)))
+        return self._read(db, lambda: dict(db.execute(statement).all()), {}, "reading stock snapshots")
+    def balances_as_of(self, db: Session, at: datetime, material_ids: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """ Остатки на момент at по журналу: {material_id: остаток} для материалов с историей """
+        if material_ids is not None: material_ids = list(dict.fromkeys(material_ids))
+        balances = self.snapshot_balances(db, at, material_ids)
+        for id, total in self.movement_sums(db, at, material_ids).items():
+            balances[id] = balances.get(id, 0) + total
+        return balances
+    def add_snapshots(self, db: Session, balances: Dict[str, int], at: datetime) -> int:
+        """ Снимки остатков на момент at одним многострочным INSERT; возвращает число вставленных снимков (все или ошибка) """
+        rows = [{"id": UUIDUtils.getUUID(), "material_id": id, "balance": balance, "taken_at": at} for id, balance in balances.items()]
+        if not rows: return 0
+        try:
+            db.execute(sql_insert(StockSnapshot), rows); self._commit(db)
+            inserted = len(rows) # INSERT добавляет все строки или падает целиком
+            return inserted
+        except Exception as e: self._write_failed(db, f"adding {len(rows)} stock snapshots", e)
+    def compact(self, db: Session, before: datetime) -> int:
+        """
+        Удаляет движения не позже before, уже учтенные в снимке материала (снимок не позже before).
+        Остаток на любую дату после этого снимка считается так же; более ранняя история - только по снимкам
+        """
+        covered = (select(func.max(StockSnapshot.taken_at))
+                   .where(StockSnapshot.material_id == self._model.material_id, StockSnapshot.taken_at <= before)
+                   .scalar_subquery())
+        statement = sql_delete(self._model).where(self._model.created_at <= before, self._model.created_at <= covered)
+        try:
+            deleted = db.execute(statement.execution_options(synchronize_session=False)).rowcount
+            self._commit(db)
+            return deleted
+        except Exception as e: self._write_failed(db, f"compacting stock movements before {before}", e)
+    def consumption(self, db: Session, date_from: datetime, date_to: datetime) -> Dict[str, int]:
+        """ Расход материалов в заказы за период (списания минус возвраты): {material_id: количество} """
+        statement = (select(self._model.material_id, (-func.sum(self._model.delta)).label("consumed"))
+                     .where(self._model.reason == StockMovementReason.ORDER.value,
+                            self._model.created_at >= date_from, self._model.created_at <= date_to)
+                     .group_by(self._model.material_id))
+        return self._read(db, lambda: {id: int(total) for id, total in db.execute(statement)}, {}, "summing material consumption")
+
+class MaterialNotFoundError(ValueError):
+    """ Материалов с такими id нет """
+    def __init__(self, *material_ids: str):
+        self.material_ids = list(material_ids)
+        self.material_id = self.material_ids[0]
+        if len(self.material_ids) == 1: super().__init__(f"Material with ID {self.material_id} not found")
+        else: super().__init__(f"Materials with IDs {', '.join(self.material_ids)} not found")
+
+class StockShortage(NamedTuple):
+    """ Нехватка одного материала; balance и material_type известны, если остаток читался (блокирующее чтение) """
+    material_id: str
+    requested: int
+    balance: Optional[int] = None
+    material_type: Optional[str] = None
+    def __str__(self):
+        have = f", have {self.balance}" if self.balance is not None else ""
+        return f"material {self.material_type or self.material_id} (need {self.requested}{have})"
+
+class InsufficientStockError(ValueError):
+    """ Списание больше остатка - сразу по всем материалам, которых не хватает """
+    def __init__(self, shortages: Sequence[StockShortage]):
+        self.shortages = list(shortages)
+        super().__init__(f"Insufficient balance for {'; '.join(map(str, self.shortages))}.")
 
 class MaterialRepository(BaseRepository[Material, MaterialCreate, MaterialUpdate]):
-    def __init__(self): super().__init__(Material)
-    def update_balance(self, db: Session, material_id: str, change: int) -> Optional[Material]:
-        # ... (реализация как раньше) ...
-        update_statement = (
-            sql_update(self._model)
-            .where(self._model.id == material_id)
-            .where(self._model.balance + change >= 0)
-            .values(balance=self._model.balance + change)
-            #.returning(self._model) # Убираем, т.к. в MySQL может не работать как ожидалось
+    """
+    Изменения balance здесь пишут движение в журнал (StockMovementRepository) в той же транзакции: update_balance,
+    а также update / update_many / update_where - новый остаток в них записывается движением ADJUSTMENT.
+    Прежние остатки берутся из lock_balances (или переданного locked - строки уже заблокированы сервисом)
+    """
+    page_key = ("type", "id")
+    def __init__(self):
+        super().__init__(Material)
+        self.movements = StockMovementRepository()
+    def _adjustments(self, balances: Dict[str, int], locked: Dict[str, MaterialStockRow]) -> List[Dict[str, Any]]:
+        # {id: новый остаток} -> движения ADJUSTMENT от заблокированных прежних остатков
+        return [{"material_id": id, "delta": balance - locked[id].balance, "reason": StockMovementReason.ADJUSTMENT}
+                for id, balance in balances.items() if id in locked]
+    def update(self, db: Session, *, db_obj: Material, obj_in: MaterialUpdate | Dict[str, Any],
+               locked: Optional[Dict[str, MaterialStockRow]] = None) -> Material:
+        update_data = obj_in.model_dump(exclude_unset=True) if isinstance(obj_in, PydanticBaseModel) else dict(obj_in)
+        if 'balance' not in update_data: return super().update(db, db_obj=db_obj, obj_in=update_data)
+        id = db_obj.id
+        with unit_of_work(db):
+            if locked is None: locked = self.lock_balances(db, [id])
+            updated = super().update(db, db_obj=db_obj, obj_in=update_data)
+            self.movements.append(db, self._adjustments({id: update_data['balance']}, locked))
+        return updated
+    def update_many(self, db: Session, *, objs_in: Sequence[Dict[str, Any]],
+                    locked: Optional[Dict[str, MaterialStockRow]] = None) -> int:
+        balances = {obj_in['id']: obj_in['balance'] for obj_in in objs_in if 'balance' in obj_in and obj_in.get('id')}
+        if not balances: return super().update_many(db, objs_in=objs_in)
+        with unit_of_work(db):
+            if locked is None: locked = self.lock_balances(db, list(balances))
+            matched = super().update_many(db, objs_in=objs_in)
+            self.movements.append(db, self._adjustments(balances, locked))
+        return matched
+    def update_where(self, db: Session, *, ids: Sequence[str], obj_in: MaterialUpdate | Dict[str, Any],
+                     locked: Optional[Dict[str, MaterialStockRow]] = None) -> int:
+        values = obj_in.model_dump(exclude_unset=True) if isinstance(obj_in, PydanticBaseModel) else dict(obj_in)
+        if 'balance' not in values: return super().update_where(db, ids=ids, obj_in=values)
+        with unit_of_work(db):
+            if locked is None: locked = self.lock_balances(db, ids)
+            updated = super().update_where(db, ids=ids, obj_in=values)
+            self.movements.append(db, self._adjustments(dict.fromkeys(ids, values['balance']), locked))
+        return updated
+    def update_balance(self, db: Session, material_id: str, change: int, *,
+                       reason: StockMovementReason = StockMovementReason.MANUAL, order_id: Optional[str] = None) -> MaterialStockRow:
+        """
+        Атомарно меняет остаток на change и возвращает строку материала с новым остатком без перечитывания:
+        UPDATE ... RETURNING, если СУБД его поддерживает (SQLite, PostgreSQL), иначе (MySQL) SELECT ... FOR UPDATE
+        и UPDATE в одной транзакции. Нет материала - MaterialNotFoundError, не хватает - InsufficientStockError.
+        Загруженный в сессию объект материала синхронизируется без запроса (synchronize_session).
+        """
+        try:
+            if db.get_bind(mapper=self._model).dialect.update_returning: row = self._update_balance_returning(db, material_id, change)
+            else: row = self._update_balance_locked(db, material_id, change)
+            self.movements.append(db, [{"material_id": material_id, "delta": change, "reason": reason, "order_id": order_id}])
+            if not in_unit_of_work(db): db.commit()
+        except (MaterialNotFoundError, InsufficientStockError) as e:
+            logger.warning(f"Repo: Balance of material {material_id} not changed by {change}: {e}")
+            self._rollback(db); raise
+        except Exception as e: self._write_failed(db, f"updating balance for material {material_id}", e) # Передаем ошибку выше
+        logger.info(f"Repo: Updated balance for material {material_id} by {change}. New balance: {row.balance}")
+        return row
+    def _update_balance_returning(self, db: Session, material_id: str, change: int) -> MaterialStockRow:
+        # Условие на остаток в WHERE: пустой RETURNING - нехватка или нет материала; различает их
+        # один SELECT, и только в этом (неуспешном) случае
+        statement = (
+            sql_update(self._model).where(self._model.id == material_id, self._model.balance + change >= 0)
+            .values(balance=self._model.balance + change, **self._next_version())
+            .returning(self._model.id, self._model.type, self._model.balance, self._model.price, self._model.version)
         )
+        row = db.execute(statement).one_or_none()
+        if row is None:
+            current = db.execute(select(self._model.type, self._model.balance).where(self._model.id == material_id)).one_or_none()
+            if current is None: raise MaterialNotFoundError(material_id)
+            raise InsufficientStockError([StockShortage(material_id, -change, current.balance, current.type)])
+        return MaterialStockRow._make(row)
+    def _update_balance_locked(self, db: Session, material_id: str, change: int) -> MaterialStockRow:
+        # Блокировка строки до конца транзакции: между проверкой и UPDATE остаток никто не изменит
+        locked = select(self._model.type, self._model.balance, self._model.price, self._model.version).where(self._model.id == material_id).with_for_update()
+        current = db.execute(locked).one_or_none()
+        if current is None: raise MaterialNotFoundError(material_id)
+        if current.balance + change < 0: raise InsufficientStockError([StockShortage(material_id, -change, current.balance, current.type)])
+        db.execute(sql_update(self._model).where(self._model.id == material_id).values(balance=self._model.balance + change, **self._next_version()))
+        return MaterialStockRow(material_id, current.type, current.balance + change, current.price, current.version + 1)
+    def lock_balances(self, db: Session, material_ids: Sequence[str]) -> Dict[str, MaterialStockRow]:
+        """
+        Текущие остатки набора материалов одним SELECT ... FOR UPDATE (пачками по BULK_CHUNK_SIZE):
+        до конца транзакции их никто не изменит. {id: строка}; отсутствующих id в результате нет
+        """
+        ids = list(dict.fromkeys(material_ids))
+        columns = (self._model.id, self._model.type, self._model.balance, self._model.price, self._model.version)
+        locked = {}
+        for start in range(0, len(ids), BULK_CHUNK_SIZE):
+            statement = select(*columns).where(self._model.id.in_(ids[start:start + BULK_CHUNK_SIZE])).with_for_update()
+            locked.update((row.id, MaterialStockRow._make(row)) for row in db.execute(statement))
+        return locked
+    @staticmethod
+    def check_stock(amounts: Dict[str, int], locked: Dict[str, MaterialStockRow]):
+        """ Проверка списания {id: количество} по строкам lock_balances: ошибка сразу со всеми проблемными позициями """
+        missing = [id for id in amounts if id not in locked]
+        if missing: raise MaterialNotFoundError(*missing)
+        shortages = [StockShortage(id, amount, locked[id].balance, locked[id].type)
+                     for id, amount in amounts.items() if locked[id].balance < amount]
+        if shortages: raise InsufficientStockError(shortages)
+    def deduct_balances(self, db: Session, amounts: Dict[str, int], locked: Optional[Dict[str, MaterialStockRow]] = None, *,
+                        reason: StockMovementReason = StockMovementReason.ORDER, order_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Списывает остатки многих материалов одним UPDATE с CASE по id (и одним INSERT в журнал):
+        {id: количество} -> {id: новый остаток}.
+        Остатки проверяются (check_stock) по строкам, заблокированным lock_balances; если не переданы -
+        блокируются здесь.
+        """
+        amounts = {id: amount for id, amount in amounts.items() if amount}
+        if not amounts: return {}
+        try:
+            if locked is None: locked = self.lock_balances(db, list(amounts))
+            self.check_stock(amounts, locked)
+            ids = list(amounts)
+            for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                chunk = ids[start:start + BULK_CHUNK_SIZE]
+                deduction = case({id: amounts[id] for id in chunk}, value=self._model.id)
+                statement = (sql_update(self._model).where(self._model.id.in_(chunk))
+                             .values(balance=self._model.balance - deduction, **self._next_version()))
+                db.execute(statement.execution_options(synchronize_session=False))
+            self._expire_loaded(db, ids)
+            self.movements.append(db, [{"material_id": id, "delta": -amount, "reason": reason, "order_id": order_id}
+                                       for id, amount in amounts.items()])
+            self._commit(db)
+        except (MaterialNotFoundError, InsufficientStockError) as e:
+            logger.warning(f"Repo: Balances not deducted: {e}")
+            self._rollback(db); raise
+        except Exception as e: self._write_failed(db, f"deducting balances of {len(amounts)} materials", e)
+        logger.info(f"Repo: Deducted balances of {len(amounts)} materials in one UPDATE")
+        return {id: locked[id].balance - amount for id, amount in amounts.items()}
+
+class StockReservationRepository(BaseRepository[StockReservation, StockReservationCreate, StockReservationCreate]):
+    """
+    Резервы материалов под заказы в статусе 'Обработка' - по одной строке на материал заказа.
+    Зарезервировано по материалу - SUM(amount) по индексу (material, amount), свободный остаток
+    (balance - резерв) - один запрос вместе с materials. Изменения внутри unit_of_work операции заказа
+    только flush-атся и фиксируются вместе с ней; проверки идут по строкам MaterialRepository.lock_balances
+    """
+    def __init__(self): super().__init__(StockReservation)
+    def _reserved_statement(self, material_ids: Optional[Sequence[str]] = None):
+        statement = (select(self._model.material_id.label("material_id"), func.sum(self._model.amount).label("reserved"))
+                     .group_by(self._model.material_id))
+        if material_ids is not None: statement = statement.where(self._model.material_id.in_(material_ids))
+        return statement
+    def reserved(self, db: Session, material_ids: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """ Зарезервировано по материалам: {material_id: количество}; материалов без резерва в результате нет """
+        statement = self._reserved_statement(material_ids)
+        return self._read(db, lambda: {id: int(total) for id, total in db.execute(statement)}, {}, "summing stock reservations")
+    def available(self, db: Session, material_ids: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """ Свободный остаток balance - резерв: {material_id: количество} одним запросом """
+        reserved = self._reserved_statement(material_ids).subquery("reserved")
+        statement = (select(Material.id, Material.balance - func.coalesce(reserved.c.reserved, 0))
+                     .outerjoin(reserved, reserved.c.material_id == Material.id))
+        if material_ids is not None: statement = statement.where(Material.id.in_(material_ids))
+        return self._read(db, lambda: {id: int(amount) for id, amount in db.execute(statement)}, {}, "reading available stock")
+    def check_available(self, db: Session, amounts: Dict[str, int], locked: Dict[str, MaterialStockRow]):
+        """
+        Хватает ли свободного остатка на {material_id: количество}: строки lock_balances за вычетом резервов.
+        Ошибка (MaterialNotFoundError / InsufficientStockError) сразу по всем позициям, в нехватке - свободный остаток
+        """
+        reserved = {id: int(total) for id, total in db.execute(self._reserved_statement(list(amounts)))}
+        MaterialRepository.check_stock(amounts, {id: row._replace(balance=row.balance - reserved.get(id, 0)) for id, row in locked.items()})
+    @staticmethod
+    def _rows(order_id: str, amounts: Dict[str, int]) -> List[Dict[str, Any]]:
+        now = datetime.now()
+        return [{"id": UUIDUtils.getUUID(), "order_id": order_id, "material_id": id, "amount": amount, "created_at": now}
+                for id, amount in amounts.items() if amount > 0]
+    def add(self, db: Session, order_id: str, amounts: Dict[str, int]) -> int:
+        """
+        Резервы заказа {material_id: количество} одним многострочным INSERT (без проверки - см. check_available).
+        Возвращает число вставленных резервов: нулевые количества пропускаются, остальные вставляются все или ни одного
+        """
+        rows = self._rows(order_id, amounts)
+        if not rows: return 0
+        try:
+            db.execute(sql_insert(self._model), rows); self._commit(db)
+            inserted = len(rows)
+            logger.info(f"Repo: Reserved {inserted} materials for order {order_id}")
+            return inserted
+        except Exception as e: self._write_failed(db, f"reserving materials for order {order_id}", e)
+    def adjust(self, db: Session, order_id: str, material_id: str, delta: int, locked: Dict[str, MaterialStockRow]) -> int:
+        """
+        Меняет резерв материала заказа на delta: новая строка, UPDATE или DELETE, если резерв стал нулевым.
+        Рост проверяется по свободному остатку (locked - строка материала из lock_balances). Возвращает новый резерв
+        """
+        where = (self._model.order_id == order_id, self._model.material_id == material_id)
         try:
-            update_result = db.execute(update_statement)
-            if update_result.rowcount == 0:
-                db.rollback()
-                logger.warning(f"Repo: Failed to update balance for material {material_id} (maybe balance < {-change}?)")
-                # Получаем текущий объект, чтобы проверить причину
-                current_obj = self.get(db, material_id)
-                if current_obj and current_obj.balance + change < 0:
-                    raise ValueError(f"Insufficient balance for material {current_obj.type}")
-                else: # Другая причина (например, ID не найден)
-                    raise ValueError(f"Material with ID {material_id} not found or other error.")
-            db.commit()
-            updated_obj = self.get(db, material_id) # Получаем после коммита
-            logger.info(f"Repo: Updated balance for material {material_id} by {change}. New balance: {updated_obj.balance if updated_obj else 'N/A'}")
-            return updated_obj
-        except Exception as e: logger.error(f"Repo Error updating balance for material {material_id}: {e}"); db.rollback(); raise # Передаем ошибку выше
+            current = db.execute(select(self._model.amount).where(*where).with_for_update()).scalar_one_or_none() or 0
+            if delta > 0: self.check_available(db, {material_id: delta}, locked)
+            amount = current + delta
+            if amount <= 0: db.execute(sql_delete(self._model).where(*where).execution_options(synchronize_session=False))
+            elif current: db.execute(sql_update(self._model).where(*where).values(amount=amount).execution_options(synchronize_session=False))
+            else: db.execute(sql_insert(self._model), self._rows(order_id, {material_id: amount}))
+            self._commit(db)
+            return max(amount, 0)
+        except (MaterialNotFoundError, InsufficientStockError) as e:
+            logger.warning(f"Repo: Reservation of material {material_id} for order {order_id} not changed by {delta}: {e}")
+            self._rollback(db); raise
+        except Exception as e: self._write_failed(db, f"adjusting reservation of material {material_id} for order {order_id}", e)
+    def for_order(self, db: Session, order_id: str) -> Dict[str, int]:
+        """ Резервы заказа {material_id: количество}, строки блокируются до конца транзакции (перевод в расход) """
+        statement = select(self._model.material_id, self._model.amount).where(self._model.order_id == order_id).with_for_update()
+        return dict(db.execute(statement).all())
+    def release(self, db: Session, order_id: str) -> int:
+        """ Снимает все резервы заказа; возвращает число строк """
+        try:
+            statement = sql_delete(self._model).where(self._model.order_id == order_id)
+            released = db.execute(statement.execution_options(synchronize_session=False)).rowcount
+            self._commit(db)
+            return released
+        except Exception as e: self._write_failed(db, f"releasing reservations of order {order_id}", e)
+    def orders_to_convert(self, db: Session, *, after: Optional[str] = None, limit: int) -> List[str]:
+        """ Заказы с резервом, уже ушедшие из 'Обработка' (статус сменили мимо OrderService): пачка по id после after """
+        statement = (select(distinct(self._model.order_id)).join(Order, Order.id == self._model.order_id)
+                     .where(Order.status != OrderStatus.PROCESSING.value).order_by(self._model.order_id).limit(limit))
+        if after is not None: statement = statement.where(self._model.order_id > after)
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], "finding reservations to convert")
 
 class OrderRepository(BaseRepository[Order, OrderCreate, OrderUpdate]):
+    # Новые заказы первыми; индекс ix_orders_date_id
+    page_key = ("date", "id")
+    page_descending = True
     def __init__(self): super().__init__(Order)
+    def get_with_details(self, db: Session, id: str, *, materials: bool = True) -> Optional[Order]:
+        """
+        Заказ со связями за постоянное число запросов: client и worker - JOIN в запросе заказа,
+        materials_link вместе с material - второй запрос (selectin), сколько бы материалов ни было.
+        """
+        options = [joinedload(self._model.client), joinedload(self._model.worker)]
+        if materials: options.append(selectinload(self._model.materials_link).joinedload(MaterialOnOrder.material))
+        statement = select(self._model).where(self._model.id == id).options(*options)
+        return self._read(db, lambda: db.execute(statement).unique().scalar_one_or_none(), None, f"getting order {id} with details")
     def find_by_status(self, db: Session, status: OrderStatus) -> List[Order]:
         # ... (реализация как раньше) ...
         statement = select(self._model).where(self._model.status == status)
-        try: return db.execute(statement).scalars().all()
-        except Exception as e: logger.error(f"Repo Error finding orders by status {status.value}: {e}"); db.rollback(); return []
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], f"finding orders by status {status.value}")
     def find_by_client(self, db: Session, client_id: str) -> List[Order]:
         # ... (реализация как раньше) ...
         statement = select(self._model).where(self._model.client_id == client_id)
-        try: return db.execute(statement).scalars().all()
-        except Exception as e: logger.error(f"Repo Error finding orders by client {client_id}: {e}"); db.rollback(); return []
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], f"finding orders by client {client_id}")
     def find_by_worker(self, db: Session, worker_id: str) -> List[Order]:
         statement = select(self._model).where(self._model.worker_id == worker_id)
-        try: return db.execute(statement).scalars().all()
-        except Exception as e: logger.error(f"Repo Error finding orders by worker {worker_id}: {e}"); db.rollback(); return []
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], f"finding orders by worker {worker_id}")
     
-    def find_with_filters(self, db: Session, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[Order]:
-        """Find orders with multiple filters"""
-        statement = select(self._model)
-        
+    @staticmethod
+    def apply_filters(statement, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None):
+        """ WHERE по полям заказа и диапазону дат (общий для синхронного и async репозитория) """
         # Apply all filters
         for field, value in filters.items():
-            statement = statement.where(getattr(self._model, field) == value)
+            statement = statement.where(getattr(Order, field) == value)
             
         # Apply date range if provided
         if date_from:
-            statement = statement.where(self._model.date >= date_from)
+            statement = statement.where(Order.date >= date_from)
         if date_to:
-            statement = statement.where(self._model.date <= date_to)
-            
-        try:
-            return db.execute(statement).scalars().all()
-        except Exception as e:
-            logger.error(f"Repo Error finding orders with filters {filters}: {e}")
-            db.rollback()
-            return []
+            statement = statement.where(Order.date <= date_to)
+        return statement
+
+    def find_with_filters(self, db: Session, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[Order]:
+        """Find orders with multiple filters"""
+        statement = self.apply_filters(select(self._model), filters, date_from, date_to)
+        statement = statement.order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], f"finding orders with filters {filters}")
+
+    def list_rows_with_filters(self, db: Session, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[OrderListRow]:
+        """Filtered orders as lightweight rows: one SELECT of the list columns with client/worker names joined"""
+        statement = self.apply_filters(order_list_statement(), filters, date_from, date_to)
+        statement = statement.order_by(*keyset_order(self._model, self.page_key, self.page_descending))
+        return self._read(db, lambda: [OrderListRow._make(row) for row in db.execute(statement)], [], f"listing order rows with filters {filters}")
+
+    def find_page_with_filters(self, db: Session, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                               *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Order]:
+        """Keyset page of filtered orders, newest first"""
+        return self.get_page(db, limit=limit, cursor=cursor,
+                             statement=self.apply_filters(select(self._model), filters, date_from, date_to))
+
+    def list_rows_page_with_filters(self, db: Session, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                                    *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[OrderListRow]:
+        """Keyset page of filtered order rows (see list_rows_with_filters), newest first"""
+        paged, direction = keyset_statement(self.apply_filters(order_list_statement(), filters, date_from, date_to),
+                                            self._model, self.page_key, limit, cursor, self.page_descending)
+        rows = self._read(db, lambda: [OrderListRow._make(row) for row in db.execute(paged)], [], f"getting page of order rows with filters {filters}")
+        return build_page(rows, self.page_key, limit, cursor, direction)
             
+    @classmethod
+    def status_counts_statement(cls, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None):
+        """ SELECT status, COUNT(*) ... GROUP BY status с теми же фильтрами (общий для синхронного и async) """
+        statement = select(Order.status, func.count()).select_from(Order).group_by(Order.status)
+        return cls.apply_filters(statement, filters, date_from, date_to)
+
+    @staticmethod
+    def status_counts(rows) -> Dict[str, int]:
+        """ {статус: число} для всех статусов, включая отсутствующие в выборке (0) """
+        counts = {status.value: 0 for status in OrderStatus}
+        counts.update((status, count) for status, count in rows)
+        return counts
+
+    def count_by_status_with_filters(self, db: Session, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> Dict[str, int]:
+        """Order counts per status in one GROUP BY query"""
+        statement = self.status_counts_statement(filters, date_from, date_to)
+        return self._read(db, lambda: self.status_counts(db.execute(statement)), self.status_counts([]),
+                          f"counting orders by status with filters {filters}")
+
     def count_with_filters(self, db: Session, filters: Dict[str, Any], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> int:
         """Count orders with multiple filters"""
-        from sqlalchemy import func
-        statement = select(func.count()).select_from(self._model)
-        
-        # Apply all filters
-        for field, value in filters.items():
-            statement = statement.where(getattr(self._model, field) == value)
+        statement = self.apply_filters(select(func.count()).select_from(self._model), filters, date_from, date_to)
             
-        # Apply date range if provided
-        if date_from:
-            statement = statement.where(self._model.date >= date_from)
-        if date_to:
-            statement = statement.where(self._model.date <= date_to)
-            
-        try:
-            return db.execute(statement).scalar() or 0
-        except Exception as e:
-            logger.error(f"Repo Error counting orders with filters {filters}: {e}")
-            db.rollback()
-            return 0
+        return self._read(db, lambda: db.execute(statement).scalar() or 0, 0, f"counting orders with filters {filters}")
 
 class MaterialOnOrderRepository(BaseRepository[MaterialOnOrder, MaterialOnOrderCreate, MaterialOnOrderUpdate]):
     def __init__(self): super().__init__(MaterialOnOrder)
     def find_by_order_id(self, db: Session, order_id: str) -> List[MaterialOnOrder]:
         # ... (реализация как раньше) ...
         statement = select(self._model).where(self._model.order_id == order_id)
-        try: return db.execute(statement).scalars().all()
-        except Exception as e: logger.error(f"Repo Error finding MatOnOrder by order_id {order_id}: {e}"); db.rollback(); return []
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], f"finding MatOnOrder by order_id {order_id}")
+    def find_by_order_ids(self, db: Session, order_ids: Sequence[str]) -> List[MaterialOnOrder]:
+        """ Связи сразу для набора заказов (страница списка) - один запрос WHERE order IN (...) """
+        order_ids = list(dict.fromkeys(order_ids))
+        def run():
+            links = []
+            for start in range(0, len(order_ids), BULK_CHUNK_SIZE):
+                statement = select(self._model).where(self._model.order_id.in_(order_ids[start:start + BULK_CHUNK_SIZE]))
+                links.extend(db.execute(statement).scalars())
+            return links
+        if not order_ids: return []
+        return self._read(db, run, [], f"finding MatOnOrder for {len(order_ids)} orders")
     def find_by_material_id(self, db: Session, material_id: str) -> List[MaterialOnOrder]:
         statement = select(self._model).where(self._model.material_id == material_id)
-        try: return db.execute(statement).scalars().all()
-        except Exception as e: logger.error(f"Repo Error finding MatOnOrder by material_id {material_id}: {e}"); db.rollback(); return []
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], f"finding MatOnOrder by material_id {material_id}")
 
 class MaterialProviderRepository(BaseRepository[MaterialProvider, MaterialProviderCreate, MaterialProviderUpdate]):
     def __init__(self): super().__init__(MaterialProvider)
     def find_by_provider_id(self, db: Session, provider_id: str) -> List[MaterialProvider]:
         statement = select(self._model).where(self._model.provider_id == provider_id)
-        try: return db.execute(statement).scalars().all()
-        except Exception as e: logger.error(f"Repo Error finding MatProv by provider_id {provider_id}: {e}"); db.rollback(); return []
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], f"finding MatProv by provider_id {provider_id}")
     def find_by_material_id(self, db: Session, material_id: str) -> List[MaterialProvider]:
         statement = select(self._model).where(self._model.material_id == material_id)
-        try: return db.execute(statement).scalars().all()
-        except Exception as e: logger.error(f"Repo Error finding MatProv by material_id {material_id}: {e}"); db.rollback(); return []
+        return self._read(db, lambda: db.execute(statement).scalars().all(), [], f"finding MatProv by material_id {material_id}")
     def get_link(self, db: Session, provider_id: str, material_id: str) -> Optional[MaterialProvider]:
          statement = select(self._model).where(
              self._model.provider_id == provider_id,
              self._model.material_id == material_id
          )
-         try: return db.execute(statement).scalar_one_or_none()
-         except Exception as e: logger.error(f"Repo Error getting MatProv link: {e}"); db.rollback(); return None
\ No newline at end of file
+         return self._read(db, lambda: db.execute(statement).scalar_one_or_none(), None, "getting MatProv link")
\ No newline at end of file
@@ -0,0 +1,250 @@
+# resilience.py
+# Классификация ошибок БД, повтор идемпотентных чтений с экспоненциальной задержкой и circuit breaker.
+# Circuit breaker висит на событиях движка: сбои соединения считаются в handle_error, а пока БД
+# считается недоступной, новое подключение отклоняется в do_connect за миллисекунды вместо
+# ожидания таймаута. Смена состояния сообщается интерфейсу через signalBus.
+import time
+import random
+import asyncio
+import logging
+import threading
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from sqlalchemy import event, exc
+
+from ..config import (
+    DB_RETRY_ATTEMPTS, DB_RETRY_BASE_DELAY, DB_RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+)
+from ..signal_bus import signalBus
+from .unit_of_work import in_unit_of_work
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Коды клиента MySQL: нет соединения, сервер ушел, потеря соединения во время запроса
+CONNECTION_ERROR_CODES = {2002, 2003, 2005, 2006, 2013, 2055}
+# Lock wait timeout, deadlock - транзакцию можно повторить
+LOCK_ERROR_CODES = {1205, 1213}
+SQLITE_CONNECTION_MESSAGES = ("unable to open database file", "disk i/o error")
+SQLITE_LOCK_MESSAGES = ("database is locked", "database table is locked", "database is busy")
+
+
+class DatabaseUnavailableError(RuntimeError):
+    """ БД недоступна: сбой соединения после всех повторов или открытый circuit breaker """
+
+
+class DbErrorKind(Enum):
+    CONNECTION = "connection" # БД недоступна - повторять, считать в circuit breaker
+    TRANSIENT = "transient"   # deadlock, ожидание блокировки - повторять
+    BUSY = "busy"             # нет свободного соединения в пуле: pool_timeout уже прошел - не повторять
+    INTEGRITY = "integrity"   # нарушение ограничений - повтор не поможет
+    PERMANENT = "permanent"   # ошибка SQL, схемы или данных
+
+    @property
+    def retryable(self) -> bool:
+        return self in (DbErrorKind.CONNECTION, DbErrorKind.TRANSIENT)
+
+
+def _error_code(error) -> Optional[int]:
+    args = getattr(error, "args", ())
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+def classify_error(error: BaseException) -> DbErrorKind:
+    """ Тип ошибки по исключению SQLAlchemy или драйвера (коды MySQL, сообщения SQLite) """
+    if isinstance(error, DatabaseUnavailableError): return DbErrorKind.CONNECTION
+    if isinstance(error, exc.DisconnectionError): return DbErrorKind.CONNECTION
+    # Пул: все соединения заняты весь pool_timeout - повтор только продлил бы зависание интерфейса
+    if isinstance(error, exc.TimeoutError): return DbErrorKind.BUSY
+    if isinstance(error, exc.DBAPIError):
+        if error.connection_invalidated: return DbErrorKind.CONNECTION
+        original = error.orig
+    else:
+        original = error
+    # Имена классов исключений DBAPI общие для всех драйверов (PEP 249)
+    name = type(original).__name__
+    if name == "IntegrityError": return DbErrorKind.INTEGRITY
+    if name not in ("OperationalError", "InterfaceError", "InternalError"): return DbErrorKind.PERMANENT
+    code = _error_code(original)
+    message = str(original).lower()
+    if code in CONNECTION_ERROR_CODES or any(m in message for m in SQLITE_CONNECTION_MESSAGES):
+        return DbErrorKind.CONNECTION
+    if code in LOCK_ERROR_CODES or any(m in message for m in SQLITE_LOCK_MESSAGES):
+        return DbErrorKind.TRANSIENT
+    # InterfaceError без кода - соединение закрыто или сломано
+    if name == "InterfaceError": return DbErrorKind.CONNECTION
+    return DbErrorKind.PERMANENT
+
+
+def unavailable_error(error: BaseException) -> DatabaseUnavailableError:
+    if isinstance(error, DatabaseUnavailableError): return error
+    detail = error.orig if isinstance(error, exc.DBAPIError) else error
+    return DatabaseUnavailableError(f"База данных недоступна: {detail}")
+
+
+class CircuitBreaker:
+    """
+    closed - все подключения разрешены; open - подключения отклоняются сразу;
+    half_open - после CIRCUIT_RESET_TIMEOUT пропускается одно пробное подключение.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT, notify: bool = True):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.notify = notify # Сообщать интерфейсу (для реплики не нужно - чтения уходят на основную БД)
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_at = 0.0
+        self.last_error: Optional[str] = None
+        self.rejected = 0
+
+    @property
+    def closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def before_connect(self):
+        """ Вызывается перед новым подключением; при недоступной БД сразу бросает DatabaseUnavailableError """
+        if self.state == self.CLOSED: return
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_at = 0.0
+            # Одно пробное подключение; если оно зависло дольше reset_timeout - разрешаем следующее
+            if self.state == self.HALF_OPEN and now - self._trial_at >= self.reset_timeout:
+                self._trial_at = now
+                logger.info(f"Circuit '{self.name}': trying to reconnect.")
+                return
+            if self.state == self.CLOSED: return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (now - self._opened_at))
+        raise DatabaseUnavailableError(f"База данных недоступна (повтор через {retry_in:.0f} с): {self.last_error}")
+
+    def record_success(self):
+        if self.state == self.CLOSED and self.failures == 0: return
+        with self._lock:
+            was_closed = self.state == self.CLOSED
+            self.state = self.CLOSED
+            self.failures = 0
+        if not was_closed:
+            logger.info(f"Circuit '{self.name}': database is available again.")
+            if self.notify:
+                signalBus.database_availability_changed.emit(True, "Соединение с базой данных восстановлено")
+
+    def record_failure(self, error: BaseException):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error.orig if isinstance(error, exc.DBAPIError) else error).splitlines()[0]
+            was_closed = self.state == self.CLOSED
+            if self.state == self.HALF_OPEN or (was_closed and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            opened = was_closed and self.state == self.OPEN
+        if opened:
+            # Неудачные пробные подключения (half_open -> open) интерфейсу повторно не сообщаются
+            message = f"База данных недоступна: {self.last_error}"
+            logger.error(f"Circuit '{self.name}' opened after {self.failures} connection failure(s): {self.last_error}")
+            if self.notify:
+                signalBus.database_availability_changed.emit(False, message)
+                signalBus.database_error.emit(message) # Существующие обработчики окон показывают ошибку
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"circuit": self.name, "state": self.state, "failures": self.failures,
+                    "rejected": self.rejected, "last_error": self.last_error}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def circuit_breaker(profile: str) -> CircuitBreaker:
+    """ Один circuit breaker на профиль БД: синхронный и async движки одной БД делят состояние """
+    if profile not in _breakers:
+        _breakers[profile] = CircuitBreaker(profile)
+    return _breakers[profile]
+
+
+def install_resilience(engine, profile: str) -> CircuitBreaker:
+    """ Вешает circuit breaker профиля на движок (sync engine или AsyncEngine.sync_engine) """
+    breaker = circuit_breaker(profile)
+
+    @event.listens_for(engine, "do_connect")
+    def _before_connect(dialect, connection_record, cargs, cparams):
+        breaker.before_connect()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        breaker.record_success()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        breaker.record_success()
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        # Отказ самого breaker-а - не новый сбой (иначе отказы во время пробного подключения снова открывали бы его)
+        if isinstance(context.original_exception, DatabaseUnavailableError): return
+        if context.is_disconnect or classify_error(context.original_exception) is DbErrorKind.CONNECTION:
+            breaker.record_failure(context.original_exception)
+
+    return breaker
+
+
+def backoff_delay(attempt: int) -> float:
+    """ Экспоненциальная задержка перед повтором attempt (1, 2, ...) с разбросом, чтобы клиенты не били в БД разом """
+    delay = min(DB_RETRY_MAX_DELAY, DB_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def _should_retry(db, error: BaseException, attempt: int) -> bool:
+    if attempt >= DB_RETRY_ATTEMPTS or isinstance(error, DatabaseUnavailableError): return False
+    if not classify_error(error).retryable: return False
+    # Повтор откатывает транзакцию сессии - нельзя, если в ней есть несохраненные изменения
+    if in_unit_of_work(db) or db.new or db.dirty or db.deleted: return False
+    return True
+
+
+def _before_retry(error: BaseException, attempt: int) -> float:
+    from .routing import replicaRouter
+    delay = backoff_delay(attempt)
+    logger.warning(f"Transient DB error ({classify_error(error).value}), retry {attempt}/{DB_RETRY_ATTEMPTS - 1} "
+                   f"in {delay * 1000:.0f} ms: {error}")
+    # Сбой мог быть на реплике - перед повтором роутер проверит ее заново
+    if replicaRouter.enabled: replicaRouter.recheck()
+    return delay
+
+
+def retry_read(db, run: Callable[[], T]) -> T:
+    """ Выполняет идемпотентное чтение run(), повторяя его при временных сбоях """
+    attempt = 1
+    while True:
+        try:
+            return run()
+        except Exception as e:
+            if not _should_retry(db, e, attempt): raise
+            delay = _before_retry(e, attempt)
+            db.rollback()
+            time.sleep(delay)
+            attempt += 1
+
+
+async def retry_read_async(db, run: Callable[[], Awaitable[T]]) -> T:
+    """ retry_read для AsyncSession: run - функция, возвращающая корутину """
+    attempt = 1
+    while True:
+        try:
+            return await run()
+        except Exception as e:
+            if not _should_retry(db, e, attempt): raise
+            delay = _before_retry(e, attempt)
+            await db.rollback()
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,267 @@
+# routing.py
+# Разделение чтения и записи. Чтения, помеченные read_only (списки, счетчики, отчеты), идут на реплику,
+# все остальное - в основную БД. Реплика используется, только пока она доступна и отстает не больше
+# REPLICA_MAX_LAG_SECONDS, иначе запрос молча уходит в основную БД.
+# Отставание измеряется по метке heartbeat в schema_meta: основная БД обновляет ее в каждом коммите
+# с изменениями, а реплика получает ее вместе с остальными данными (так же, как pt-heartbeat в MySQL).
+import time
+import math
+import inspect
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..config import REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_INTERVAL, REPLICA_RETRY_SECONDS
+from .resilience import circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+READ_ONLY_KEY = "read_only"
+_WROTE_KEY = "replica_wrote"         # В текущей транзакции были изменения
+_HEARTBEAT_KEY = "replica_heartbeat" # Метка heartbeat, добавленная в текущую транзакцию
+
+
+def heartbeat_lag(primary_beat: Optional[str], replica_beat: Optional[str]) -> float:
+    """ Отставание реплики в секундах по меткам heartbeat (inf - реплика еще не получила ни одной) """
+    if primary_beat is None: return 0.0
+    if replica_beat is None: return math.inf
+    return max(0.0, float(primary_beat) - float(replica_beat))
+
+
+class ReplicaRouter:
+    """ Движок реплики и ее состояние: доступность и отставание """
+
+    def __init__(self):
+        self.profile: Optional[str] = None
+        self.engine = None
+        self._async_engine = None
+        self._lock = threading.Lock() # Только для состояния: проверка реплики идет без него
+        self._usable = False
+        self._checking = False # Реплику сейчас проверяет один из потоков
+        self._stale = True # Своя запись после последней проверки - проверить заново
+        self._checked_at = 0.0
+        self._retry_at = 0.0
+        self._own_beat: Optional[float] = None # Метка последнего своего коммита: свои изменения читаем всегда
+        self.lag: Optional[float] = None
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine is not None
+
+    def configure(self, profile: Optional[str]):
+        """ Подключает реплику профиля из config.DATABASE_PROFILES (пустой профиль - без реплики) """
+        from . import database
+        from .schema import schema_meta_metadata
+        self.dispose()
+        if not profile: return
+        self.engine = database.create_db_engine(profile)
+        self.profile = profile
+        # Недоступная реплика - не ошибка для пользователя: чтения просто уходят на основную БД
+        circuit_breaker(profile).notify = False
+        # Метка heartbeat пишется в основную БД при каждом коммите - таблица должна быть
+        schema_meta_metadata.create_all(bind=database.engine)
+        self._stale = True
+        logger.info(f"Read replica '{profile}' configured (max lag {REPLICA_MAX_LAG_SECONDS}s).")
+
+    def dispose(self):
+        if self.engine is not None:
+            self.engine.dispose()
+        if self._async_engine is not None:
+            logger.warning(f"Async replica engine for '{self.profile}' dropped without dispose_async()")
+        self.engine = None
+        self._async_engine = None
+        self.profile = None
+        self._usable = False
+
+    def async_engine(self):
+        """ AsyncEngine реплики, создается при первом чтении через AsyncSession """
+        if self._async_engine is None:
+            from .async_database import create_async_db_engine
+            self._async_engine = create_async_db_engine(self.profile)
+        return self._async_engine
+
+    async def dispose_async(self):
+        if self._async_engine is None: return
+        await self._async_engine.dispose()
+        self._async_engine = None
+
+    def use_replica(self) -> bool:
+        """ Можно ли читать с реплики сейчас; заодно считает, куда ушли чтения """
+        if self.engine is None: return False
+        with self._lock:
+            now = time.monotonic()
+            probe = (not self._checking and now >= self._retry_at
+                     and (self._stale or now - self._checked_at >= REPLICA_CHECK_INTERVAL))
+            if probe: self._checking, self._checked_at, self._stale = True, now, False
+        # Подключение к медленной или недоступной реплике не держит остальные потоки:
+        # пока один поток проверяет, другие решают по последнему известному состоянию
+        if probe: self._check(now)
+        with self._lock:
+            usable = self._usable and time.monotonic() >= self._retry_at and circuit_breaker(self.profile).closed
+            if usable: self.replica_reads += 1
+            else: self.primary_fallbacks += 1
+        return usable
+
+    def mark_written(self, beat: Optional[float] = None):
+        """ После коммита с изменениями реплика их еще не видит - следующее чтение проверит ее заново """
+        if beat is not None: self._own_beat = max(beat, self._own_beat or 0.0)
+        self._stale = True
+
+    def recheck(self):
+        """ Проверить реплику при следующем чтении, даже если она недавно была недоступна """
+        self._retry_at = 0.0
+        self._stale = True
+
+    def _check(self, now: float):
+        """ Проверка реплики вне self._lock; результат публикуется под ним """
+        from . import database
+        from .schema import HEARTBEAT_KEY, read_meta
+        try:
+            try:
+                with self.engine.connect() as connection:
+                    replica_beat = read_meta(connection, HEARTBEAT_KEY)
+            except Exception as e:
+                with self._lock:
+                    self._retry_at = now + REPLICA_RETRY_SECONDS
+                    self.lag = None
+                    self._set_usable(False, f"unavailable ({type(e).__name__}: {e}), retry in {REPLICA_RETRY_SECONDS:.0f}s")
+                return
+            with database.engine.connect() as connection:
+                primary_beat = read_meta(connection, HEARTBEAT_KEY)
+            with self._lock:
+                self.lag = heartbeat_lag(primary_beat, replica_beat)
+                if self._own_beat is not None and (replica_beat is None or float(replica_beat) < self._own_beat):
+                    # Допустимое отставание - для чужих изменений; свои пользователь должен видеть сразу
+                    self._set_usable(False, f"own changes not replicated yet (lag {self.lag:.1f}s)")
+                else:
+                    self._set_usable(self.lag <= REPLICA_MAX_LAG_SECONDS, f"lag {self.lag:.1f}s")
+        finally:
+            with self._lock: self._checking = False
+
+    def _set_usable(self, usable: bool, reason: str):
+        if usable != self._usable:
+            if usable: logger.info(f"Read replica '{self.profile}' in use: {reason}.")
+            else: logger.warning(f"Read replica '{self.profile}' bypassed, reads go to primary: {reason}.")
+        self._usable = usable
+
+    def summary(self) -> str:
+        return (f"Read replica '{self.profile}': {self.replica_reads} reads served, "
+                f"{self.primary_fallbacks} fell back to primary, last lag {self.lag}")
+
+
+replicaRouter = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """ Сессия основной БД; чтения в режиме read_only уходят на реплику, если она пригодна """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get(READ_ONLY_KEY)
+                and not self._flushing and not self.info.get(_WROTE_KEY)
+                and not (clause is not None and getattr(clause, "is_dml", False))
+                and replicaRouter.use_replica()):
+            return self._replica_bind()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_bind(self):
+        return replicaRouter.engine
+
+
+class AsyncRoutingSession(RoutingSession):
+    """ sync_session_class для AsyncSession: реплика - sync_engine ее AsyncEngine """
+
+    def _replica_bind(self):
+        return replicaRouter.async_engine().sync_engine
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _track_bulk_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _track_flush(session, flush_context):
+    session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, "before_commit")
+def _write_heartbeat(session):
+    # before_commit срабатывает до финального flush, поэтому учитываем и еще не сброшенные изменения
+    wrote = session.info.pop(_WROTE_KEY, False) or bool(session.new or session.dirty or session.deleted)
+    if not wrote or not replicaRouter.enabled or session.info.get(_HEARTBEAT_KEY): return
+    from .schema import HEARTBEAT_KEY, write_meta
+    value = f"{time.time():.6f}"
+    write_meta(session.connection(bind_arguments={"bind": session.bind}), HEARTBEAT_KEY, value)
+    beat = float(value) # Сравнивается с меткой, прочитанной с реплики
+    session.info[_HEARTBEAT_KEY] = beat
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session):
+    session.info.pop(_WROTE_KEY, None)
+    beat = session.info.pop(_HEARTBEAT_KEY, None)
+    if beat is not None:
+        replicaRouter.mark_written(beat)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_WROTE_KEY, None)
+    session.info.pop(_HEARTBEAT_KEY, None)
+
+
+@contextmanager
+def reading(db):
+    """ Запросы внутри блока - только чтение, их можно выполнить на реплике """
+    previous = db.info.get(READ_ONLY_KEY)
+    db.info[READ_ONLY_KEY] = True
+    try:
+        yield db
+    finally:
+        if previous is None: db.info.pop(READ_ONLY_KEY, None)
+        else: db.info[READ_ONLY_KEY] = previous
+
+
+def read_only(method):
+    """ Метод контроллера/сервиса method(self, db, ...) только читает - его запросы можно отправить на реплику """
+    if inspect.isgeneratorfunction(method):
+        # Генератор выполняет запросы во время итерации - флаг держится, пока он не исчерпан
+        @functools.wraps(method)
+        def generator_wrapper(self, db, *args, **kwargs):
+            with reading(db):
+                yield from method(self, db, *args, **kwargs)
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, db, *args, **kwargs):
+        with reading(db):
+            return method(self, db, *args, **kwargs)
+    return wrapper
+
+
+def sync_sqlite_replica():
+    """
+    Локальная замена репликации для двух файлов SQLite (профили sqlite + sqlite_replica):
+    копирует основную БД в файл реплики через backup API. До вызова реплика отстает.
+    """
+    from . import database
+    if not replicaRouter.enabled:
+        raise ValueError("Read replica is not configured (DB_REPLICA_PROFILE)")
+    if database.engine.url.get_backend_name() != "sqlite" or replicaRouter.engine.url.get_backend_name() != "sqlite":
+        raise ValueError("sync_sqlite_replica works only for SQLite primary and replica")
+    source = database.engine.raw_connection()
+    target = replicaRouter.engine.raw_connection()
+    try:
+        source.driver_connection.backup(target.driver_connection)
+    finally:
+        target.close()
+        source.close()
+    replicaRouter.recheck()
@@ -0,0 +1,134 @@
+# schema.py
+# Быстрая проверка схемы при запуске. Отпечаток схемы (хеш таблиц, колонок, индексов и ограничений
+# из Base.metadata) хранится в БД (таблица schema_meta). Если отпечаток в БД совпадает с ожидаемым,
+# проверка стоит один SELECT; полная проверка DDL (create_all) и миграции (migrations.py) выполняются
+# только когда отпечаток или версия схемы изменились или их еще нет.
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, insert, update
+from sqlalchemy.engine import Connection
+
+from . import database
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_KEY = "fingerprint"
+HEARTBEAT_KEY = "heartbeat" # Метка последнего коммита с изменениями (отставание реплики, routing.py)
+
+# Служебная таблица живет в своей MetaData, чтобы не влиять на отпечаток моделей
+schema_meta_metadata = MetaData()
+schema_meta = Table(
+    "schema_meta", schema_meta_metadata,
+    Column("name", String(50), primary_key=True),
+    Column("value", String(255), nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+
+def schema_fingerprint(metadata: Optional[MetaData] = None) -> str:
+    """ sha256 описания таблиц, колонок, индексов и ограничений (не зависит от порядка объявления) """
+    if metadata is None:
+        from . import models # Регистрирует модели в Base.metadata
+        metadata = database.Base.metadata
+    tables = []
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        tables.append({
+            "name": table.name,
+            "columns": [
+                [c.name, str(c.type), c.nullable, c.primary_key, c.unique or False]
+                for c in sorted(table.columns, key=lambda c: c.name)
+            ],
+            "indexes": sorted(
+                [i.name, [c.name for c in i.columns], i.unique] for i in table.indexes
+            ),
+            "constraints": sorted(
+                [type(c).__name__, c.name or "", str(getattr(c, "sqltext", "")),
+                 [col.name for col in getattr(c, "columns", [])]]
+                for c in table.constraints
+            ),
+        })
+    payload = json.dumps(tables, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def read_meta(connection: Connection, name: str) -> Optional[str]:
+    return connection.execute(select(schema_meta.c.value).where(schema_meta.c.name == name)).scalar_one_or_none()
+
+
+def read_meta_values(connection: Connection, *names: str) -> Dict[str, str]:
+    """ Несколько записей schema_meta одним запросом """
+    return dict(connection.execute(select(schema_meta.c.name, schema_meta.c.value).where(schema_meta.c.name.in_(names))).all())
+
+
+def write_meta(connection: Connection, name: str, value: str):
+    # UPDATE, а INSERT только для новой записи - обычно один запрос
+    values = {"value": value, "updated_at": datetime.now()}
+    if connection.execute(update(schema_meta).where(schema_meta.c.name == name).values(**values)).rowcount == 0:
+        connection.execute(insert(schema_meta).values(name=name, **values))
+
+
+def read_stored_fingerprint(connection: Connection) -> Optional[str]:
+    """ Один дешевый запрос; None, если schema_meta еще нет """
+    try:
+        return read_meta(connection, FINGERPRINT_KEY)
+    except Exception as e:
+        logger.info(f"Schema fingerprint not available ({type(e).__name__}), full check required.")
+        return None
+
+
+def store_fingerprint(connection: Connection, fingerprint: str):
+    write_meta(connection, FINGERPRINT_KEY, fingerprint)
+
+
+def create_missing_indexes(connection: Connection, metadata: Optional[MetaData] = None) -> int:
+    """ create_all не трогает существующие таблицы - новые индексы моделей для них создаются здесь """
+    if metadata is None: metadata = database.Base.metadata
+    inspector = inspect(connection)
+    created = 0
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name): continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing: continue
+            index.create(bind=connection)
+            logger.info(f"Created index {index.name} on {table.name}.")
+            created += 1
+    return created
+
+
+def ensure_schema(force: bool = False) -> bool:
+    """
+    Проверяет схему по отпечатку и версии миграций; при необходимости создает недостающие таблицы
+    и применяет миграции (migrations.py).
+    Возвращает True, если понадобилась полная проверка DDL.
+    """
+    expected = schema_fingerprint()
+
+    from .migrations import SCHEMA_VERSION_KEY, latest_version, migrate # migrations использует read_meta/write_meta
+    target_version = str(latest_version())
+
+    if not force:
+        with database.engine.connect() as connection:
+            try:
+                stored_meta = read_meta_values(connection, FINGERPRINT_KEY, SCHEMA_VERSION_KEY)
+            except Exception as e:
+                logger.info(f"Schema metadata not available ({type(e).__name__}), full check required.")
+                stored_meta = {}
+        stored = stored_meta.get(FINGERPRINT_KEY)
+        if stored == expected and stored_meta.get(SCHEMA_VERSION_KEY) == target_version:
+            logger.info(f"Schema fingerprint {expected[:12]} verified.")
+            return False
+        logger.info(f"Schema fingerprint {(stored or 'none')[:12]} -> {expected[:12]}, version "
+                    f"{stored_meta.get(SCHEMA_VERSION_KEY) or 'none'} -> {target_version}, running full schema check.")
+
+    database.init_db()
+    migrate()
+    with database.engine.begin() as connection:
+        create_missing_indexes(connection)
+        schema_meta_metadata.create_all(bind=connection)
+        store_fingerprint(connection, expected)
+    return True
@@ -0,0 +1,153 @@
+# services/async_services.py
+# Async-версии сервисов для AsyncSession.
+# Списки для экранов (get_clients, get_filtered_orders, ...) выполняются нативно через async-репозитории.
+# Остальные методы (создание, изменение, проверки, сигналы) - это синхронный сервис, запущенный через
+# AsyncSession.run_sync: логика одна, а ожидание БД не блокирует цикл событий.
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+import functools
+import logging
+
+from ..async_repositories import (
+    AsyncClientRepository, AsyncWorkerRepository, AsyncProviderRepository,
+    AsyncMaterialRepository, AsyncOrderRepository
+)
+from ..models_pydantic import Client, Worker, Provider, Material, Order
+from ..pagination import DEFAULT_PAGE_SIZE, Page
+from ..read_models import OrderListRow, ProviderListRow
+from .client_service import ClientService
+from .worker_service import WorkerService
+from .provider_service import ProviderService
+from .material_service import MaterialService
+from .material_provider_service import MaterialProviderService
+from .order_service import OrderService
+
+logger = logging.getLogger(__name__)
+
+class AsyncServiceAdapter:
+    """
+    Делает методы синхронного сервиса awaitable: service.method(db, ...) -> await adapter.method(async_db, ...).
+    Метод выполняется через AsyncSession.run_sync, поэтому unit_of_work и ленивые связи работают как обычно.
+    """
+    def __init__(self, service):
+        self.service = service
+
+    def __getattr__(self, name: str):
+        method = getattr(self.service, name)
+        if not callable(method): return method
+
+        @functools.wraps(method)
+        async def call(db: AsyncSession, *args, **kwargs):
+            return await db.run_sync(lambda sync_db: method(sync_db, *args, **kwargs))
+        return call
+
+class AsyncClientService(AsyncServiceAdapter):
+    def __init__(self):
+        super().__init__(ClientService())
+        self.repository = AsyncClientRepository()
+
+    async def get_clients(self, db: AsyncSession, skip: int = 0, limit: Optional[int] = None) -> List[Client]:
+        logger.debug(f"Async Service: Getting multiple clients (skip={skip}, limit={limit})")
+        db_clients = await self.repository.get_multi(db, skip=skip, limit=limit)
+        return [Client.model_validate(c) for c in db_clients]
+
+class AsyncWorkerService(AsyncServiceAdapter):
+    def __init__(self):
+        super().__init__(WorkerService())
+        self.repository = AsyncWorkerRepository()
+
+    async def get_workers(self, db: AsyncSession, skip: int = 0, limit: Optional[int] = None) -> List[Worker]:
+        logger.debug(f"Async Service: Getting multiple workers (skip={skip}, limit={limit})")
+        db_workers = await self.repository.get_multi(db, skip=skip, limit=limit)
+        return [Worker.model_validate(w) for w in db_workers]
+
+class AsyncProviderService(AsyncServiceAdapter):
+    def __init__(self):
+        super().__init__(ProviderService())
+        self.repository = AsyncProviderRepository()
+
+    async def get_providers(self, db: AsyncSession, skip: int = 0, limit: Optional[int] = None) -> List[Provider]:
+        logger.debug(f"Async Service: Getting multiple providers (skip={skip}, limit={limit})")
+        db_providers = await self.repository.get_multi(db, skip=skip, limit=limit)
+        return [Provider.model_validate(p) for p in db_providers]
+
+    async def get_provider_rows(self, db: AsyncSession) -> List[ProviderListRow]:
+        logger.debug("Async Service: Getting provider rows")
+        return await self.repository.list_rows(db)
+
+class AsyncMaterialService(AsyncServiceAdapter):
+    def __init__(self):
+        super().__init__(MaterialService())
+        self.repository = AsyncMaterialRepository()
+
+    async def get_materials(self, db: AsyncSession, skip: int = 0, limit: Optional[int] = None) -> List[Material]:
+        logger.debug(f"Async Service: Getting multiple materials (skip={skip}, limit={limit})")
+        db_materials = await self.repository.get_multi(db, skip=skip, limit=limit)
+        return [Material.model_validate(m) for m in db_materials]
+
+class AsyncMaterialProviderService(AsyncServiceAdapter):
+    def __init__(self):
+        super().__init__(MaterialProviderService())
+
+class AsyncOrderService(AsyncServiceAdapter):
+    def __init__(self):
+        super().__init__(OrderService())
+        self.order_repo = AsyncOrderRepository()
+
+    async def get_filtered_orders(self, db: AsyncSession, worker_id: Optional[str] = None,
+                                  status: Optional[str] = None, client_id: Optional[str] = None,
+                                  date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[Order]:
+        """Get orders with various filters"""
+        logger.debug(f"Async Service: Getting filtered orders worker={worker_id} status={status} client={client_id}")
+        filters = self._filters(worker_id=worker_id, status=status, client_id=client_id)
+        db_orders = await self.order_repo.find_with_filters(db, filters, date_from, date_to)
+        return [Order.model_validate(o) for o in db_orders]
+
+    async def get_filtered_order_rows(self, db: AsyncSession, worker_id: Optional[str] = None,
+                                      status: Optional[str] = None, client_id: Optional[str] = None,
+                                      date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[OrderListRow]:
+        """Filtered orders for list screens as lightweight rows (one SELECT with joins)"""
+        logger.debug(f"Async Service: Getting filtered order rows worker={worker_id} status={status} client={client_id}")
+        filters = self._filters(worker_id=worker_id, status=status, client_id=client_id)
+        return await self.order_repo.list_rows_with_filters(db, filters, date_from, date_to)
+
+    async def get_filtered_orders_page(self, db: AsyncSession, worker_id: Optional[str] = None,
+                                       status: Optional[str] = None, client_id: Optional[str] = None,
+                                       date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                                       limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Order]:
+        """Keyset page of filtered orders, newest first"""
+        filters = self._filters(worker_id=worker_id, status=status, client_id=client_id)
+        page = await self.order_repo.find_page_with_filters(db, filters, date_from, date_to, limit=limit, cursor=cursor)
+        return page.map(Order.model_validate)
+
+    async def get_filtered_order_rows_page(self, db: AsyncSession, worker_id: Optional[str] = None,
+                                           status: Optional[str] = None, client_id: Optional[str] = None,
+                                           date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                                           limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[OrderListRow]:
+        """Keyset page of filtered order rows for list screens, newest first"""
+        logger.debug(f"Async Service: Getting page of filtered order rows worker={worker_id} status={status} client={client_id} cursor={cursor}")
+        filters = self._filters(worker_id=worker_id, status=status, client_id=client_id)
+        return await self.order_repo.list_rows_page_with_filters(db, filters, date_from, date_to, limit=limit, cursor=cursor)
+
+    async def count_filtered_orders(self, db: AsyncSession, worker_id: Optional[str] = None,
+                                    status: Optional[str] = None, client_id: Optional[str] = None,
+                                    date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> int:
+        """Count orders with various filters"""
+        filters = self._filters(worker_id=worker_id, status=status, client_id=client_id)
+        return await self.order_repo.count_with_filters(db, filters, date_from, date_to)
+
+    async def count_orders_by_statuses(self, db: AsyncSession, worker_id: Optional[str] = None, client_id: Optional[str] = None,
+                                       date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> Dict[str, int]:
+        """Counts per status ({status: count}, all statuses present) in one GROUP BY query"""
+        filters = self._filters(worker_id=worker_id, client_id=client_id)
+        return await self.order_repo.count_by_status_with_filters(db, filters, date_from, date_to)
+
+    async def count_orders_by_status(self, db: AsyncSession, status: str, worker_id: Optional[str] = None) -> int:
+        """Count orders by status"""
+        counts = await self.count_orders_by_statuses(db, worker_id=worker_id)
+        return counts.get(getattr(status, "value", status), 0)
+
+    @staticmethod
+    def _filters(**values) -> Dict[str, Any]:
+        return {field: value for field, value in values.items() if value}
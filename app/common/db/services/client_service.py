@@ -4,11 +4,14 @@ from typing import List, Optional
 import logging
 from uuid import uuid4
 
-from ..repositories import ClientRepository
+from ..repositories import ClientRepository, ConcurrentModificationError, ensure_contacts_free
 from ..models_sqlalchemy import Client as ClientSQL
 from ..models_pydantic import Client, ClientCreate, ClientUpdate
 from ...signal_bus import signalBus
 from .password_service import PasswordService # Сервис для хеширования пароля
+from ..unit_of_work import unit_of_work
+from ..utils import normalize_email, normalize_phone
+from ..pagination import DEFAULT_PAGE_SIZE, Page
 
 logger = logging.getLogger(__name__)
 
@@ -22,34 +25,29 @@ class ClientService:
         db_client = self.repository.get(db, id=client_id)
         return Client.model_validate(db_client) if db_client else None
 
-    def get_clients(self, db: Session, skip: int = 0, limit: int = 100) -> List[Client]:
+    def get_clients(self, db: Session, skip: int = 0, limit: Optional[int] = None) -> List[Client]:
         logger.debug(f"Service: Getting multiple clients (skip={skip}, limit={limit})")
         db_clients = self.repository.get_multi(db, skip=skip, limit=limit)
         return [Client.model_validate(c) for c in db_clients]
 
+    def get_clients_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Client]:
+        logger.debug(f"Service: Getting page of clients (limit={limit}, cursor={cursor})")
+        return self.repository.get_page(db, limit=limit, cursor=cursor).map(Client.model_validate)
+
     def get_client_by_phone(self, db: Session, phone: str) -> Optional[Client]:
-        """Get client by phone, trying different phone number formats"""
+        """Get client by phone in any format (+7..., 8..., 10 digits) - one indexed query by phone_norm"""
         logger.debug(f"Service: Getting client by phone {phone}")
-        
-        # First try direct lookup
         db_client = self.repository.get_by_phone(db, phone=phone)
-        
-        # If not found, try alternative formats
-        if not db_client:
-            if phone.startswith("+7") and len(phone) > 2:
-                # Try without +7 prefix
-                alt_phone = phone[2:]  # Get last 10 digits
-                logger.debug(f"Client not found with +7 prefix, trying without: {alt_phone}")
-                db_client = self.repository.get_by_phone(db, phone=alt_phone)
-            elif len(phone) == 10 and phone.isdigit():
-                # Try with +7 prefix
-                alt_phone = "+7" + phone
-                logger.debug(f"Client not found with 10 digits, trying with +7 prefix: {alt_phone}")
-                db_client = self.repository.get_by_phone(db, phone=alt_phone)
-                
         # Возвращаем SQLAlchemy модель напрямую, без преобразования в Pydantic
         return db_client
         
+    def find_client_by_phone_or_email(self, db: Session, phone: Optional[str] = None, email: Optional[str] = None) -> Optional[ClientSQL]:
+        """Client matching the phone or, failing that, the email - one indexed query"""
+        logger.debug(f"Service: Getting client by phone {phone} or email {email}")
+        matches = self.repository.find_by_phone_or_mail(db, phone=phone, email=email)
+        phone_norm = normalize_phone(phone)
+        return next((c for c in matches if phone_norm and c.phone_norm == phone_norm), matches[0] if matches else None)
+
     def get_client_by_email(self, db: Session, email: str) -> Optional[Client]:
         logger.debug(f"Service: Getting client by email {email}")
         db_client = self.repository.get_by_email(db, email=email)
@@ -83,16 +81,16 @@ class ClientService:
             db_obj = ClientSQL(**obj_in, hash_password=hash_password)
             print(f"Client model created successfully")
             
-            # Add to DB
-            db.add(db_obj)
-            db.commit()  # Commit immediately
-            db.refresh(db_obj)
-            print(f"Client saved to database with ID: {db_obj.id}")
+            # Add to DB (одна транзакция, Pydantic модель собираем до commit)
+            with unit_of_work(db):
+                db.add(db_obj)
+                db.flush()
+                pydantic_client = Client.model_validate(db_obj)
+            print(f"Client saved to database with ID: {pydantic_client.id}")
             
-            return Client.model_validate(db_obj)
+            return pydantic_client
         except Exception as e:
             print(f"Error in create_client: {str(e)}")
-            db.rollback()
             logger.error(f"Service Error creating client: {e}")
             # Формируем читаемое сообщение об ошибке
             raise e
@@ -106,19 +104,10 @@ class ClientService:
 
         update_data = client_in.model_dump(exclude_unset=True)
 
-        # Проверка уникальности телефона при смене
-        if "phone" in update_data and update_data["phone"] != db_client.phone:
-            if update_data["phone"]:  # Если телефон не пустой
-                existing = self.repository.get_by_phone(db, phone=update_data["phone"])
-                if existing and existing.id != client_id:
-                    raise ValueError(f"Телефон '{update_data['phone']}' уже используется.")
-                    
-        # Проверка уникальности email при смене
-        if "mail" in update_data and update_data["mail"] != db_client.mail:
-            if update_data["mail"]:  # Если email не пустой
-                existing = self.repository.get_by_email(db, email=update_data["mail"])
-                if existing and existing.id != client_id:
-                    raise ValueError(f"Email '{update_data['mail']}' уже используется.")
+        # Проверка уникальности телефона и email при смене (один запрос)
+        new_phone = update_data.get("phone") if normalize_phone(update_data.get("phone")) != db_client.phone_norm else None
+        new_mail = update_data.get("mail") if normalize_email(update_data.get("mail")) != db_client.mail_norm else None
+        ensure_contacts_free(self.repository, db, phone=new_phone, email=new_mail, exclude_id=client_id)
 
         # Обновление пароля, если он передан
         if "password" in update_data and update_data["password"]:
@@ -130,10 +119,15 @@ class ClientService:
         if not update_data: return Client.model_validate(db_client) # Нет изменений
 
         try:
-            updated_db_client = self.repository.update(db, db_obj=db_client, obj_in=update_data)
-            pydantic_client = Client.model_validate(updated_db_client)
+            with unit_of_work(db):
+                updated_db_client = self.repository.update(db, db_obj=db_client, obj_in=update_data)
+                pydantic_client = Client.model_validate(updated_db_client)
             signalBus.client_updated.emit(pydantic_client.model_dump())
             return pydantic_client
+        except ConcurrentModificationError as e:
+             logger.warning(f"Service: Conflict updating client {client_id}: {e}")
+             signalBus.error_occurred.emit("Клиент изменен другим пользователем. Обновите данные и повторите изменение.")
+             raise
         except Exception as e:
              logger.error(f"Service Error updating client {client_id}: {e}")
              signalBus.database_error.emit(f"Ошибка обновления клиента: {e}")
@@ -142,7 +136,8 @@ class ClientService:
     def delete_client(self, db: Session, client_id: str) -> bool:
         logger.info(f"Service: Deleting client id {client_id}")
         try:
-            deleted_client = self.repository.remove(db, id=client_id)
+            with unit_of_work(db):
+                deleted_client = self.repository.remove(db, id=client_id)
             if deleted_client:
                 signalBus.client_deleted.emit(client_id)
                 return True
@@ -150,6 +145,5 @@ class ClientService:
             return False
         except Exception as e: # Ловим IntegrityError и другие
             logger.error(f"Service Error deleting client {client_id}: {e}")
-            db.rollback() # Явный роллбэк при ошибке удаления
             signalBus.database_error.emit(f"Ошибка удаления клиента {client_id}: {e}")
             raise # Передаем ошибку дальше, чтобы UI мог ее обработать
\ No newline at end of file
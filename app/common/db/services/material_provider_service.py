@@ -7,6 +7,7 @@ from ..repositories import MaterialProviderRepository, ProviderRepository, Mater
 from ..models_sqlalchemy import MaterialProvider as MatProvSQL
 from ..models_pydantic import MaterialProvider, MaterialProviderCreate
 from ...signal_bus import signalBus
+from ..unit_of_work import unit_of_work
 
 logger = logging.getLogger(__name__)
 
@@ -52,8 +53,9 @@ class MaterialProviderService:
 
         try:
             # ID для MaterialProvider генерируется в Pydantic BaseEntity
-            db_obj = self.repository.create(db, obj_in=link_in)
-            pydantic_obj = MaterialProvider.model_validate(db_obj)
+            with unit_of_work(db):
+                db_obj = self.repository.create(db, obj_in=link_in)
+                pydantic_obj = MaterialProvider.model_validate(db_obj)
             signalBus.material_linked_to_provider.emit(pydantic_obj.model_dump())
             return pydantic_obj
         except Exception as e:
@@ -83,13 +85,13 @@ class MaterialProviderService:
 
         link_id_to_emit = db_obj_to_delete.id # Получаем ID перед удалением
         try:
-            deleted = self.repository.remove(db, id=link_id_to_emit) # Удаляем по ID
+            with unit_of_work(db):
+                deleted = self.repository.remove(db, id=link_id_to_emit) # Удаляем по ID
             if deleted:
                 signalBus.material_unlinked_from_provider.emit(link_id_to_emit)
                 return True
             return False # remove вернул None
         except Exception as e:
             logger.error(f"Service Error unlinking material from provider ({log_msg}): {e}")
-            db.rollback()
             signalBus.database_error.emit(f"Ошибка удаления связи материала и поставщика: {e}")
             raise
\ No newline at end of file
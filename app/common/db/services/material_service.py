@@ -1,36 +1,71 @@
 # services/material_service.py
 # Остается как в предыдущем ответе, КРОМЕ ИСПРАВЛЕНИЯ В change_balance
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional
 import logging
 
-from ..repositories import MaterialRepository, MaterialOnOrderRepository
+from ..repositories import (
+    STREAM_BATCH_SIZE, ConcurrentModificationError, InsufficientStockError, MaterialRepository, MaterialOnOrderRepository,
+    StockReservationRepository
+)
+from ..read_models import MaterialStockRow
 from .. import models_sqlalchemy as models
-from ..models_pydantic import Material, MaterialCreate, MaterialUpdate
+from ..models_pydantic import Material, MaterialCreate, MaterialUpdate, StockMovementReason
 from ..utils import UUIDUtils
 from ...signal_bus import signalBus
+from ..unit_of_work import unit_of_work
+from ..pagination import DEFAULT_PAGE_SIZE, Page
 
 logger = logging.getLogger(__name__)
 
+
+def _movement(material_id: str, delta: int, reason: StockMovementReason) -> dict:
+    return {"material_id": material_id, "delta": delta, "reason": reason}
+
+
 class MaterialService:
     def __init__(self):
         self.repository = MaterialRepository()
+        self.reservations = StockReservationRepository()
+
+    def _check_debits(self, db: Session, amounts: Dict[str, int],
+                      locked: Optional[Dict[str, MaterialStockRow]] = None) -> Dict[str, MaterialStockRow]:
+        """
+        Любое уменьшение остатка - не больше свободного (balance - резерв заказов в 'Обработка'): строки материалов
+        блокируются (lock_balances, если locked не передан) и проверяются до конца транзакции. Возвращает locked
+        """
+        if locked is None: locked = self.repository.lock_balances(db, list(amounts))
+        amounts = {id: amount for id, amount in amounts.items() if amount > 0}
+        if amounts: self.reservations.check_available(db, amounts, locked)
+        return locked
 
     def get_material(self, db: Session, material_id: str) -> Optional[Material]:
         logger.debug(f"Service: Getting material id {material_id}")
         db_mat = self.repository.get(db, id=material_id)
         return Material.model_validate(db_mat) if db_mat else None
 
-    def get_materials(self, db: Session, skip: int = 0, limit: int = 100) -> List[Material]:
+    def get_materials(self, db: Session, skip: int = 0, limit: Optional[int] = None) -> List[Material]:
         logger.debug(f"Service: Getting multiple materials (skip={skip}, limit={limit})")
         db_mats = self.repository.get_multi(db, skip=skip, limit=limit)
         return [Material.model_validate(m) for m in db_mats]
 
+    def iter_materials(self, db: Session, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Material]:
+        """ Все материалы потоком (отчеты и выгрузки) """
+        logger.debug(f"Service: Streaming materials (batch_size={batch_size})")
+        for db_mat in self.repository.stream(db, batch_size=batch_size):
+            yield Material.model_validate(db_mat)
+
+    def get_materials_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Material]:
+        logger.debug(f"Service: Getting page of materials (limit={limit}, cursor={cursor})")
+        return self.repository.get_page(db, limit=limit, cursor=cursor).map(Material.model_validate)
+
     def create_material(self, db: Session, material_in: MaterialCreate) -> Material:
         logger.info(f"Service: Creating material type {material_in.type}")
         try:
-            db_mat = self.repository.create(db, obj_in=material_in)
-            pydantic_mat = Material.model_validate(db_mat)
+            with unit_of_work(db):
+                db_mat = self.repository.create(db, obj_in=material_in)
+                self.repository.movements.append(db, [_movement(db_mat.id, db_mat.balance, StockMovementReason.INITIAL)])
+                pydantic_mat = Material.model_validate(db_mat)
             signalBus.material_created.emit(pydantic_mat.model_dump())
             return pydantic_mat
         except Exception as e:
@@ -38,6 +73,51 @@ class MaterialService:
             signalBus.database_error.emit(f"Ошибка создания материала: {e}")
             raise
 
+    def create_materials(self, db: Session, materials_in: List[MaterialCreate]) -> List[str]:
+        """ Пакетное создание (импорт, начальное заполнение): один INSERT и один commit; возвращает id """
+        logger.info(f"Service: Creating {len(materials_in)} materials")
+        try:
+            with unit_of_work(db):
+                ids = self.repository.create_many(db, objs_in=materials_in)
+                self.repository.movements.append(db, [_movement(id, material_in.balance, StockMovementReason.INITIAL)
+                                                      for id, material_in in zip(ids, materials_in)])
+            signalBus.status_message.emit(f"Добавлено материалов: {len(ids)}")
+            return ids
+        except Exception as e:
+            logger.error(f"Service Error creating materials: {e}")
+            signalBus.database_error.emit(f"Ошибка создания материалов: {e}")
+            raise
+
+    def update_materials(self, db: Session, materials_in: Dict[str, MaterialUpdate]) -> int:
+        """ Пакетное обновление {material_id: MaterialUpdate} (например, цены из прайс-листа) в одной транзакции """
+        logger.info(f"Service: Updating {len(materials_in)} materials")
+        rows = [{"id": material_id, **material_in.model_dump(exclude_unset=True)} for material_id, material_in in materials_in.items()]
+        rows = [row for row in rows if len(row) > 1]
+        try:
+            with unit_of_work(db):
+                # Прежние остатки - для проверки резервов и движений в журнале (их пишет репозиторий)
+                balance_rows = [row for row in rows if 'balance' in row]
+                old_balances = self.repository.lock_balances(db, [row['id'] for row in balance_rows]) if balance_rows else {}
+                self._check_debits(db, {row['id']: old_balances[row['id']].balance - row['balance']
+                                        for row in balance_rows if row['id'] in old_balances}, old_balances)
+                updated = self.repository.update_many(db, objs_in=rows, locked=old_balances)
+            for row in rows:
+                if 'balance' in row: signalBus.material_balance_changed.emit(row['id'], row['balance'])
+            signalBus.status_message.emit(f"Обновлено материалов: {updated}")
+            return updated
+        except InsufficientStockError as e:
+            logger.warning(f"Service: Balances below reservations not saved: {e}")
+            signalBus.error_occurred.emit(f"Остаток нельзя сделать меньше зарезервированного под заказы: {e}")
+            raise
+        except ConcurrentModificationError as e:
+            logger.warning(f"Service: Conflict updating materials: {e}")
+            signalBus.error_occurred.emit("Материалы изменены другим пользователем. Обновите данные и повторите изменение.")
+            raise
+        except Exception as e:
+            logger.error(f"Service Error updating materials: {e}")
+            signalBus.database_error.emit(f"Ошибка обновления материалов: {e}")
+            raise
+
     def update_material(self, db: Session, material_id: str, material_in: MaterialUpdate) -> Optional[Material]:
         logger.info(f"Service: Updating material id {material_id}")
         db_mat = self.repository.get(db, id=material_id)
@@ -47,23 +127,38 @@ class MaterialService:
         if not update_data: return Material.model_validate(db_mat)
 
         try:
-            # Обновляем все поля, включая баланс, если он передан
-            updated_db_mat = self.repository.update(db, db_obj=db_mat, obj_in=update_data)
+            # Обновляем все поля, включая баланс, если он передан (движение в журнал пишет репозиторий)
+            locked = None
+            with unit_of_work(db):
+                if 'balance' in update_data: # Новый остаток не меньше резерва: строка блокируется до конца транзакции
+                    locked = self.repository.lock_balances(db, [material_id])
+                    old_balance = locked[material_id].balance if material_id in locked else db_mat.balance
+                    self._check_debits(db, {material_id: old_balance - update_data['balance']}, locked)
+                updated_db_mat = self.repository.update(db, db_obj=db_mat, obj_in=update_data, locked=locked)
+                pydantic_mat = Material.model_validate(updated_db_mat)
 
             # Если баланс был обновлен этим вызовом, эмитируем отдельный сигнал
             if 'balance' in update_data:
-                signalBus.material_balance_changed.emit(material_id, updated_db_mat.balance)
+                signalBus.material_balance_changed.emit(material_id, pydantic_mat.balance)
 
-            pydantic_mat = Material.model_validate(updated_db_mat)
             signalBus.material_updated.emit(pydantic_mat.model_dump())
             return pydantic_mat
+        except InsufficientStockError as e:
+            logger.warning(f"Service: Balance of material {material_id} below reservations not saved: {e}")
+            signalBus.error_occurred.emit(f"Остаток нельзя сделать меньше зарезервированного под заказы: {e}")
+            raise
+        except ConcurrentModificationError as e:
+            logger.warning(f"Service: Conflict updating material {material_id}: {e}")
+            signalBus.error_occurred.emit("Материал изменен другим пользователем. Обновите данные и повторите изменение.")
+            raise
         except Exception as e:
             logger.error(f"Service Error updating material {material_id}: {e}")
             signalBus.database_error.emit(f"Ошибка обновления материала: {e}")
             raise
 
-    def change_balance(self, db: Session, material_id: str, quantity_change: int) -> Optional[Material]:
-        """ Изменяет баланс материала (списание/приход). Вызывает repository.update_balance """
+    def change_balance(self, db: Session, material_id: str, quantity_change: int, *,
+                       reason: StockMovementReason = StockMovementReason.MANUAL, order_id: Optional[str] = None) -> Optional[Material]:
+        """ Изменяет баланс материала (списание/приход) с записью в журнал движения. Вызывает repository.update_balance """
         logger.info(f"Service: Changing balance for material {material_id} by {quantity_change}")
         if quantity_change == 0:
              logger.warning("Balance change called with zero quantity change.")
@@ -71,18 +166,16 @@ class MaterialService:
 
         try:
             # Вызываем метод репозитория, который содержит логику атомарного обновления
-            updated_db_mat = self.repository.update_balance(db, material_id=material_id, change=quantity_change)
-            # Репозиторий сам выбросит ValueError при недостаточном балансе или др. проблемах
-            if updated_db_mat:
-                pydantic_mat = Material.model_validate(updated_db_mat)
-                signalBus.material_balance_changed.emit(material_id, pydantic_mat.balance)
-                return pydantic_mat
-            else:
-                 # Сюда не должны попасть, если репозиторий работает правильно
-                 logger.error(f"Service Error: update_balance for material {material_id} returned None unexpectedly.")
-                 signalBus.error_occurred.emit(f"Не удалось изменить баланс материала {material_id}.")
-                 return None
-        except ValueError as ve: # Ловим ошибку недостатка баланса от репозитория
+            # Внутри чужого unit_of_work (например, операции заказа) присоединяемся к его транзакции
+            # Новый остаток приходит из того же запроса (RETURNING или блокирующее чтение), без перечитывания
+            # Списание проверяется по свободному остатку (balance - резерв), а не только по balance
+            with unit_of_work(db):
+                if quantity_change < 0: self._check_debits(db, {material_id: -quantity_change})
+                row = self.repository.update_balance(db, material_id=material_id, change=quantity_change, reason=reason, order_id=order_id)
+            pydantic_mat = Material(**row._asdict())
+            signalBus.material_balance_changed.emit(material_id, pydantic_mat.balance)
+            return pydantic_mat
+        except ValueError as ve: # InsufficientStockError / MaterialNotFoundError от репозитория
              logger.warning(f"Service Warning changing balance for material {material_id}: {ve}")
              signalBus.error_occurred.emit(f"Не удалось изменить баланс материала {material_id}: {ve}")
              return None # Возвращаем None при ошибке (недостаток и т.п.)
@@ -102,7 +195,8 @@ class MaterialService:
                 signalBus.error_occurred.emit(f"Нельзя удалить материал {material_id}, т.к. он используется в заказах.")
                 return False
 
-            deleted = self.repository.remove(db, id=material_id)
+            with unit_of_work(db):
+                deleted = self.repository.remove(db, id=material_id)
             if deleted:
                 signalBus.material_deleted.emit(material_id)
                 return True
@@ -110,6 +204,5 @@ class MaterialService:
             return False
         except Exception as e:
             logger.error(f"Service Error deleting material {material_id}: {e}")
-            db.rollback()
             signalBus.database_error.emit(f"Ошибка удаления материала {material_id}: {e}")
             raise
\ No newline at end of file
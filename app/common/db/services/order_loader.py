@@ -0,0 +1,61 @@
+# services/order_loader.py
+# Пакетная загрузка связанных данных для списка заказов. Вместо ленивой загрузки client/worker
+# и материалов на каждый заказ (2N+ запросов) id собираются со всей страницы и каждый тип
+# сущностей читается одним запросом IN (...); затем Pydantic-модели собираются за один проход.
+from typing import Any, Dict, List, Sequence
+import logging
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from ..repositories import ClientRepository, WorkerRepository, MaterialRepository, MaterialOnOrderRepository
+from ..models_sqlalchemy import Order as OrderSQL
+from ..models_pydantic import Order, Client, Worker, Material, MaterialOnOrder
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(obj) -> Dict[str, Any]:
+    """ Только колонки ORM-объекта: чтение связей при валидации Pydantic запустило бы ленивую загрузку """
+    return {attr.key: getattr(obj, attr.key) for attr in sa_inspect(obj).mapper.column_attrs}
+
+
+class OrderRelationsLoader:
+    """ Клиенты, работники и (по запросу) материалы для набора заказов - по одному запросу на тип """
+
+    def __init__(self):
+        self.client_repo = ClientRepository()
+        self.worker_repo = WorkerRepository()
+        self.material_repo = MaterialRepository()
+        self.mat_on_order_repo = MaterialOnOrderRepository()
+
+    def load(self, db: Session, db_orders: Sequence[OrderSQL], materials: bool = False) -> List[Order]:
+        """ Заказы в исходном порядке с заполненными client, worker и materials_on_order (если materials=True) """
+        if not db_orders: return []
+        rows = [_columns(o) for o in db_orders]
+
+        clients = {id: Client.model_validate(_columns(c)) for id, c in
+                   self.client_repo.get_many(db, [row["client_id"] for row in rows]).items()}
+        workers = {id: Worker.model_validate(_columns(w)) for id, w in
+                   self.worker_repo.get_many(db, [row["worker_id"] for row in rows if row["worker_id"]]).items()}
+
+        links_by_order: Dict[str, List[MaterialOnOrder]] = {}
+        if materials:
+            db_links = self.mat_on_order_repo.find_by_order_ids(db, [row["id"] for row in rows])
+            found = self.material_repo.get_many(db, [link.material_id for link in db_links])
+            materials_by_id = {id: Material.model_validate(_columns(m)) for id, m in found.items()}
+            for db_link in db_links:
+                link = MaterialOnOrder.model_validate(_columns(db_link))
+                link.material = materials_by_id.get(db_link.material_id)
+                links_by_order.setdefault(db_link.order_id, []).append(link)
+
+        orders = []
+        for row in rows:
+            order = Order.model_validate(row)
+            order.client = clients.get(row["client_id"])
+            order.worker = workers.get(row["worker_id"])
+            if materials: order.materials_on_order = links_by_order.get(row["id"], [])
+            orders.append(order)
+        logger.debug(f"Loaded relations for {len(orders)} orders: {len(clients)} clients, {len(workers)} workers"
+                     f"{f', {sum(map(len, links_by_order.values()))} material links' if materials else ''}")
+        return orders
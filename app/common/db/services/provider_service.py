@@ -4,10 +4,13 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 import logging
 
-from ..repositories import ProviderRepository
+from ..repositories import ProviderRepository, ConcurrentModificationError
 from ..models_sqlalchemy import Provider as ProviderSQL
 from ..models_pydantic import Provider, ProviderCreate, ProviderUpdate
 from ...signal_bus import signalBus
+from ..unit_of_work import unit_of_work
+from ..pagination import DEFAULT_PAGE_SIZE, Page
+from ..read_models import ProviderListRow
 
 logger = logging.getLogger(__name__)
 
@@ -20,11 +23,20 @@ class ProviderService:
         db_obj = self.repository.get(db, id=provider_id)
         return Provider.model_validate(db_obj) if db_obj else None
 
-    def get_providers(self, db: Session, skip: int = 0, limit: int = 100) -> List[Provider]:
+    def get_providers(self, db: Session, skip: int = 0, limit: Optional[int] = None) -> List[Provider]:
         logger.debug(f"Service: Getting multiple providers (skip={skip}, limit={limit})")
         db_objs = self.repository.get_multi(db, skip=skip, limit=limit)
         return [Provider.model_validate(p) for p in db_objs]
 
+    def get_provider_rows(self, db: Session) -> List[ProviderListRow]:
+        """ Поставщики для списка: легкие строки без ORM-объектов и Pydantic """
+        logger.debug("Service: Getting provider rows")
+        return self.repository.list_rows(db)
+
+    def get_providers_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Provider]:
+        logger.debug(f"Service: Getting page of providers (limit={limit}, cursor={cursor})")
+        return self.repository.get_page(db, limit=limit, cursor=cursor).map(Provider.model_validate)
+
     def find_provider_by_inn(self, db: Session, inn: str) -> Optional[Provider]:
         logger.debug(f"Service: Finding provider by INN {inn}")
         db_obj = self.repository.find_by_inn(db, inn=inn)
@@ -37,8 +49,9 @@ class ProviderService:
         if existing: raise ValueError(f"Provider with INN '{provider_in.inn}' already exists.")
 
         try:
-            db_obj = self.repository.create(db, obj_in=provider_in) # Pydantic модель напрямую
-            pydantic_obj = Provider.model_validate(db_obj)
+            with unit_of_work(db):
+                db_obj = self.repository.create(db, obj_in=provider_in) # Pydantic модель напрямую
+                pydantic_obj = Provider.model_validate(db_obj)
             signalBus.provider_created.emit(pydantic_obj.model_dump())
             return pydantic_obj
         except Exception as e:
@@ -60,10 +73,15 @@ class ProviderService:
         if not update_data: return Provider.model_validate(db_obj)
 
         try:
-            updated_db_obj = self.repository.update(db, db_obj=db_obj, obj_in=update_data)
-            pydantic_obj = Provider.model_validate(updated_db_obj)
+            with unit_of_work(db):
+                updated_db_obj = self.repository.update(db, db_obj=db_obj, obj_in=update_data)
+                pydantic_obj = Provider.model_validate(updated_db_obj)
             signalBus.provider_updated.emit(pydantic_obj.model_dump())
             return pydantic_obj
+        except ConcurrentModificationError as e:
+             logger.warning(f"Service: Conflict updating provider {provider_id}: {e}")
+             signalBus.error_occurred.emit("Поставщик изменен другим пользователем. Обновите данные и повторите изменение.")
+             raise
         except Exception as e:
              logger.error(f"Service Error updating provider {provider_id}: {e}")
              signalBus.database_error.emit(f"Ошибка обновления поставщика: {e}")
@@ -77,7 +95,8 @@ class ProviderService:
             # НЕ удалит поставщика, если на него ссылаются материалы в mat_provider.
             # Нужно либо сначала удалить связи, либо настроить каскад на ForeignKey в mat_provider.
             # Пока что просто удаляем поставщика.
-            deleted = self.repository.remove(db, id=provider_id)
+            with unit_of_work(db):
+                deleted = self.repository.remove(db, id=provider_id)
             if deleted:
                 signalBus.provider_deleted.emit(provider_id)
                 return True
@@ -85,6 +104,5 @@ class ProviderService:
             return False
         except Exception as e: # Ловим IntegrityError
             logger.error(f"Service Error deleting provider {provider_id}: {e}")
-            db.rollback()
             signalBus.database_error.emit(f"Ошибка удаления поставщика {provider_id}. Возможно, он связан с материалами.")
             raise
\ No newline at end of file
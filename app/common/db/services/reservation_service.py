@@ -0,0 +1,95 @@
+# services/reservation_service.py
+# Резервирование материалов под заказы. Новый заказ ('Обработка') только резервирует материалы:
+# balance не меняется, свободный остаток - balance минус резервы. Когда заказ уходит из 'Обработка'
+# ('В работе'), резерв становится расходом (списание balance, движение в журнале); удаление заказа
+# снимает резерв. Переход, сделанный мимо OrderService (пакетная смена статуса, другая версия
+# приложения), доводит фоновая сверка reconcile пачками заказов, а не каждое действие в интерфейсе.
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Sequence
+import logging
+
+from ..repositories import (
+    StockReservationRepository, MaterialRepository, MaterialNotFoundError, InsufficientStockError
+)
+from ..read_models import MaterialStockRow
+from ..unit_of_work import unit_of_work
+from ...config import STOCK_RESERVATION_RECONCILE_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+class StockReservationService:
+    def __init__(self):
+        self.repository = StockReservationRepository()
+        self.material_repo = MaterialRepository()
+
+    def get_available(self, db: Session, material_ids: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """ Свободный остаток материалов (balance - резерв) одним запросом """
+        logger.debug(f"Service: Available stock for {len(material_ids) if material_ids is not None else 'all'} materials")
+        return self.repository.available(db, material_ids)
+
+    def get_reserved(self, db: Session, material_ids: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        logger.debug("Service: Reserved stock")
+        return self.repository.reserved(db, material_ids)
+
+    def reserve(self, db: Session, order_id: str, amounts: Dict[str, int],
+                locked: Optional[Dict[str, MaterialStockRow]] = None) -> int:
+        """
+        Резервирует {material_id: количество} под заказ в транзакции вызывающего. Свободный остаток
+        проверяется по заблокированным строкам материалов (locked из lock_balances или блокируются здесь)
+        """
+        amounts = {id: amount for id, amount in amounts.items() if amount}
+        if not amounts: return 0
+        if locked is None: locked = self.material_repo.lock_balances(db, list(amounts))
+        self.repository.check_available(db, amounts, locked)
+        return self.repository.add(db, order_id, amounts)
+
+    def adjust(self, db: Session, order_id: str, material_id: str, delta: int) -> int:
+        """ Меняет резерв материала заказа на delta (позиция добавлена, удалена или изменено количество) """
+        logger.info(f"Service: Adjusting reservation of material {material_id} for order {order_id} by {delta}")
+        locked = self.material_repo.lock_balances(db, [material_id])
+        return self.repository.adjust(db, order_id, material_id, delta, locked)
+
+    def convert(self, db: Session, order_id: str) -> Dict[str, int]:
+        """
+        Резерв заказа -> расход: одно списание balance по всем материалам (с движениями в журнале) и снятие
+        резерва в транзакции вызывающего. Возвращает {material_id: новый остаток}
+        """
+        amounts = self.repository.for_order(db, order_id)
+        if not amounts: return {}
+        logger.info(f"Service: Converting reservations of order {order_id} ({len(amounts)} materials) into consumption")
+        balances = self.material_repo.deduct_balances(db, amounts, order_id=order_id)
+        self.repository.release(db, order_id)
+        return balances
+
+    def release(self, db: Session, order_id: str) -> int:
+        """ Снимает резерв заказа (удаление заказа) в транзакции вызывающего """
+        released = self.repository.release(db, order_id)
+        if released: logger.info(f"Service: Released {released} reservations of order {order_id}")
+        return released
+
+    def reconcile(self, db: Session, batch_size: int = STOCK_RESERVATION_RECONCILE_BATCH) -> Dict[str, int]:
+        """
+        Фоновая сверка: резервы заказов, уже ушедших из 'Обработка', переводятся в расход - пачками по
+        batch_size заказов (один запрос на пачку), каждый заказ в своей транзакции, чтобы нехватка по одному
+        не останавливала остальные. Отдельно сообщает о материалах, резерв которых больше остатка
+        (balance уменьшили вручную). Возвращает {"converted", "failed", "overcommitted"}
+        """
+        converted = failed = 0
+        after = None
+        while True:
+            order_ids = self.repository.orders_to_convert(db, after=after, limit=batch_size)
+            for order_id in order_ids:
+                try:
+                    with unit_of_work(db): self.convert(db, order_id)
+                    converted += 1
+                except (MaterialNotFoundError, InsufficientStockError) as e:
+                    logger.warning(f"Service: Reservations of order {order_id} not converted: {e}")
+                    failed += 1
+            if len(order_ids) < batch_size: break
+            after = order_ids[-1]
+        overcommitted = {id: amount for id, amount in self.repository.available(db).items() if amount < 0}
+        for id, amount in overcommitted.items():
+            logger.warning(f"Stock reservations exceed balance of material {id} by {-amount}")
+        logger.info(f"Service: Reservation reconcile: {converted} orders converted, {failed} failed, {len(overcommitted)} overcommitted")
+        return {"converted": converted, "failed": failed, "overcommitted": len(overcommitted)}
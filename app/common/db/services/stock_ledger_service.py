@@ -0,0 +1,75 @@
+# services/stock_ledger_service.py
+# Журнал движения материалов: остатки на дату, расход за период и периодическое сворачивание журнала
+# в снимки. Текущий остаток по-прежнему хранится в materials.balance (на нем держатся CHECK и атомарные
+# списания), журнал пишется в той же транзакции и должен с ним сходиться - это проверяет run_snapshot.
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from typing import Dict, Optional, Sequence
+from datetime import datetime, timedelta
+import logging
+
+from ..repositories import StockMovementRepository, MaterialRepository
+from ..models_sqlalchemy import StockMovement as StockMovementSQL, Material as MaterialSQL
+from ..models_pydantic import StockMovement
+from ..unit_of_work import unit_of_work
+from ..pagination import DEFAULT_PAGE_SIZE, Page
+from ...config import STOCK_LEDGER_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Снимок берется с отставанием: движения незакоммиченных транзакций получают время до коммита
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+
+class StockLedgerService:
+    def __init__(self):
+        self.repository = StockMovementRepository()
+        self.material_repo = MaterialRepository()
+
+    def balance_as_of(self, db: Session, material_id: str, at: datetime) -> int:
+        """ Остаток материала на момент at: последний снимок + движения после него """
+        logger.debug(f"Service: Balance of material {material_id} as of {at}")
+        return self.repository.balances_as_of(db, at, [material_id]).get(material_id, 0)
+
+    def balances_as_of(self, db: Session, at: datetime, material_ids: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        logger.debug(f"Service: Balances as of {at}")
+        return self.repository.balances_as_of(db, at, material_ids)
+
+    def get_consumption(self, db: Session, date_from: datetime, date_to: datetime) -> Dict[str, int]:
+        """ Расход материалов в заказы за период: один GROUP BY по журналу """
+        logger.debug(f"Service: Material consumption {date_from} - {date_to}")
+        return self.repository.consumption(db, date_from, date_to)
+
+    def get_movements_page(self, db: Session, material_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                           cursor: Optional[str] = None) -> Page[StockMovement]:
+        """ История движения материала, новые первыми """
+        logger.debug(f"Service: Movements of material {material_id} (limit={limit}, cursor={cursor})")
+        statement = select(StockMovementSQL).where(StockMovementSQL.material_id == material_id)
+        return self.repository.get_page(db, limit=limit, cursor=cursor, statement=statement).map(StockMovement.model_validate)
+
+    def run_snapshot(self, db: Session, at: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Сворачивает движения до at (по умолчанию - сейчас минус SNAPSHOT_LAG) в снимки остатков материалов,
+        у которых были движения, удаляет учтенные в снимках движения старше STOCK_LEDGER_RETENTION_DAYS
+        и сверяет журнал с materials.balance. Возвращает {"snapshots", "compacted", "drift"}
+        """
+        now = datetime.now()
+        at = at or now - SNAPSHOT_LAG
+        with unit_of_work(db):
+            sums = self.repository.movement_sums(db, at)
+            balances = self.repository.snapshot_balances(db, at, list(sums)) if sums else {}
+            balances = {id: balances.get(id, 0) + total for id, total in sums.items()}
+            created = self.repository.add_snapshots(db, balances, at)
+            compacted = self.repository.compact(db, now - timedelta(days=STOCK_LEDGER_RETENTION_DAYS)) if STOCK_LEDGER_RETENTION_DAYS else 0
+        drift = self.find_drift(db)
+        logger.info(f"Service: Stock snapshot at {at}: {created} snapshots, {compacted} movements compacted, {len(drift)} drifted")
+        return {"snapshots": created, "compacted": compacted, "drift": len(drift)}
+
+    def find_drift(self, db: Session) -> Dict[str, tuple]:
+        """ Материалы, у которых balance не совпадает с журналом: {id: (balance, по журналу)} """
+        ledger = self.repository.balances_as_of(db, datetime.now())
+        current = dict(db.execute(select(MaterialSQL.id, MaterialSQL.balance)).all())
+        drift = {id: (balance, ledger.get(id, 0)) for id, balance in current.items() if balance != ledger.get(id, 0)}
+        for id, (balance, in_ledger) in drift.items():
+            logger.warning(f"Stock ledger drift for material {id}: balance {balance}, ledger {in_ledger}")
+        return drift
@@ -4,11 +4,14 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 import logging
 
-from ..repositories import WorkerRepository
+from ..repositories import WorkerRepository, ConcurrentModificationError, ensure_contacts_free
 from ..models_sqlalchemy import Worker as WorkerSQL
 from ..models_pydantic import Worker, WorkerCreate, WorkerUpdate
 from ...signal_bus import signalBus
 from .password_service import PasswordService
+from ..unit_of_work import unit_of_work
+from ..utils import normalize_email, normalize_phone
+from ..pagination import DEFAULT_PAGE_SIZE, Page
 
 logger = logging.getLogger(__name__)
 
@@ -22,31 +25,19 @@ class WorkerService:
         db_obj = self.repository.get(db, id=worker_id)
         return Worker.model_validate(db_obj) if db_obj else None
 
-    def get_workers(self, db: Session, skip: int = 0, limit: int = 100) -> List[Worker]:
+    def get_workers(self, db: Session, skip: int = 0, limit: Optional[int] = None) -> List[Worker]:
         logger.debug(f"Service: Getting multiple workers (skip={skip}, limit={limit})")
         db_objs = self.repository.get_multi(db, skip=skip, limit=limit)
         return [Worker.model_validate(w) for w in db_objs]
 
+    def get_workers_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Page[Worker]:
+        logger.debug(f"Service: Getting page of workers (limit={limit}, cursor={cursor})")
+        return self.repository.get_page(db, limit=limit, cursor=cursor).map(Worker.model_validate)
+
     def get_worker_by_phone(self, db: Session, phone: str) -> Optional[Worker]:
-        """Get worker by phone, trying different phone number formats"""
+        """Get worker by phone in any format (+7..., 8..., 10 digits) - one indexed query by phone_norm"""
         logger.debug(f"Service: Getting worker by phone {phone}")
-        
-        # First try direct lookup
         db_obj = self.repository.get_by_phone(db, phone=phone)
-        
-        # If not found, try alternative formats
-        if not db_obj:
-            if phone.startswith("+7") and len(phone) > 2:
-                # Try without +7 prefix
-                alt_phone = phone[2:]  # Get last 10 digits
-                logger.debug(f"Worker not found with +7 prefix, trying without: {alt_phone}")
-                db_obj = self.repository.get_by_phone(db, phone=alt_phone)
-            elif len(phone) == 10 and phone.isdigit():
-                # Try with +7 prefix
-                alt_phone = "+7" + phone
-                logger.debug(f"Worker not found with 10 digits, trying with +7 prefix: {alt_phone}")
-                db_obj = self.repository.get_by_phone(db, phone=alt_phone)
-                
         return db_obj
         
     def get_worker_by_email(self, db: Session, email: str) -> Optional[Worker]:
@@ -57,24 +48,16 @@ class WorkerService:
     def create_worker(self, db: Session, worker_in: WorkerCreate) -> Worker:
         logger.info(f"Service: Creating worker with phone {worker_in.phone}")
         
-        # Проверка на существующий телефон
-        if worker_in.phone:
-            existing = self.repository.get_by_phone(db, phone=worker_in.phone)
-            if existing:
-                raise ValueError(f"Телефон '{worker_in.phone}' уже используется.")
-        
-        # Проверка на существующий email
-        if worker_in.mail:
-            existing = self.repository.get_by_email(db, email=worker_in.mail)
-            if existing:
-                raise ValueError(f"Email '{worker_in.mail}' уже используется.")
+        # Проверка на существующий телефон или email (один запрос)
+        ensure_contacts_free(self.repository, db, phone=worker_in.phone, email=worker_in.mail)
 
         try:
             hashed_password = self.password_service.get_password_hash(worker_in.password)
             create_data = worker_in.model_dump(exclude={'password'})
             create_data['hash_password'] = hashed_password
 
-            db_obj = self.repository.create(db, obj_in=create_data) # Передаем словарь
+            with unit_of_work(db):
+                db_obj = self.repository.create(db, obj_in=create_data) # Передаем словарь
             
             # Отправляем сигнал с моделью SQLAlchemy
             signalBus.worker_created.emit(db_obj)
@@ -91,19 +74,10 @@ class WorkerService:
 
         update_data = worker_in.model_dump(exclude_unset=True)
 
-        # Проверка уникальности телефона при смене
-        if "phone" in update_data and update_data["phone"] != db_obj.phone:
-            if update_data["phone"]:  # Если телефон не пустой
-                existing = self.repository.get_by_phone(db, phone=update_data["phone"])
-                if existing and existing.id != worker_id:
-                    raise ValueError(f"Телефон '{update_data['phone']}' уже используется.")
-                    
-        # Проверка уникальности email при смене
-        if "mail" in update_data and update_data["mail"] != db_obj.mail:
-            if update_data["mail"]:  # Если email не пустой
-                existing = self.repository.get_by_email(db, email=update_data["mail"])
-                if existing and existing.id != worker_id:
-                    raise ValueError(f"Email '{update_data['mail']}' уже используется.")
+        # Проверка уникальности телефона и email при смене (один запрос)
+        new_phone = update_data.get("phone") if normalize_phone(update_data.get("phone")) != db_obj.phone_norm else None
+        new_mail = update_data.get("mail") if normalize_email(update_data.get("mail")) != db_obj.mail_norm else None
+        ensure_contacts_free(self.repository, db, phone=new_phone, email=new_mail, exclude_id=worker_id)
 
         if "password" in update_data and update_data["password"]:
             hashed_password = self.password_service.get_password_hash(update_data["password"])
@@ -113,10 +87,15 @@ class WorkerService:
         if not update_data: return Worker.model_validate(db_obj)
 
         try:
-            updated_db_obj = self.repository.update(db, db_obj=db_obj, obj_in=update_data)
-            pydantic_obj = Worker.model_validate(updated_db_obj)
+            with unit_of_work(db):
+                updated_db_obj = self.repository.update(db, db_obj=db_obj, obj_in=update_data)
+                pydantic_obj = Worker.model_validate(updated_db_obj)
             signalBus.worker_updated.emit(pydantic_obj.model_dump())
             return pydantic_obj
+        except ConcurrentModificationError as e:
+             logger.warning(f"Service: Conflict updating worker {worker_id}: {e}")
+             signalBus.error_occurred.emit("Данные работника изменены другим пользователем. Обновите данные и повторите изменение.")
+             raise
         except Exception as e:
              logger.error(f"Service Error updating worker {worker_id}: {e}")
              signalBus.database_error.emit(f"Ошибка обновления работника: {e}")
@@ -125,7 +104,8 @@ class WorkerService:
     def delete_worker(self, db: Session, worker_id: str) -> bool:
         logger.info(f"Service: Deleting worker id {worker_id}")
         try:
-            deleted = self.repository.remove(db, id=worker_id)
+            with unit_of_work(db):
+                deleted = self.repository.remove(db, id=worker_id)
             if deleted:
                 signalBus.worker_deleted.emit(worker_id)
                 return True
@@ -133,6 +113,5 @@ class WorkerService:
             return False
         except Exception as e:
             logger.error(f"Service Error deleting worker {worker_id}: {e}")
-            db.rollback()
             signalBus.database_error.emit(f"Ошибка удаления работника {worker_id}: {e}")
             raise
\ No newline at end of file
@@ -0,0 +1,137 @@
+# slow_query_log.py
+# Журнал медленных запросов: всё, что дольше SLOW_QUERY_THRESHOLD_MS, пишется в ротируемый
+# файл вместе с параметрами, вызвавшим методом репозитория и планом выполнения (EXPLAIN).
+import sys
+import time
+import logging
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+from sqlalchemy import event
+
+from ..config import SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_EXPLAIN
+from ..logger import LOG_FOLDER
+from .instrumentation import _current_action, pop_start_time
+
+logger = logging.getLogger(__name__)
+
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+class SlowQueryLog:
+    """ Пишет медленные запросы в AppData/Log/slow_queries.log """
+
+    def __init__(self, threshold_ms: float, explain: bool = True, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 5):
+        self.threshold = threshold_ms / 1000.0
+        self.explain = explain
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._engines = []
+        self._file_logger: Optional[logging.Logger] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _get_file_logger(self) -> logging.Logger:
+        if self._file_logger is None:
+            LOG_FOLDER.mkdir(exist_ok=True, parents=True)
+            file_logger = logging.getLogger("slow_queries")
+            file_logger.setLevel(logging.WARNING)
+            file_logger.propagate = False  # Не дублируем многострочные записи в консоль
+            if not file_logger.handlers:
+                handler = RotatingFileHandler(
+                    LOG_FOLDER / "slow_queries.log", maxBytes=self.max_bytes,
+                    backupCount=self.backup_count, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+                file_logger.addHandler(handler)
+            self._file_logger = file_logger
+        return self._file_logger
+
+    def install(self, engine):
+        if not self.enabled or engine in self._engines: return
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+        self._engines.append(engine)
+        logger.info(f"Slow query log enabled (threshold {self.threshold * 1000:.0f} ms).")
+
+    def uninstall(self, engine):
+        if engine not in self._engines: return
+        event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.remove(engine, "handle_error", self._handle_error)
+        self._engines.remove(engine)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["slow_query_start_time"].pop()
+        if duration < self.threshold: return
+        try:
+            self._log(conn, statement, parameters, context, executemany, duration)
+        except Exception as e: # Журнал не должен ломать сам запрос
+            logger.error(f"Failed to write slow query log entry: {e}")
+
+    def _handle_error(self, context):
+        pop_start_time(context, "slow_query_start_time") # см. QueryInstrumentation._handle_error
+
+    def _log(self, conn, statement, parameters, context, executemany, duration):
+        caller = self._find_repository_caller()
+        action = _current_action.get()
+        lines = [f"[{duration * 1000:.1f} ms] {caller or '<no repository>'}"
+                 + (f" (action: {action.name})" if action else "")]
+        lines.append(f"SQL: {' '.join(statement.split())}")
+        lines.append(f"Params: {self._format_params(parameters, executemany)}")
+        if self.explain:
+            plan = self._explain(conn, statement, parameters, context, executemany)
+            if plan: lines.append("Plan:\n" + plan)
+        self._get_file_logger().warning("\n".join(lines))
+
+    @staticmethod
+    def _find_repository_caller() -> Optional[str]:
+        """ Ищет в стеке ближайший метод *Repository (вызывается только для медленных запросов) """
+        frame = sys._getframe(2)
+        while frame is not None:
+            owner = frame.f_locals.get("self")
+            if owner is not None and type(owner).__name__.endswith("Repository"):
+                return f"{type(owner).__name__}.{frame.f_code.co_name}"
+            frame = frame.f_back
+        return None
+
+    @staticmethod
+    def _format_params(parameters, executemany, limit: int = 1000) -> str:
+        if executemany:
+            text = f"{len(parameters)} parameter sets, first: {parameters[0] if parameters else None!r}"
+        else:
+            text = repr(parameters)
+        return text if len(text) <= limit else text[:limit] + "..."
+
+    @staticmethod
+    def _explain(conn, statement, parameters, context, executemany) -> Optional[str]:
+        """ План запроса в формате текущего бэкенда (EXPLAIN / EXPLAIN QUERY PLAN) """
+        if executemany: return None
+        if context is not None and context.execution_options.get("stream_results"):
+            return None # Соединение занято незачитанным серверным курсором
+        words = statement.lstrip().split(None, 1)
+        if not words or words[0].upper() not in _EXPLAINABLE: return None
+
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        # Сырой курсор DBAPI - мимо событий SQLAlchemy, чтобы EXPLAIN сам не попал в статистику
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+            columns = [d[0] for d in cursor.description] if cursor.description else []
+        except Exception as e:
+            return f"  <EXPLAIN failed: {e}>"
+        finally:
+            cursor.close()
+
+        table = [columns] + [[("" if v is None else str(v)) for v in row] for row in rows]
+        widths = [max(len(r[i]) for r in table) for i in range(len(columns))]
+        return "\n".join("  " + " | ".join(v.ljust(w) for v, w in zip(r, widths)) for r in table)
+
+
+slowQueryLog = SlowQueryLog(SLOW_QUERY_THRESHOLD_MS, explain=SLOW_QUERY_EXPLAIN)
@@ -0,0 +1,65 @@
+# unit_of_work.py
+from contextlib import contextmanager, asynccontextmanager
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_DEPTH_KEY = "unit_of_work_depth"
+
+
+def in_unit_of_work(db: Session | AsyncSession) -> bool:
+    """ True, если сессия сейчас внутри unit_of_work (репозитории не должны делать commit) """
+    return db.info.get(_DEPTH_KEY, 0) > 0
+
+
+@contextmanager
+def unit_of_work(db: Session, savepoint: bool = False):
+    """
+    Транзакционная область одной операции сервиса.
+
+    Внешняя область делает ровно один commit в конце (или rollback при любой ошибке).
+    Вложенные области присоединяются к внешней транзакции; с savepoint=True вложенная
+    область работает через SAVEPOINT и при ошибке откатывает только свои изменения.
+
+        with unit_of_work(db):
+            link = repo.create(db, obj_in=...)   # только flush
+            material_service.change_balance(...) # присоединяется к той же транзакции
+    """
+    depth = db.info.get(_DEPTH_KEY, 0)
+    db.info[_DEPTH_KEY] = depth + 1
+    try:
+        if depth == 0:
+            try:
+                yield db
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+        elif savepoint:
+            with db.begin_nested():
+                yield db
+        else:
+            yield db
+    finally:
+        db.info[_DEPTH_KEY] = depth
+
+
+@asynccontextmanager
+async def async_unit_of_work(db: AsyncSession, savepoint: bool = False):
+    """ То же для AsyncSession (счетчик глубины общий: AsyncSession.info - это info синхронной сессии) """
+    depth = db.info.get(_DEPTH_KEY, 0)
+    db.info[_DEPTH_KEY] = depth + 1
+    try:
+        if depth == 0:
+            try:
+                yield db
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+        elif savepoint:
+            async with db.begin_nested():
+                yield db
+        else:
+            yield db
+    finally:
+        db.info[_DEPTH_KEY] = depth
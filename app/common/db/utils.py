@@ -71,3 +71,13 @@ def extract_phone_digits(phone: Optional[str]) -> Optional[str]:
     
     # Return last 10 digits
     return digits[-10:] if len(digits) >= 10 else digits
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Normalized phone for the indexed phone_norm column: last 10 digits, None if there are fewer"""
+    digits = extract_phone_digits(phone)
+    return digits if digits and len(digits) == 10 else None
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Normalized email for the indexed mail_norm column: trimmed and lowercased, None if empty"""
+    if not email: return None
+    return email.strip().lower() or None
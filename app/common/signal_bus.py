@@ -14,6 +14,8 @@ class SignalBus(QObject):
     error_occurred = pyqtSignal(str)
     status_message = pyqtSignal(str)
     database_error = pyqtSignal(str)
+    database_availability_changed = pyqtSignal(bool, str) # Доступна ли БД (circuit breaker), сообщение для пользователя
+    schema_ready = pyqtSignal()  # Схема БД проверена и миграции применены (Project.py), можно запускать фоновые задачи
     appMessageSig = pyqtSignal(str)  # Сигнал для сообщений приложения
     appErrorSig = pyqtSignal(str)    # Сигнал для ошибок приложения
 
@@ -177,39 +177,51 @@ def generate_order_statement(order_data):
         return None
 
 
+def _material_field(material, name, default):
+    """Read a field from a material dict or a Material model."""
+    if isinstance(material, dict):
+        return material.get('id_', material.get('id', default)) if name == 'id' else material.get(name, default)
+    return getattr(material, name, default)
+
+
 def generate_materials_report(materials_data):
-    """Generate Excel report with materials."""
+    """Generate Excel report with materials.
+
+    materials_data may be any iterable (e.g. MaterialController.iter_all) of dicts or
+    Material models. Rows are written as they arrive in a write-only workbook, so memory
+    stays flat for large tables.
+    """
     # Setup save path
     docs_path = get_documents_path()
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
     filename = f"materials_report_{timestamp}.xlsx"
     output_path = os.path.join(docs_path, filename)
     
-    # Create Excel workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Материалы"
+    # Create Excel workbook (write-only: rows are flushed to a temp file, not kept in memory)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Материалы")
     
-    # Add headers
+    # Style the worksheet (column widths must be set before the first row in write-only mode)
     headers = ["ID", "Тип материала", "Остаток", "Цена"]
-    for col, header in enumerate(headers, start=1):
-        ws.cell(row=1, column=col, value=header)
-    
-    # Add materials data
-    for row, material in enumerate(materials_data, start=2):
-        ws.cell(row=row, column=1, value=material.get('id_', ''))
-        ws.cell(row=row, column=2, value=material.get('type', ''))
-        ws.cell(row=row, column=3, value=material.get('balance', 0))
-        ws.cell(row=row, column=4, value=material.get('price', 0))
-    
-    # Style the worksheet
     for col in range(1, len(headers) + 1):
         ws.column_dimensions[chr(64 + col)].width = 20
     
+    # Add headers
+    ws.append(headers)
+    
+    # Add materials data
+    row = 1
+    for material in materials_data:
+        ws.append([
+            _material_field(material, 'id', ''),
+            _material_field(material, 'type', ''),
+            _material_field(material, 'balance', 0),
+            _material_field(material, 'price', 0),
+        ])
+        row += 1
+    
     # Add total row
-    total_row = row + 1
-    ws.cell(row=total_row, column=2, value="ИТОГО:")
-    ws.cell(row=total_row, column=3, value=f"=SUM(C2:C{row})")
+    ws.append([None, "ИТОГО:", f"=SUM(C2:C{row})" if row > 1 else 0])
     
     # Save workbook
     try:
@@ -146,7 +146,12 @@ class MainLoginWindow(Window):
         signalBus.login_successful.connect(self.on_login_successful)
         signalBus.login_failed.connect(self.on_login_failed)
         signalBus.logout_completed.connect(self._handle_logout_transition)
-        
+
+    def set_database_ready(self, ready: bool):
+        # Вход и регистрация обращаются к БД - недоступны, пока схема не проверена и не мигрирована (Project.py)
+        for button in (self.login.pushButton, self.registration.pushButton, self.info.pushButton):
+            button.setEnabled(ready)
+
     @pyqtSlot(str, dict)
     def on_login_successful(self, user_type, user_data):
         # Handle successful login
@@ -91,6 +91,7 @@ class ClientWindow(FluentWindow):
         # Connect SignalBus signals
         signalBus.logout_completed.connect(self.on_logout_completed)
         signalBus.database_error.connect(self.show_db_error)
+        signalBus.database_availability_changed.connect(self.show_db_availability)
         
     def _setup_interfaces(self):
         # Create interfaces using container widgets
@@ -192,6 +193,17 @@ class ClientWindow(FluentWindow):
             parent=self,
             duration=5000
         )
+
+    def show_db_availability(self, available, message):
+        # Отказ уже показан через database_error, здесь только восстановление соединения
+        if available:
+            InfoBar.success(
+                title="База данных",
+                content=message,
+                position=InfoBarPosition.TOP,
+                parent=self,
+                duration=3000
+            )
         
     def _onCurrentInterfaceChanged(self, widget):
         """Override to handle NoneType case"""
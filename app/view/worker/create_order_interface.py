@@ -18,6 +18,7 @@ from qfluentwidgets import (
 from ...common.db.controller import OrderController, ClientController, WorkerController, MaterialController
 from ...common.db.models_pydantic import OrderStatus, OrderCreate, MaterialOnOrderCreate
 from ...common.db.database import SessionLocal
+from ...common.db.executor import dbExecutor
 from ...common.signal_bus import signalBus
 import uuid
 from datetime import datetime
@@ -343,25 +344,29 @@ class CreateOrderInterface(QWidget):
         self.content_layout.addWidget(self.progress_bar)
         
     def load_clients(self):
-        """Load clients into combo box"""
-        try:
-            self.progress_bar.setVisible(True)
-            db = SessionLocal()
-            
-            # Get all clients
-            self.clients_list = self.client_controller.get_all(db)
-            
-            # Update combo box
-            self.update_clients_combo(self.clients_list)
-                
-        except Exception as e:
-            InfoBar.error(
-                title="Ошибка",
-                content=f"Не удалось загрузить клиентов: {str(e)}",
-                parent=self
-            )
-        finally:
-            self.progress_bar.setVisible(False)
+        """Load clients into combo box (in the background, see dbExecutor)"""
+        self.progress_bar.setVisible(True)
+        
+        # Get all clients
+        dbExecutor.submit(
+            self, "clients", self.client_controller.get_all,
+            on_result=self._on_clients_loaded, on_error=self._on_clients_load_failed
+        )
+
+    def _on_clients_loaded(self, clients):
+        self.progress_bar.setVisible(False)
+        self.clients_list = clients
+        
+        # Update combo box
+        self.update_clients_combo(self.clients_list)
+
+    def _on_clients_load_failed(self, error):
+        self.progress_bar.setVisible(False)
+        InfoBar.error(
+            title="Ошибка",
+            content=f"Не удалось загрузить клиентов: {str(error)}",
+            parent=self
+        )
     
     def update_clients_combo(self, clients):
         """Update client combo box with filtered clients list"""
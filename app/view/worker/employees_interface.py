@@ -15,9 +15,10 @@ from qfluentwidgets import (
     PasswordLineEdit, InfoBarPosition
 )
 
-from ...common.db.controller import WorkerController
+from ...common.db.controller import WorkerController, ConcurrentModificationError
 from ...common.db.models_pydantic import WorkerCreate, WorkerUpdate
 from ...common.db.database import SessionLocal
+from ...common.db.executor import dbExecutor
 from ...common.signal_bus import signalBus
 import uuid
 from datetime import datetime, timedelta
@@ -107,17 +108,25 @@ class EmployeesInterface(QWidget):
     def load_employees(self):
         """Load employees from database with optional search filter"""
         self.progress_bar.setVisible(True)
+        
+        # Get search term
+        search_term = self.search_edit.text().strip()
+        
+        # Get all employees (with filter if search term is provided); каждое нажатие клавиши
+        # в поиске отменяет предыдущий запрос, поэтому в таблицу попадает только последний результат
+        dbExecutor.submit(
+            self, "employees", self._fetch_employees, search_term,
+            on_result=self._on_employees_loaded, on_error=self._on_employees_load_failed
+        )
+
+    def _fetch_employees(self, db, search_term):
+        """Runs in a pool thread"""
+        return self.worker_controller.get_all_filtered(db, search_term=search_term) if search_term else self.worker_controller.get_all(db)
+
+    def _on_employees_loaded(self, employees):
         self.employees_table.setRowCount(0)
         
         try:
-            db = SessionLocal()
-            
-            # Get search term
-            search_term = self.search_edit.text().strip()
-            
-            # Get all employees (with filter if search term is provided)
-            employees = self.worker_controller.get_all_filtered(db, search_term=search_term) if search_term else self.worker_controller.get_all(db)
-            
             for row, employee in enumerate(employees):
                 self.employees_table.insertRow(row)
                 
@@ -170,13 +179,17 @@ class EmployeesInterface(QWidget):
                 self.employees_table.setCellWidget(row, 7, actions_widget)
             
         except Exception as e:
-            InfoBar.error(
-                title="Ошибка",
-                content=f"Не удалось загрузить сотрудников: {str(e)}",
-                parent=self
-            )
+            self._on_employees_load_failed(e)
         finally:
             self.progress_bar.setVisible(False)
+
+    def _on_employees_load_failed(self, error):
+        self.progress_bar.setVisible(False)
+        InfoBar.error(
+            title="Ошибка",
+            content=f"Не удалось загрузить сотрудников: {str(error)}",
+            parent=self
+        )
             
     def add_employee(self):
         """Add new employee"""
@@ -238,6 +251,7 @@ class EmployeeDialog(Dialog):
     def __init__(self, employee_id=None, parent=None):
         super().__init__(parent)
         self.employee_id = employee_id
+        self.employee_version = None # Версия загруженного сотрудника - передается при сохранении
         self.setTitle("Редактирование сотрудника" if employee_id else "Добавление сотрудника")
         self.resize(600, 650)
         
@@ -410,6 +424,7 @@ class EmployeeDialog(Dialog):
                 return
                 
             # Set form values
+            self.employee_version = employee.version
             self.last_name_edit.setText(employee.last)
             self.first_name_edit.setText(employee.first)
             
@@ -624,7 +639,8 @@ class EmployeeDialog(Dialog):
                     position=position,
                     born_date=born_date,
                     pass_series=pass_series,
-                    pass_number=pass_number
+                    pass_number=pass_number,
+                    version=self.employee_version
                 )
                 
                 # Add password if provided
@@ -677,6 +693,13 @@ class EmployeeDialog(Dialog):
                         content="Не удалось создать сотрудника",
                         parent=self
                     )
+        except ConcurrentModificationError:
+            InfoBar.warning(
+                title="Сотрудник изменен другим пользователем",
+                content="Загружены актуальные данные - проверьте их и сохраните снова",
+                parent=self
+            )
+            self.load_employee_data()
         except Exception as e:
             InfoBar.error(
                 title="Ошибка",
@@ -7,6 +7,7 @@ from PyQt6.QtGui import QIcon, QColor, QFont
 import re
 import openpyxl
 from openpyxl.styles import Font, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
 import os
 from datetime import datetime
 
@@ -19,7 +20,8 @@ from qfluentwidgets import (
 )
 
 from ...common.db.database import SessionLocal
-from ...common.db.controller import MaterialController
+from ...common.db.controller import MaterialController, ConcurrentModificationError
+from ...common.db.executor import dbExecutor
 from ...common.db.models_pydantic import Material, MaterialCreate, MaterialUpdate
 from ...common.signal_bus import signalBus
 
@@ -151,6 +153,7 @@ class MaterialsInterface(ScrollArea):
         super().__init__(parent=parent)
         self.user_data = user_data
         self.material_controller = MaterialController()
+        self.materials_cursor = None # Курсор следующей страницы материалов (None - загружено все)
         
         # Create widget and layout
         self.scroll_widget = QWidget()
@@ -223,6 +226,12 @@ class MaterialsInterface(ScrollArea):
         
         self.main_layout.addWidget(self.materials_table)
         
+        # Следующая страница материалов: список грузится keyset-страницами, а не целиком
+        self.load_more_button = PushButton("Показать еще")
+        self.load_more_button.setVisible(False)
+        self.load_more_button.clicked.connect(self.load_more_materials)
+        self.main_layout.addWidget(self.load_more_button)
+        
         # Add progress bar to layout
         self.main_layout.addWidget(self.progress_bar)
         
@@ -231,24 +240,38 @@ class MaterialsInterface(ScrollArea):
         signalBus.database_error.connect(self.show_db_error)
         
     def load_materials(self):
-        """Load materials from database"""
+        """Load the first page of materials from database"""
+        self._load_materials_page(None)
+
+    def load_more_materials(self):
+        """Append the next page of materials"""
+        if self.materials_cursor: self._load_materials_page(self.materials_cursor)
+
+    def _load_materials_page(self, cursor):
         # Show loading indicator
         self.progress_bar.setVisible(True)
         
-        # Clear existing table
-        self.materials_table.setRowCount(0)
+        # Get a page of materials (in a pool thread, the window stays responsive)
+        dbExecutor.submit(
+            self, "materials", self.material_controller.get_page, cursor=cursor,
+            on_result=lambda page: self._on_materials_loaded(page, append=cursor is not None),
+            on_error=self._on_materials_load_failed
+        )
+
+    def _on_materials_loaded(self, page, append=False):
+        materials = page.items
+        # First page replaces the table, next pages are appended
+        if not append: self.materials_table.setRowCount(0)
+        self.materials_cursor = page.next_cursor
+        self.load_more_button.setVisible(page.has_next)
+        first_row = self.materials_table.rowCount()
         
         try:
-            db = SessionLocal()
-            
-            # Get all materials
-            materials = self.material_controller.get_all(db)
-            
             # Set row count
-            self.materials_table.setRowCount(len(materials))
+            self.materials_table.setRowCount(first_row + len(materials))
             
             # Fill table with data
-            for i, material in enumerate(materials):
+            for i, material in enumerate(materials, first_row):
                 # ID (hidden)
                 id_item = QTableWidgetItem(str(material.id))  # Ensure ID is converted to string
                 self.materials_table.setItem(i, 0, id_item)
@@ -291,8 +314,11 @@ class MaterialsInterface(ScrollArea):
                     if item:
                         item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
                         
+            # Поиск применяется и к строкам новой страницы
+            if self.search_box.text(): self.filter_materials(self.search_box.text())
+            
             # Show info if no materials
-            if len(materials) == 0:
+            if self.materials_table.rowCount() == 0:
                 InfoBar.info(
                     title="Нет материалов",
                     content="В базе данных нет материалов. Добавьте новый материал.",
@@ -303,20 +329,23 @@ class MaterialsInterface(ScrollArea):
                 # If materials were loaded successfully, show a success message
                 InfoBar.success(
                     title="Материалы загружены",
-                    content=f"Загружено материалов: {len(materials)}",
+                    content=f"Загружено материалов: {self.materials_table.rowCount()}",
                     parent=self,
                     duration=3000
                 )
         except Exception as e:
-            InfoBar.error(
-                title="Ошибка загрузки материалов",
-                content=str(e),
-                parent=self,
-                duration=8000  # Increase duration to 8 seconds for better error visibility
-            )
+            self._on_materials_load_failed(e)
         finally:
-            db.close()  # Properly close the database session
             self.progress_bar.setVisible(False)  # Hide progress bar regardless of result
+
+    def _on_materials_load_failed(self, error):
+        self.progress_bar.setVisible(False)
+        InfoBar.error(
+            title="Ошибка загрузки материалов",
+            content=str(error),
+            parent=self,
+            duration=8000  # Increase duration to 8 seconds for better error visibility
+        )
             
     def filter_materials(self, text):
         """Filter materials table based on search text"""
@@ -372,7 +401,8 @@ class MaterialsInterface(ScrollArea):
             material_data = dialog.get_material_data()
             
             try:
-                material_update = MaterialUpdate(**material_data)
+                # Версия из загруженного списка: если материал с тех пор изменили, сохранение не перезапишет изменения
+                material_update = MaterialUpdate(**material_data, version=material.version)
             except Exception as e:
                 InfoBar.error(
                     title="Ошибка валидации данных",
@@ -393,6 +423,13 @@ class MaterialsInterface(ScrollArea):
                     )
                     # Reload materials
                     self.load_materials()
+            except ConcurrentModificationError:
+                InfoBar.warning(
+                    title="Материал изменен другим пользователем",
+                    content="Список обновлен - проверьте данные и отредактируйте материал снова",
+                    parent=self
+                )
+                self.load_materials()
             except Exception as e:
                 InfoBar.error(
                     title="Ошибка обновления материала",
@@ -441,50 +478,35 @@ class MaterialsInterface(ScrollArea):
     def generate_report(self):
         try:
             db = SessionLocal()
-            materials = self.material_controller.get_all(db)
             
-            # Create workbook
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Остатки материалов"
+            # Create workbook (write-only: rows go straight to disk, memory stays flat on large tables)
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet("Остатки материалов")
             
-            # Add header
-            ws.append(["Тип материала", "Остаток", "Цена за единицу", "Общая стоимость"])
+            # Column widths must be set before the first row in write-only mode, so they are fixed
+            for col_letter, width in zip("ABCD", (40, 12, 20, 24)):
+                ws.column_dimensions[col_letter].width = width
             
-            # Style header
+            # Add header
             header_font = Font(bold=True)
-            for cell in ws[1]:
-                cell.font = header_font
+            ws.append([self._report_cell(ws, value, header_font)
+                       for value in ("Тип материала", "Остаток", "Цена за единицу", "Общая стоимость")])
             
-            # Add data
+            # Add data: materials are streamed from the DB in batches instead of loading the whole table
             total_value = 0
-            if materials:
-                for material in materials:
-                    total_cost = material.balance * material.price
-                    total_value += total_cost
-                    ws.append([material.type, material.balance, f"{material.price} ₽", f"{total_cost} ₽"])
-            else:
+            has_materials = False
+            for material in self.material_controller.iter_all(db):
+                has_materials = True
+                total_cost = material.balance * material.price
+                total_value += total_cost
+                ws.append([material.type, material.balance, f"{material.price} ₽", f"{total_cost} ₽"])
+            if not has_materials:
                 # Add a row indicating no materials
                 ws.append(["Нет материалов в базе данных", 0, "0 ₽", "0 ₽"])
                 
             # Add total row
-            ws.append(["", "", "Общая стоимость:", f"{total_value} ₽"])
-            total_row = ws.max_row
-            for cell in ws[total_row]:
-                cell.font = Font(bold=True)
-                
-            # Auto-fit columns
-            for col in ws.columns:
-                max_length = 0
-                col_letter = col[0].column_letter
-                for cell in col:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = (max_length + 2)
-                ws.column_dimensions[col_letter].width = adjusted_width
+            ws.append([self._report_cell(ws, value, header_font)
+                       for value in ("", "", "Общая стоимость:", f"{total_value} ₽")])
                 
             # Create directory if not exists
             reports_dir = os.path.join(os.path.expanduser("~"), "Terra Reports")
@@ -510,6 +532,12 @@ class MaterialsInterface(ScrollArea):
         finally:
             SessionLocal.remove()
             
+    @staticmethod
+    def _report_cell(ws, value, font):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = font
+        return cell
+            
     @pyqtSlot(str)
     def show_db_error(self, message):
         # Show database error
@@ -17,10 +17,14 @@ from qfluentwidgets import (
     SwitchButton, ToolButton
 )
 
-from ...common.db.controller import OrderController, ClientController, WorkerController, MaterialController
+from ...common.db.controller import OrderController, ClientController, WorkerController, MaterialController, ConcurrentModificationError
 from ...common.db.models_pydantic import OrderStatus, OrderUpdate, MaterialOnOrderCreate
 from ...common.db.database import SessionLocal
+from ...common.db.executor import dbExecutor
+from ...common.db.async_database import async_session
+from ...common.db.services.async_services import AsyncOrderService, AsyncClientService
 from ...common.signal_bus import signalBus
+import asyncio
 import uuid
 from datetime import datetime, timedelta
 import fpdf
@@ -37,6 +41,8 @@ class OrdersInterface(QWidget):
         self.order_controller = OrderController()
         self.client_controller = ClientController()
         self.worker_controller = WorkerController()
+        self.async_order_service = AsyncOrderService()
+        self.async_client_service = AsyncClientService()
         
         # Initialize filters with default values
         from datetime import datetime
@@ -56,6 +62,9 @@ class OrdersInterface(QWidget):
         self.progress_bar = IndeterminateProgressBar()
         self.progress_bar.setVisible(False)
         
+        # Курсор следующей страницы заказов (None - загружено все)
+        self.orders_cursor = None
+        
         # Setup UI
         self._setup_ui()
         
@@ -173,6 +182,12 @@ class OrdersInterface(QWidget):
         # Добавляем таблицу с большим коэффициентом растяжения
         layout.addWidget(self.orders_table, 1)  # Значение 1 дает максимальный приоритет растяжения
         
+        # Следующая страница заказов: список грузится keyset-страницами, а не целиком
+        self.load_more_btn = PushButton("Показать еще")
+        self.load_more_btn.setVisible(False)
+        self.load_more_btn.clicked.connect(self.load_more_orders)
+        layout.addWidget(self.load_more_btn)
+        
         # Progress bar
         self.progress_bar = IndeterminateProgressBar()
         self.progress_bar.setVisible(False)
@@ -184,131 +199,127 @@ class OrdersInterface(QWidget):
         self.load_orders()
 
     def load_orders(self):
-        """Load orders based on current filters"""
+        """Load the first page of orders based on current filters (in the background, see dbExecutor)"""
+        self._load_orders_page(None)
+
+    def load_more_orders(self):
+        """Append the next page of orders for the same filters"""
+        if self.orders_cursor: self._load_orders_page(self.orders_cursor)
+
+    def _load_orders_page(self, cursor):
         # Check if progress_bar exists before using it
         if hasattr(self, 'progress_bar'):
             self.progress_bar.setVisible(True)
+            
+        # Get worker ID from user_data
+        worker_id = self.user_data.get('id')
         
-        # Clear table
-        while self.orders_table.rowCount() > 0:
-            self.orders_table.removeRow(0)
+        # Apply filters
+        filters = dict(self.filters)  # Снимок: поток пула не должен читать изменяемый словарь
+        show_all = filters.get("show_all", True)  # По умолчанию показываем все заказы
+        
+        # Debug info
+        print(f"Filtering with: status={filters.get('status')}, client_id={filters.get('client_id')}, date_from={filters.get('date_from')}, date_to={filters.get('date_to')}, show_all={show_all}")
+        
+        # Новый запрос отменяет предыдущий, если тот ещё не успел вернуться
+        dbExecutor.submit_async(
+            self, "orders", self._fetch_orders, filters, None if show_all else worker_id, cursor,
+            on_result=self._on_orders_loaded, on_error=self._on_orders_load_failed
+        )
+
+    async def _fetch_orders(self, filters, worker_id, cursor):
+        """
+        Runs in the async DB loop: a page of orders for the given filters and, for the first page,
+        the status counts concurrently (counts is None for the next pages)
+        """
+        if worker_id is None:
+            print("Loading ALL orders with filters")
+        else:
+            print(f"Loading WORKER orders for worker_id: {worker_id}")
+        query = dict(
+            worker_id=worker_id, client_id=filters.get("client_id"),
+            date_from=filters.get("date_from"), date_to=filters.get("date_to")
+        )
+        async with async_session(read_only=True) as db:
+            # Только колонки таблицы (имена клиента и работника - через JOIN), без ORM-объектов и Pydantic
+            page_task = self.async_order_service.get_filtered_order_rows_page(db, status=filters.get("status"), cursor=cursor, **query)
+            if cursor: return await page_task, None
+            page, counts = await asyncio.gather(page_task, self._count_statistics(query))
+        return page, counts
+
+    def _on_orders_loaded(self, result):
+        page, counts = result
+        orders = page.items
+        print(f"Loaded {len(orders)} orders matching filters")
+        
+        # First page replaces the table, next pages are appended
+        if counts is not None: self.orders_table.setRowCount(0)
+        self.orders_cursor = page.next_cursor
+        self.load_more_btn.setVisible(page.has_next)
+        first_row = self.orders_table.rowCount()
+        self.orders_table.setSortingEnabled(False) # Иначе вставленные строки пересортировываются по ходу заполнения
             
-        try:
-            db = SessionLocal()
+        # Populate table
+        for i, order in enumerate(orders, first_row):
+            self.orders_table.insertRow(i)
             
-            # Get worker ID from user_data
-            worker_id = self.user_data.get('id')
+            # Order ID
+            self.orders_table.setItem(i, 0, QTableWidgetItem(str(order.id)))
             
-            # Apply filters
-            status = self.filters.get("status")
-            client_id = self.filters.get("client_id")
-            date_from = self.filters.get("date_from")
-            date_to = self.filters.get("date_to")
-            show_all = self.filters.get("show_all", True)  # По умолчанию показываем все заказы
+            # Client
+            client_name = order.client_name or "Н/Д"
+            self.orders_table.setItem(i, 1, QTableWidgetItem(client_name))
             
-            # Debug info
-            print(f"Filtering with: status={status}, client_id={client_id}, date_from={date_from}, date_to={date_to}, show_all={show_all}")
-            if client_id is not None:
-                print(f"Client ID type: {type(client_id).__name__}, value: {client_id}")
+            # Date
+            date_str = order.date.strftime("%d.%m.%Y %H:%M") if order.date else "Н/Д"
+            self.orders_table.setItem(i, 2, QTableWidgetItem(date_str))
             
-            # Get orders
-            if show_all:
-                print("Loading ALL orders with filters")
-                # Get all orders if show_all is enabled
-                orders = self.order_controller.get_filtered_orders(
-                    db, status=status, client_id=client_id,
-                    date_from=date_from, date_to=date_to
-                )
-            else:
-                print(f"Loading WORKER orders for worker_id: {worker_id}")
-                # Get only worker's orders
-                orders = self.order_controller.get_filtered_orders(
-                    db, worker_id=worker_id, status=status, client_id=client_id,
-                    date_from=date_from, date_to=date_to
-                )
-                
-            print(f"Found {len(orders)} orders matching filters")
+            # Worker
+            worker_name = order.worker_name or "Не назначен"
+            self.orders_table.setItem(i, 3, QTableWidgetItem(worker_name))
             
-            # Populate table
-            for i, order in enumerate(orders):
-                self.orders_table.insertRow(i)
-                
-                # Order ID
-                self.orders_table.setItem(i, 0, QTableWidgetItem(str(order.id)))
-                
-                # Client
-                client_name = f"{order.client.first} {order.client.last}" if order.client else "Н/Д"
-                self.orders_table.setItem(i, 1, QTableWidgetItem(client_name))
-                
-                # Date
-                date_str = order.date.strftime("%d.%m.%Y %H:%M") if order.date else "Н/Д"
-                self.orders_table.setItem(i, 2, QTableWidgetItem(date_str))
-                
-                # Worker
-                worker_name = f"{order.worker.first} {order.worker.last}" if order.worker else "Не назначен"
-                self.orders_table.setItem(i, 3, QTableWidgetItem(worker_name))
-                
-                # Status
-                self.orders_table.setItem(i, 4, QTableWidgetItem(order.status))
-                
-                # Actions
-                actions_widget = self._create_order_actions(i, order)
-                self.orders_table.setCellWidget(i, 5, actions_widget)
-                
-            # Update statistics
-            self._update_statistics(db)
+            # Status
+            self.orders_table.setItem(i, 4, QTableWidgetItem(order.status))
             
-            if len(orders) == 0:
-                InfoBar.info(
-                    title="Информация",
-                    content="Заказы не найдены",
-                    parent=self
-                )
-                
-        except Exception as e:
-            InfoBar.error(
-                title="Ошибка",
-                content=f"Не удалось загрузить заказы: {str(e)}",
+            # Actions
+            actions_widget = self._create_order_actions(i, order)
+            self.orders_table.setCellWidget(i, 5, actions_widget)
+        self.orders_table.setSortingEnabled(True)
+            
+        # Update statistics
+        if counts is not None: self._update_statistics(counts)
+        self.progress_bar.setVisible(False)
+        
+        if self.orders_table.rowCount() == 0:
+            InfoBar.info(
+                title="Информация",
+                content="Заказы не найдены",
                 parent=self
             )
-        finally:
-            db.close()
-            if hasattr(self, 'progress_bar'):
-                self.progress_bar.setVisible(False)
 
-    def _update_statistics(self, db):
+    def _on_orders_load_failed(self, error):
+        self.progress_bar.setVisible(False)
+        InfoBar.error(
+            title="Ошибка",
+            content=f"Не удалось загрузить заказы: {str(error)}",
+            parent=self
+        )
+
+    async def _count_statistics(self, query):
+        """Order counts per status for the statistics cards (one GROUP BY query, own session - runs alongside the list)"""
+        async with async_session(read_only=True) as db:
+            return await self.async_order_service.count_orders_by_statuses(db, **query)
+
+    def _update_statistics(self, counts):
         """Update order statistics cards"""
         # Clear previous stats
         for i in reversed(range(self.stats_layout.count())): 
             if self.stats_layout.itemAt(i).widget():
                 self.stats_layout.itemAt(i).widget().setParent(None)
         
-        worker_id = None if self.filters.get("show_all", True) else self.user_data.get('id')
-        client_id = self.filters.get("client_id")
-        date_from = self.filters.get("date_from")
-        date_to = self.filters.get("date_to")
-        
-        # Count orders by status with correct status values and filter context
-        # For "processing" status - use string directly
-        processing_orders = self.order_controller.get_filtered_orders(
-            db, status="Обработка", worker_id=worker_id,
-            client_id=client_id, date_from=date_from, date_to=date_to
-        )
-        processing_count = len(processing_orders) if processing_orders else 0
-        
-        # For "in progress" status - use string directly
-        in_progress_orders = self.order_controller.get_filtered_orders(
-            db, status="В работе", worker_id=worker_id,
-            client_id=client_id, date_from=date_from, date_to=date_to
-        )
-        in_progress_count = len(in_progress_orders) if in_progress_orders else 0
-        
-        # For "completed" status - use string directly
-        completed_orders = self.order_controller.get_filtered_orders(
-            db, status="Выполнен", worker_id=worker_id,
-            client_id=client_id, date_from=date_from, date_to=date_to
-        )
-        completed_count = len(completed_orders) if completed_orders else 0
+        processing_count = counts.get("Обработка", 0)
+        in_progress_count = counts.get("В работе", 0)
+        completed_count = counts.get("Выполнен", 0)
         
         # Calculate total
         total_count = processing_count + in_progress_count + completed_count
@@ -574,57 +585,63 @@ class OrdersInterface(QWidget):
                 db.close()
         
     def load_filters(self):
-        """Load filter options from database"""
-        try:
-            db = SessionLocal()
-            
-            # Load status options
-            self.status_combo.clear()
-            self.status_combo.addItem("Все статусы", None)
-            
-            # Add statuses as text directly, not using enum values
-            self.status_combo.addItem("Обработка", "Обработка")  
-            self.status_combo.addItem("В работе", "В работе")
-            self.status_combo.addItem("Выполнен", "Выполнен")
-            
-            # Load client options
-            self.client_combo.clear()
-            self.client_combo.addItem("Все клиенты", None)
+        """Load filter options from database (clients are fetched in the background)"""
+        # Load status options
+        self.status_combo.clear()
+        self.status_combo.addItem("Все статусы", None)
+        
+        # Add statuses as text directly, not using enum values
+        self.status_combo.addItem("Обработка", "Обработка")  
+        self.status_combo.addItem("В работе", "В работе")
+        self.status_combo.addItem("Выполнен", "Выполнен")
+        
+        # Выполняется одновременно с load_orders (оба запроса в цикле asyncio dbExecutor)
+        dbExecutor.submit_async(
+            self, "filter_clients", self._fetch_filter_clients,
+            on_result=self._on_filter_clients_loaded, on_error=self._on_filters_load_failed
+        )
+
+    async def _fetch_filter_clients(self):
+        async with async_session(read_only=True) as db:
+            return await self.async_client_service.get_clients(db)
+
+    def _on_filter_clients_loaded(self, clients):
+        # Load client options
+        self.client_combo.clear()
+        self.client_combo.addItem("Все клиенты", None)
+        
+        # Print debug info about client loading
+        print("\nLoading clients for filter dropdown:")
+        
+        for client in clients:
+            display_text = f"{client.first} {client.last}"
+            client_id = client.id
+            print(f"Adding client: {display_text}, ID: {client_id}")
             
-            # Print debug info about client loading
-            print("\nLoading clients for filter dropdown:")
+            # IMPORTANT: PyQt will convert userData to QVariant if it's not a standard Python type
+            # Convert UUID to string to avoid conversion issues
+            client_id_str = str(client_id)
+            self.client_combo.addItem(display_text, client_id_str)
             
-            clients = self.client_controller.get_all(db)
-            for client in clients:
-                display_text = f"{client.first} {client.last}"
-                client_id = client.id
-                print(f"Adding client: {display_text}, ID: {client_id}")
-                
-                # IMPORTANT: PyQt will convert userData to QVariant if it's not a standard Python type
-                # Convert UUID to string to avoid conversion issues
-                client_id_str = str(client_id)
-                self.client_combo.addItem(display_text, client_id_str)
-                
-            # Debug - print all items in combo box
-            print("\nAll clients in dropdown:")
-            for i in range(self.client_combo.count()):
-                print(f"Index {i}: Text={self.client_combo.itemText(i)}, Data={self.client_combo.itemData(i)}")
-                
-        except Exception as e:
-            InfoBar.error(
-                title="Ошибка",
-                content=f"Не удалось загрузить фильтры: {str(e)}",
-                parent=self
-            )
-            print(f"Error loading filters: {str(e)}")
-        finally:
-            db.close()
+        # Debug - print all items in combo box
+        print("\nAll clients in dropdown:")
+        for i in range(self.client_combo.count()):
+            print(f"Index {i}: Text={self.client_combo.itemText(i)}, Data={self.client_combo.itemData(i)}")
+
+    def _on_filters_load_failed(self, error):
+        InfoBar.error(
+            title="Ошибка",
+            content=f"Не удалось загрузить фильтры: {str(error)}",
+            parent=self
+        )
+        print(f"Error loading filters: {str(error)}")
 
 
 class OrderDetailsDialog(QDialog):
     def __init__(self, order_id, user_data, parent=None):
         super().__init__(parent=parent)
         self.order_id = order_id
+        self.order_version = None # Версия загруженного заказа - передается при сохранении
         self.user_data = user_data
         
         # Initialize controllers
@@ -828,6 +845,7 @@ class OrderDetailsDialog(QDialog):
             
             # Set status combobox
             self.current_status = order.status
+            self.order_version = order.version
             index = self.status_combo.findText(order.status)
             if index >= 0:
                 self.status_combo.setCurrentIndex(index)
@@ -925,7 +943,8 @@ class OrderDetailsDialog(QDialog):
             # Create the OrderUpdate object with the raw string values
             update_data = OrderUpdate(
                 status=new_status,
-                comment=new_comment if new_comment else None
+                comment=new_comment if new_comment else None,
+                version=self.order_version
             )
             
             # Update order
@@ -944,6 +963,13 @@ class OrderDetailsDialog(QDialog):
                     content="Не удалось обновить заказ",
                     parent=self
                 )
+        except ConcurrentModificationError:
+            InfoBar.warning(
+                title="Заказ изменен другим пользователем",
+                content="Загружены актуальные данные - проверьте их и сохраните снова",
+                parent=self
+            )
+            self.load_order_data()
         except Exception as e:
             InfoBar.error(
                 title="Ошибка",
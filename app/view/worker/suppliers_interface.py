@@ -12,9 +12,10 @@ from qfluentwidgets import (
     ExpandLayout, SimpleCardWidget, ToggleButton, InfoBarPosition
 )
 
-from ...common.db.controller import ProviderController, MaterialController
+from ...common.db.controller import ProviderController, MaterialController, ConcurrentModificationError
 from ...common.db.models_pydantic import ProviderCreate, ProviderUpdate, Material
 from ...common.db.database import SessionLocal
+from ...common.db.executor import dbExecutor
 from ...common.signal_bus import signalBus
 import uuid
 from datetime import datetime
@@ -89,45 +90,47 @@ class SuppliersInterface(QWidget):
         layout.addWidget(self.progress_bar)
         
     def load_suppliers(self):
-        """Load suppliers from database"""
+        """Load suppliers from database (in the background, see dbExecutor)"""
         self.progress_bar.setVisible(True)
         
+        # Get all suppliers (lightweight rows: only the card columns)
+        dbExecutor.submit(
+            self, "suppliers", self.provider_controller.get_list_rows,
+            on_result=self._on_suppliers_loaded, on_error=self._on_suppliers_load_failed
+        )
+
+    def _on_suppliers_loaded(self, suppliers):
+        self.progress_bar.setVisible(False)
+        
         # Clear existing cards
         while self.scroll_layout.count():
             item = self.scroll_layout.takeAt(0)
             if item.widget():
                 item.widget().deleteLater()
         
-        try:
-            db = SessionLocal()
-            
-            # Get all suppliers
-            suppliers = self.provider_controller.get_all(db)
+        if not suppliers:
+            # No suppliers message
+            no_suppliers_label = BodyLabel("Нет поставщиков. Добавьте первого поставщика с помощью кнопки выше.")
+            self.scroll_layout.addWidget(no_suppliers_label)
+            return
             
-            if not suppliers:
-                # No suppliers message
-                no_suppliers_label = BodyLabel("Нет поставщиков. Добавьте первого поставщика с помощью кнопки выше.")
-                self.scroll_layout.addWidget(no_suppliers_label)
-                return
-                
-            # Create cards for each supplier
-            for supplier in suppliers:
-                # Create card
-                card = SupplierCard(supplier, self)
-                card.edit_clicked.connect(self.edit_supplier)
-                card.delete_clicked.connect(self.delete_supplier)
-                card.request_clicked.connect(self.generate_request)
-                
-                self.scroll_layout.addWidget(card)
+        # Create cards for each supplier
+        for supplier in suppliers:
+            # Create card
+            card = SupplierCard(supplier, self)
+            card.edit_clicked.connect(self.edit_supplier)
+            card.delete_clicked.connect(self.delete_supplier)
+            card.request_clicked.connect(self.generate_request)
             
-        except Exception as e:
-            InfoBar.error(
-                title="Ошибка",
-                content=f"Не удалось загрузить поставщиков: {str(e)}",
-                parent=self
-            )
-        finally:
-            self.progress_bar.setVisible(False)
+            self.scroll_layout.addWidget(card)
+
+    def _on_suppliers_load_failed(self, error):
+        self.progress_bar.setVisible(False)
+        InfoBar.error(
+            title="Ошибка",
+            content=f"Не удалось загрузить поставщиков: {str(error)}",
+            parent=self
+        )
             
     def add_supplier(self):
         """Add new supplier"""
@@ -355,6 +358,7 @@ class SupplierDialog(MessageBox):
     def __init__(self, supplier_id=None, parent=None):
         # Set dialog title
         self.supplier_id = supplier_id
+        self.supplier_version = None # Версия загруженного поставщика - передается при сохранении
         title = "Редактирование поставщика" if supplier_id else "Добавление поставщика"
         
         # Initialize with title and placeholder content
@@ -450,6 +454,7 @@ class SupplierDialog(MessageBox):
                 return
                 
             # Set form values
+            self.supplier_version = supplier.version
             self.name_edit.setText(supplier.name)
             self.inn_edit.setText(supplier.inn)
             
@@ -599,7 +604,8 @@ class SupplierDialog(MessageBox):
                     inn=inn,
                     phone=phone,
                     mail=email,
-                    address=address
+                    address=address,
+                    version=self.supplier_version
                 )
                 
                 result = self.provider_controller.update(db, self.supplier_id, update_data)
@@ -651,6 +657,15 @@ class SupplierDialog(MessageBox):
                         position=InfoBarPosition.TOP,
                         duration=3000
                     )
+        except ConcurrentModificationError:
+            InfoBar.warning(
+                title="Поставщик изменен другим пользователем",
+                content="Загружены актуальные данные - проверьте их и сохраните снова",
+                parent=self,
+                position=InfoBarPosition.TOP,
+                duration=5000
+            )
+            self.load_supplier_data()
         except Exception as e:
             InfoBar.error(
                 title="Ошибка",
@@ -141,6 +141,7 @@ class WorkerWindow(FluentWindow):
         # Connect SignalBus signals
         signalBus.logout_completed.connect(self.on_logout_completed)
         signalBus.database_error.connect(self.show_db_error)
+        signalBus.database_availability_changed.connect(self.show_db_availability)
         
     def _create_interfaces(self):
         """Create and initialize all interface widgets"""
@@ -327,6 +328,16 @@ class WorkerWindow(FluentWindow):
             parent=self,
             duration=5000
         )
+
+    def show_db_availability(self, available, message):
+        # Отказ уже показан через database_error, здесь только восстановление соединения
+        if available:
+            InfoBar.success(
+                title="База данных",
+                content=message,
+                parent=self,
+                duration=3000
+            )
         
     def _center_window(self):
         """Центрирует окно на экране"""
@@ -0,0 +1,32 @@
+# conftest.py
+# Тесты слоя БД на профиле memory (SQLite в памяти): профиль выбирается до импорта app.common.config,
+# каждый тест получает чистую БД (configure_engine пересоздает движок, прежняя БД в памяти исчезает).
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+os.environ["DB_PROFILE"] = "memory"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from app.common.db import database
+from app.common.db.models_sqlalchemy import Client
+from app.common.db.utils import UUIDUtils
+
+
+@pytest.fixture
+def db():
+    database.configure_engine("memory")
+    database.init_db()
+    session = database.SessionLocal()
+    yield session
+    database.SessionLocal.remove()
+
+
+@pytest.fixture
+def client_id(db) -> str:
+    client = Client(id=UUIDUtils.getUUID(), first="Ivan", last="Petrov", hash_password="x", date=datetime.now())
+    db.add(client); db.commit()
+    return client.id
@@ -0,0 +1,74 @@
+# test_concurrency.py
+# Оптимистическая блокировка по колонке version: изменение по устаревшей версии не записывается
+# (ConcurrentModificationError), данные остаются как у того, кто успел первым.
+import pytest
+from sqlalchemy import select
+
+from app.common.db import database
+from app.common.db.models_pydantic import MaterialCreate, MaterialUpdate, OrderCreate, OrderStatus, OrderUpdate
+from app.common.db.models_sqlalchemy import Material, Order
+from app.common.db.repositories import ConcurrentModificationError, MaterialRepository, OrderRepository
+from app.common.db.services.material_service import MaterialService
+from app.common.db.services.order_service import OrderService
+
+
+def create_materials(db, count: int):
+    return MaterialService().create_materials(db, [MaterialCreate(type=f"Material {i}", balance=10, price=100) for i in range(count)])
+
+
+def versions(db):
+    db.expire_all()
+    return dict(db.execute(select(Material.id, Material.version)).all())
+
+
+def test_update_with_stale_version_is_rejected(db):
+    service = MaterialService()
+    material_id, = create_materials(db, 1)
+    service.update_material(db, material_id, MaterialUpdate(price=150, version=1))
+
+    with pytest.raises(ConcurrentModificationError) as error:
+        service.update_material(db, material_id, MaterialUpdate(price=200, version=1))
+
+    assert (error.value.expected, error.value.actual) == (1, 2)
+    assert service.get_material(db, material_id).price == 150
+
+
+def test_concurrent_sessions_second_writer_conflicts(db, client_id):
+    order_id = OrderService().create_order_with_materials(db, OrderCreate(client_id=client_id)).id
+    other = database.SessionFactory()
+    try:
+        stale = OrderRepository().get(other, id=order_id)  # Форма открыта в другом окне
+        OrderService().update_order(db, order_id, OrderUpdate(prod_period=5))
+
+        with pytest.raises(ConcurrentModificationError):
+            OrderRepository().update(other, db_obj=stale, obj_in={"status": OrderStatus.IN_PROGRESS.value})
+    finally:
+        other.close()
+
+    db.expire_all()
+    saved = db.get(Order, order_id)
+    assert (saved.prod_period, saved.status, saved.version) == (5, OrderStatus.PROCESSING.value, 2)
+
+
+def test_update_many_rejects_whole_batch_on_one_stale_row(db):
+    first, second = create_materials(db, 2)
+    MaterialService().update_material(db, second, MaterialUpdate(price=150))
+
+    with pytest.raises(ConcurrentModificationError):
+        MaterialRepository().update_many(db, objs_in=[{"id": first, "price": 300, "version": 1},
+                                                      {"id": second, "price": 300, "version": 1}])
+
+    db.expire_all()
+    assert dict(db.execute(select(Material.id, Material.price)).all()) == {first: 100, second: 150}
+    assert versions(db) == {first: 1, second: 2}
+
+
+def test_bulk_update_where_bumps_versions(db):
+    ids = create_materials(db, 3)
+    loaded = MaterialRepository().get(db, id=ids[0])
+
+    assert MaterialRepository().update_where(db, ids=ids[:2], obj_in={"price": 500}) == 2
+
+    assert versions(db) == {ids[0]: 2, ids[1]: 2, ids[2]: 1}
+    # Объект, загруженный до пакетного UPDATE, перечитывается, а не пишет старую версию
+    assert (loaded.price, loaded.version) == (500, 2)
@@ -0,0 +1,86 @@
+# test_pagination.py
+# Keyset-страницы: все строки ровно один раз в порядке ключа, курсор назад возвращает прежнюю страницу,
+# вставки во время листания не сдвигают строки между страницами.
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.common.db.models_pydantic import MaterialCreate
+from app.common.db.models_sqlalchemy import Order
+from app.common.db.pagination import InvalidCursorError
+from app.common.db.services.material_service import MaterialService
+from app.common.db.services.order_service import OrderService
+
+
+def pages(fetch, limit: int):
+    """ Все страницы вперед от первой: [[id, ...], ...] """
+    result, cursor = [], None
+    while True:
+        page = fetch(limit=limit, cursor=cursor)
+        result.append([item.id for item in page.items])
+        if not page.has_next: return result
+        cursor = page.next_cursor
+
+
+def add_orders(db, client_id: str, dates):
+    orders = [Order(id=f"order-{i:02d}", client_id=client_id, date=date, status="Обработка") for i, date in enumerate(dates)]
+    db.add_all(orders); db.commit()
+    return [order.id for order in orders]
+
+
+def test_material_pages_cover_all_rows_in_key_order(db):
+    service = MaterialService()
+    service.create_materials(db, [MaterialCreate(type=f"Type {i % 4}", balance=1, price=10) for i in range(11)])
+    expected = [m.id for m in sorted(service.get_materials(db), key=lambda m: (m.type, m.id))]
+
+    result = pages(lambda **page: service.get_materials_page(db, **page), limit=4)
+
+    assert [len(ids) for ids in result] == [4, 4, 3]
+    assert sum(result, []) == expected
+
+
+def test_previous_cursor_returns_the_previous_page(db):
+    service = MaterialService()
+    service.create_materials(db, [MaterialCreate(type=f"Type {i:02d}", balance=1, price=10) for i in range(9)])
+    first = service.get_materials_page(db, limit=3)
+    second = service.get_materials_page(db, limit=3, cursor=first.next_cursor)
+
+    back = service.get_materials_page(db, limit=3, cursor=second.prev_cursor)
+
+    assert [m.id for m in back.items] == [m.id for m in first.items]
+    assert not first.has_prev and back.has_next and not back.has_prev
+
+
+def test_order_row_pages_are_newest_first_with_ties_broken_by_id(db, client_id):
+    now = datetime.now()
+    ids = add_orders(db, client_id, [now - timedelta(days=i % 3) for i in range(8)])
+    service = OrderService()
+
+    result = pages(lambda **page: service.get_filtered_order_rows_page(db, **page), limit=3)
+
+    expected = sorted(ids, key=lambda id: (-(int(id[-2:]) % 3), id), reverse=True)
+    assert sum(result, []) == expected
+    assert [len(ids) for ids in result] == [3, 3, 2]
+
+
+def test_insert_while_paging_does_not_shift_rows(db, client_id):
+    now = datetime.now()
+    add_orders(db, client_id, [now - timedelta(hours=i) for i in range(6)])
+    service = OrderService()
+    first = service.get_filtered_orders_page(db, limit=3)
+    # Новый заказ появился между загрузкой страниц: он раньше первой страницы и на второй не появляется
+    db.add(Order(id="order-new", client_id=client_id, date=now + timedelta(hours=1), status="Обработка")); db.commit()
+
+    second = service.get_filtered_orders_page(db, limit=3, cursor=first.next_cursor)
+
+    assert [o.id for o in first.items] == ["order-00", "order-01", "order-02"]
+    assert [o.id for o in second.items] == ["order-03", "order-04", "order-05"]
+    assert not second.has_next
+
+
+def test_cursor_of_another_list_is_rejected(db, client_id):
+    add_orders(db, client_id, [datetime.now() - timedelta(hours=i) for i in range(3)])
+    order_cursor = OrderService().get_filtered_orders_page(db, limit=1).next_cursor
+
+    with pytest.raises(InvalidCursorError):
+        MaterialService().get_materials_page(db, cursor=order_cursor)
@@ -0,0 +1,124 @@
+# test_stock_reservations.py
+# Резервы материалов под заказы 'Обработка': перенос списаний миграцией 7, перевод резерва в расход
+# при смене статуса и фоновая сверка заказов, статус которых сменили мимо OrderService.
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.common.db import database
+from app.common.db.migrations import MIGRATIONS, SCHEMA_VERSION_KEY, migrate
+from app.common.db.models_pydantic import MaterialOnOrderCreate, OrderCreate, OrderStatus, OrderUpdate
+from app.common.db.models_sqlalchemy import Material, MaterialOnOrder, Order, StockMovement, StockReservation
+from app.common.db.repositories import InsufficientStockError
+from app.common.db.schema import schema_meta_metadata, write_meta
+from app.common.db.services.order_service import OrderService
+from app.common.db.services.reservation_service import StockReservationService
+from app.common.db.utils import UUIDUtils
+
+
+def add_material(db, balance: int) -> str:
+    material = Material(id=UUIDUtils.getUUID(), type=f"Gold {UUIDUtils.getUUID()[:8]}", balance=balance, price=100)
+    db.add(material)
+    db.add(StockMovement(id=UUIDUtils.getUUID(), material_id=material.id, delta=balance, reason="initial", created_at=datetime.now()))
+    db.commit()
+    return material.id
+
+
+def add_legacy_order(db, client_id: str, status: OrderStatus, amounts) -> str:
+    """ Заказ в том виде, в каком его записывала версия до резервов: материалы уже списаны из balance """
+    order = Order(id=UUIDUtils.getUUID(), client_id=client_id, status=status.value, date=datetime.now())
+    db.add(order); db.flush()
+    for material_id, amount in amounts:
+        db.add(MaterialOnOrder(id=UUIDUtils.getUUID(), order_id=order.id, material_id=material_id, amount=amount))
+        db.execute(update(Material).where(Material.id == material_id).values(balance=Material.balance - amount))
+        db.add(StockMovement(id=UUIDUtils.getUUID(), material_id=material_id, delta=-amount, reason="order",
+                             order_id=order.id, created_at=datetime.now()))
+    db.commit()
+    return order.id
+
+
+def create_order(db, client_id: str, amounts) -> str:
+    order = OrderService().create_order_with_materials(db, OrderCreate(
+        client_id=client_id, materials=[MaterialOnOrderCreate(material_id=id, amount=amount) for id, amount in amounts]))
+    return order.id
+
+
+def balances(db):
+    db.expire_all()
+    return dict(db.execute(select(Material.id, Material.balance)).all())
+
+
+def ledger(db):
+    return {id: int(total) for id, total in db.execute(select(StockMovement.material_id, func.sum(StockMovement.delta))
+                                                       .group_by(StockMovement.material_id))}
+
+
+def test_migration_7_keeps_available_stock_of_populated_database(db, client_id):
+    gold, silver = add_material(db, 10), add_material(db, 20)
+    processing = add_legacy_order(db, client_id, OrderStatus.PROCESSING, [(gold, 4), (gold, 3), (silver, 2)])
+    add_legacy_order(db, client_id, OrderStatus.IN_PROGRESS, [(silver, 5)])
+    before = balances(db)  # {gold: 3, silver: 13}
+    # БД версии 6: таблицы резервов еще нет
+    StockReservation.__table__.drop(bind=database.engine)
+    with database.engine.begin() as connection:
+        schema_meta_metadata.create_all(bind=connection)
+        write_meta(connection, SCHEMA_VERSION_KEY, "6")
+
+    assert migrate() == [7]
+
+    service = StockReservationService()
+    assert service.get_reserved(db) == {gold: 7, silver: 2}
+    assert service.get_available(db) == before
+    assert balances(db) == {gold: before[gold] + 7, silver: before[silver] + 2}
+    assert ledger(db) == balances(db)
+    assert dict(db.execute(select(StockReservation.material_id, StockReservation.order_id)).all()) == {gold: processing, silver: processing}
+
+    # Повторный запуск (например, после сбоя между миграцией и записью версии) ничего не меняет
+    with database.engine.begin() as connection: MIGRATIONS[7].upgrade(connection)
+    assert migrate() == []
+    assert service.get_available(db) == before
+    assert ledger(db) == balances(db)
+
+
+def test_convert_shortage_keeps_order_in_processing(db, client_id):
+    gold = add_material(db, 5)
+    order_id = create_order(db, client_id, [(gold, 4)])
+    # Остаток уменьшили в обход проверки резервов (другая версия приложения)
+    db.execute(update(Material).where(Material.id == gold).values(balance=2)); db.commit()
+
+    with pytest.raises(InsufficientStockError):
+        OrderService().update_order(db, order_id, OrderUpdate(status=OrderStatus.IN_PROGRESS))
+
+    db.expire_all()
+    assert db.get(Order, order_id).status == OrderStatus.PROCESSING.value
+    assert StockReservationService().get_reserved(db) == {gold: 4}
+    assert balances(db) == {gold: 2}
+
+
+def test_reconcile_converts_orders_whose_status_changed_outside_order_service(db, client_id):
+    gold, silver, bronze = add_material(db, 10), add_material(db, 10), add_material(db, 10)
+    first, second = create_order(db, client_id, [(gold, 3)]), create_order(db, client_id, [(gold, 2), (silver, 4)])
+    short = create_order(db, client_id, [(bronze, 5)])
+    untouched = create_order(db, client_id, [(gold, 1)])
+    db.execute(update(Order).where(Order.id.in_([first, second, short])).values(status=OrderStatus.IN_PROGRESS.value))
+    db.commit()
+    # Заказу short не хватает бронзы: остаток уменьшили вручную
+    db.execute(update(Material).where(Material.id == bronze).values(balance=2)); db.commit()
+
+    result = StockReservationService().reconcile(db, batch_size=1)
+
+    assert result == {"converted": 2, "failed": 1, "overcommitted": 1}
+    assert balances(db) == {gold: 5, silver: 6, bronze: 2}
+    reserved = dict(db.execute(select(StockReservation.order_id, func.sum(StockReservation.amount))
+                               .group_by(StockReservation.order_id)).all())
+    assert reserved == {short: 5, untouched: 1}
+    order_movements = db.execute(select(func.count()).select_from(StockMovement)
+                                 .where(StockMovement.order_id.in_([first, second]))).scalar()
+    assert order_movements == 3
+
+    # Остаток вернули - следующая сверка доводит оставшийся заказ
+    db.execute(update(Material).where(Material.id == bronze).values(balance=10)); db.commit()
+    assert StockReservationService().reconcile(db)["converted"] == 1
+    assert balances(db) == {gold: 5, silver: 6, bronze: 5}
+    assert StockReservationService().get_reserved(db) == {gold: 1}